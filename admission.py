@@ -0,0 +1,250 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ ADMISSION CONTROL CONFIGURATIONS ---
+# Memory all admitted uploads may use at once, per process (serve.py splits it
+# between workers); None uses half of physical memory
+UPLOAD_MEMORY_BUDGET_MB = None
+FALLBACK_MEMORY_BUDGET_MB = 2048
+
+# Uploads that do not fit wait in arrival order, at most this long and this many
+ADMISSION_QUEUE_TIMEOUT_SECONDS = 30
+ADMISSION_MAX_QUEUE = 64
+
+# Peak memory per byte of uploaded file when it is processed in memory (DataFrame,
+# prediction copies, encoded output), measured on a 60-column export
+MEMORY_FACTORS = {
+    '.csv': 6,
+    '.txt': 6,
+    '.json': 14,
+    '.jsonl': 17,
+    '.parquet': 9,
+    '.arrow': 6,
+    '.feather': 6,
+    '.xlsx': 20,
+}
+DEFAULT_MEMORY_FACTOR = 20
+# Extra per byte of input when the output is an Excel workbook
+EXCEL_OUTPUT_FACTOR = 2
+
+# Per-row state of a prediction (normalized description, labels, codes)
+ROW_BYTES = 256
+# Per-cell cost of columns sent as JSON lists (slim uploads)
+CELL_BYTES = 100
+
+# Bytes read from the start of a text file to estimate its row count
+ROW_SAMPLE_BYTES = 64 * 1024
+
+# Retry-After bounds, in seconds
+MIN_RETRY_AFTER_SECONDS = 1
+MAX_RETRY_AFTER_SECONDS = 300
+
+
+class AdmissionRejected(Exception):
+    """Raised when an upload cannot be admitted; retry_after is a hint in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def default_budget_mb():
+    """Half of physical memory, or FALLBACK_MEMORY_BUDGET_MB where it cannot be read"""
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (2 * 1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return FALLBACK_MEMORY_BUDGET_MB
+
+
+def file_size(file):
+    """Size of an uploaded file's stream, leaving its position unchanged"""
+    stream = file.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def estimate_rows(file, extension, size):
+    """Row count from Parquet metadata or a sample of a text file; None when unknown"""
+    stream = file.stream
+    position = stream.tell()
+    try:
+        if extension == '.parquet':
+            import pyarrow.parquet as pq
+
+            return pq.read_metadata(stream).num_rows
+        if extension in ('.csv', '.txt', '.jsonl', '.json'):
+            sample = stream.read(ROW_SAMPLE_BYTES)
+            # JSON arrays may be on one line, so count records instead of lines
+            rows = sample.count(b'{') if extension == '.json' else sample.count(b'\n')
+            if not sample or not rows:
+                return 1
+            return max(1, round(rows * size / len(sample)))
+    except Exception as e:
+        logger.info(f"Row count not estimated for {file.filename}: {e}")
+    finally:
+        stream.seek(position)
+    return None
+
+
+def estimate_upload_bytes(file, output_format, streaming=False, chunk_rows=None):
+    """Peak memory of categorizing an uploaded file, from its size, format and row count"""
+    extension = os.path.splitext(file.filename or '')[1].lower()
+    size = file_size(file)
+    rows = estimate_rows(file, extension, size)
+    factor = MEMORY_FACTORS.get(extension, DEFAULT_MEMORY_FACTOR)
+    if output_format == 'excel':
+        factor += EXCEL_OUTPUT_FACTOR
+    if streaming and chunk_rows and rows:
+        # Only one chunk is in memory at a time
+        share = min(1.0, chunk_rows / rows)
+        return int(size * share * factor + min(rows, chunk_rows) * ROW_BYTES)
+    return int(size * factor + (rows or 0) * ROW_BYTES)
+
+
+def estimate_frame_bytes(rows, columns):
+    """Peak memory of categorizing rows x columns sent as JSON lists"""
+    return int(rows * (columns * CELL_BYTES + ROW_BYTES))
+
+
+class Ticket:
+    """Memory granted to one request until it is released"""
+
+    __slots__ = ('size', 'estimate', 'admitted_at', 'released')
+
+    def __init__(self, size, estimate):
+        self.size = size
+        self.estimate = estimate
+        self.admitted_at = None
+        self.released = False
+
+
+class AdmissionController:
+    """Admits uploads against a memory budget; those that do not fit queue first come, first served.
+
+    An upload estimated above the whole budget is admitted alone, once nothing
+    else is running, rather than never.
+    """
+
+    def __init__(self, budget_mb=None, queue_timeout=None, max_queue=None):
+        self.budget = int((budget_mb or UPLOAD_MEMORY_BUDGET_MB or default_budget_mb()) * 1024 * 1024)
+        self.queue_timeout = ADMISSION_QUEUE_TIMEOUT_SECONDS if queue_timeout is None else queue_timeout
+        self.max_queue = ADMISSION_MAX_QUEUE if max_queue is None else max_queue
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self.in_use = 0
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        # Moving average of how long admitted requests hold their memory
+        self.hold_seconds = 1.0
+        print(f"🚦 Admission control: {self.budget / 1024 / 1024:.0f}MB upload memory budget")
+
+    def split(self, parts):
+        """Divide the budget between parts processes (forked workers)"""
+        with self._cond:
+            self.budget = max(self.budget // max(parts, 1), 1)
+        print(f"🚦 Upload memory budget per worker: {self.budget / 1024 / 1024:.0f}MB")
+
+    def acquire(self, estimate, timeout=-1):
+        """Wait until estimate bytes fit the budget; returns a Ticket for release().
+
+        timeout=-1 waits up to the queue timeout; None waits as long as needed (and
+        is not turned away by a full queue). Raises AdmissionRejected otherwise.
+        """
+        timeout = self.queue_timeout if timeout == -1 else timeout
+        ticket = Ticket(min(max(int(estimate), 1), self.budget), int(estimate))
+        started = time.monotonic()
+        with self._cond:
+            if not self._queue and self.in_use + ticket.size <= self.budget:
+                return self._admit(ticket, started)
+            if timeout is not None and (timeout <= 0 or len(self._queue) >= self.max_queue):
+                self.rejected += 1
+                raise AdmissionRejected("Upload memory budget is exhausted", self.retry_after())
+
+            self._queue.append(ticket)
+            self.queued += 1
+            deadline = None if timeout is None else started + timeout
+            while not (self._queue[0] is ticket and self.in_use + ticket.size <= self.budget):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._queue.remove(ticket)
+                    self.rejected += 1
+                    # The next request in line may fit now
+                    self._cond.notify_all()
+                    raise AdmissionRejected("Timed out waiting for upload memory", self.retry_after())
+                self._cond.wait(remaining)
+            self._queue.popleft()
+            ticket = self._admit(ticket, started)
+            # Several queued requests may fit in what was freed
+            self._cond.notify_all()
+            return ticket
+
+    def _admit(self, ticket, started):
+        now = time.monotonic()
+        ticket.admitted_at = now
+        self.in_use += ticket.size
+        self.active += 1
+        self.admitted += 1
+        self.wait_seconds += now - started
+        return ticket
+
+    def release(self, ticket):
+        """Return a ticket's memory to the budget; releasing twice is a no-op"""
+        with self._cond:
+            if ticket.released or ticket.admitted_at is None:
+                return
+            ticket.released = True
+            self.in_use -= ticket.size
+            self.active -= 1
+            self.hold_seconds = 0.8 * self.hold_seconds + 0.2 * (time.monotonic() - ticket.admitted_at)
+            self._cond.notify_all()
+
+    def admit(self, estimate, timeout=-1):
+        """Context manager holding estimate bytes of the budget"""
+        return _Admitted(self, estimate, timeout)
+
+    def retry_after(self):
+        """Seconds until a new upload is likely to be admitted"""
+        waiting = len(self._queue) + 1
+        seconds = self.hold_seconds * waiting / max(self.active, 1)
+        return int(min(max(math.ceil(seconds), MIN_RETRY_AFTER_SECONDS), MAX_RETRY_AFTER_SECONDS))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'budget_bytes': self.budget,
+                'in_use_bytes': self.in_use,
+                'active': self.active,
+                'queue_depth': len(self._queue),
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'wait_seconds': self.wait_seconds,
+            }
+
+
+class _Admitted:
+    def __init__(self, controller, estimate, timeout):
+        self.controller = controller
+        self.estimate = estimate
+        self.timeout = timeout
+        self.ticket = None
+
+    def __enter__(self):
+        self.ticket = self.controller.acquire(self.estimate, self.timeout)
+        return self.ticket
+
+    def __exit__(self, exc_type, exc, tb):
+        self.controller.release(self.ticket)
+        return False
@@ -2,7 +2,12 @@ from flask import Flask
 import os
 import logging
 from config import config
-from ml_utils import MLModelManager
+from ml_utils import set_console_progress
+from model_registry import ModelRegistry, set_default_registry
+from metrics import register_model_collector, register_result_cache_collector, register_admission_collector
+from jobs import JobManager
+from batching import MicroBatcher
+from name_matcher import NameIndexLoader
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -18,10 +23,13 @@ def run_diagnostics(app):
         else:
             print(f"❌ {file} MISSING")
     
-    # Check ML manager
-    print(f"📊 ML Manager initialized: {hasattr(app, 'ml_manager')}")
-    if hasattr(app, 'ml_manager'):
-        print(f"📊 ML Models loaded: {app.ml_manager.is_loaded if hasattr(app.ml_manager, 'is_loaded') else 'Unknown'}")
+    # Check model registry
+    print(f"📊 Model registry initialized: {hasattr(app, 'model_registry')}")
+    if hasattr(app, 'model_registry'):
+        print(f"📊 Models available: {', '.join(app.model_registry.names()) or 'none'}")
+        for model in app.model_registry.describe():
+            if model['resident']:
+                print(f"📊 Model {model['name']}: loaded={model['loaded']} loading={model['loading']}")
     
     print("🔍 DIAGNOSTICS COMPLETE\n")
 
@@ -31,17 +39,101 @@ def create_app(config_name='development'):
 
     app.config.from_object(config[config_name])
 
-    # Initialize ML manager with error handling
-    app.ml_manager = MLModelManager()
+    # gzip/zstd request bodies are decompressed and text responses compressed
+    if app.config.get('HTTP_COMPRESSION', True):
+        from compression import CompressionMiddleware
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config.get('COMPRESS_MIN_BYTES'))
+
+    # Per-request console progress only while debugging unless configured
+    set_console_progress(app.config.get('CONSOLE_PROGRESS', app.debug))
+
+    # Named models from the models directory, loaded on first use
+    app.model_registry = ModelRegistry(
+        models_dir=app.config.get('MODELS_DIR'),
+        default_model=app.config.get('DEFAULT_MODEL'),
+        max_resident=app.config.get('MAX_RESIDENT_MODELS'),
+        memory_budget_mb=app.config.get('MODEL_MEMORY_BUDGET_MB'),
+        rules=None if app.config.get('USE_RULE_INDEX', True) else False,
+        n_workers=app.config.get('PARALLEL_WORKERS'),
+        shard_size=app.config.get('PARALLEL_SHARD_SIZE'),
+    )
+    set_default_registry(app.model_registry)
     
-    # Try to load models, but don't crash if they fail
-    try:
-        success = app.ml_manager.load_models()
-        if not success:
-            print("⚠️ ML models failed to load - app will run without predictions")
-    except Exception as e:
-        print(f"⚠️ ML model loading failed: {e}")
-        print("⚠️ App will run without predictions")
+    # Load the default model in the background so the app factory returns immediately;
+    # routes wait for it (up to MODEL_LOAD_WAIT_SECONDS) before predicting
+    if app.config.get('LAZY_MODEL_LOADING', True):
+        app.model_registry.preload()
+        print("⏳ ML models loading in background")
+    else:
+        # Try to load models, but don't crash if they fail
+        try:
+            if app.model_registry.get() is None:
+                print("⚠️ ML models failed to load - app will run without predictions")
+        except Exception as e:
+            print(f"⚠️ ML model loading failed: {e}")
+            print("⚠️ App will run without predictions")
+
+    # Swap in new model versions dropped into the models directory
+    if app.config.get('MODEL_HOT_RELOAD', True):
+        app.model_registry.start_watching(app.config.get('MODEL_WATCH_INTERVAL_SECONDS'))
+
+    # Model load time and prediction cache counters for /metrics
+    register_model_collector(app.model_registry)
+
+    # Predicted uploads kept on disk so repeated uploads skip parsing and prediction
+    app.result_cache = None
+    if app.config.get('USE_RESULT_CACHE', True):
+        try:
+            from result_cache import ResultCache
+            app.result_cache = ResultCache(
+                directory=app.config.get('RESULT_CACHE_DIR'),
+                max_mb=app.config.get('RESULT_CACHE_MAX_MB'),
+                max_age_seconds=app.config.get('RESULT_CACHE_MAX_AGE_SECONDS'),
+            )
+            register_result_cache_collector(app.result_cache)
+        except Exception as e:
+            print(f"⚠️ Result cache unavailable: {e}")
+
+    # Merges concurrent /api/predict calls into one vectorized predict per model
+    app.prediction_batcher = MicroBatcher(
+        app.model_registry.predict_items,
+        max_batch_size=app.config.get('MICRO_BATCH_MAX_ITEMS'),
+        max_wait_ms=app.config.get('MICRO_BATCH_MAX_WAIT_MS'),
+    )
+
+    # Prebuilt supplier name index for /name-assign, loaded on first use and when rebuilt
+    app.name_index = NameIndexLoader(app.config.get('NAME_INDEX_PATH'))
+
+    # Uploads wait (or get 429) when their estimated memory would exceed the budget
+    app.admission = None
+    if app.config.get('USE_ADMISSION_CONTROL', True):
+        from admission import AdmissionController
+        app.admission = AdmissionController(
+            budget_mb=app.config.get('UPLOAD_MEMORY_BUDGET_MB'),
+            queue_timeout=app.config.get('ADMISSION_QUEUE_TIMEOUT_SECONDS'),
+            max_queue=app.config.get('ADMISSION_MAX_QUEUE'),
+        )
+        register_admission_collector(app.admission)
+
+    # Request profiles on demand (X-Profile header with ADMIN_TOKEN) or sampled
+    app.profiler = None
+    if app.config.get('ADMIN_TOKEN') or app.config.get('PROFILE_SAMPLE_RATE'):
+        from profiling import Profiler
+        app.profiler = Profiler(
+            directory=app.config.get('PROFILE_DIR'),
+            sample_rate=app.config.get('PROFILE_SAMPLE_RATE'),
+            token=app.config.get('ADMIN_TOKEN'),
+            interval=app.config.get('PROFILE_INTERVAL_SECONDS'),
+            trace_memory=app.config.get('PROFILE_TRACE_MEMORY'),
+            max_profiles=app.config.get('PROFILE_MAX_FILES'),
+        )
+
+    # Background worker pool for async uploads
+    app.job_manager = JobManager(
+        max_workers=app.config.get('JOB_WORKERS'),
+        result_ttl=app.config.get('JOB_RESULT_TTL_SECONDS'),
+        state_dir=app.config.get('JOB_STATE_DIR'),
+    )
 
     # Run diagnostics
     run_diagnostics(app)
@@ -0,0 +1,131 @@
+import queue
+import threading
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ MICRO-BATCHING CONFIGURATIONS ---
+MAX_BATCH_SIZE = 4096
+MAX_WAIT_MS = 10
+LATENCY_SAMPLES = 10_000
+
+
+class _BatchRequest:
+    """One caller's items waiting to be merged into a batch"""
+
+    def __init__(self, items):
+        self.items = items
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.submitted_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Merges concurrent small prediction requests into one predict_fn call"""
+
+    def __init__(self, predict_fn, max_batch_size=None, max_wait_ms=None):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size or MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else MAX_WAIT_MS) / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._first_request_at = None
+        self.requests = 0
+        self.items = 0
+        self.batches = 0
+        self.errors = 0
+
+    def submit(self, items, timeout=None):
+        """Queue items and block until their predictions are ready"""
+        if not items:
+            return []
+        self._ensure_started()
+        request = _BatchRequest(list(items))
+        self._queue.put(request)
+        if not request.done.wait(timeout):
+            raise TimeoutError("Prediction batch timed out")
+        if request.error is not None:
+            raise request.error
+
+        latency = time.perf_counter() - request.submitted_at
+        with self._stats_lock:
+            if self._first_request_at is None:
+                self._first_request_at = request.submitted_at
+            self._latencies.append(latency)
+            self.requests += 1
+            self.items += len(request.items)
+        return request.result
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].items)
+            deadline = time.monotonic() + self.max_wait
+            # Keep collecting until the batch is full or the wait window closes
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.items)
+            self._process(batch)
+
+    def _process(self, batch):
+        merged = [item for request in batch for item in request.items]
+        try:
+            results = self.predict_fn(merged)
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(merged)} items failed: {e}")
+            with self._stats_lock:
+                self.errors += len(batch)
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        with self._stats_lock:
+            self.batches += 1
+        offset = 0
+        for request in batch:
+            request.result = results[offset:offset + len(request.items)]
+            offset += len(request.items)
+            request.done.set()
+
+    def stats(self):
+        """Throughput and latency percentiles over the recent requests"""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            elapsed = time.perf_counter() - self._first_request_at if self._first_request_at else 0.0
+
+            def percentile(p):
+                if not latencies:
+                    return 0.0
+                return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+            return {
+                'requests': self.requests,
+                'items': self.items,
+                'batches': self.batches,
+                'errors': self.errors,
+                'mean_batch_items': self.items / self.batches if self.batches else 0.0,
+                'items_per_second': self.items / elapsed if elapsed else 0.0,
+                'latency_ms_p50': percentile(50),
+                'latency_ms_p99': percentile(99),
+                'queue_depth': self._queue.qsize(),
+            }
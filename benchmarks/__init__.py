@@ -0,0 +1 @@
+"""Pipeline benchmarks and synthetic data generation"""
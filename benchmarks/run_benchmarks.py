@@ -0,0 +1,239 @@
+"""End-to-end pipeline benchmark.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks --rows 10000 100000 --formats csv xlsx
+    python -m benchmarks.run_benchmarks --compare <base-commit> <head-commit>
+    python -m benchmarks.run_benchmarks --scorer --rows 100000 1000000
+
+Each run appends one JSON line per (rows, format) case to the results file,
+tagged with the current git commit so runs can be compared between commits.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic_data import (
+    COL_ITEM,
+    XLSX_MAX_ROWS,
+    generate_dataframe,
+    train_standin_model,
+    write_dataset,
+)
+
+# --- ⚙️ BENCHMARK CONFIGURATIONS ---
+WORK_DIR = os.path.join(ROOT, "benchmarks", "work")
+RESULTS_PATH = os.path.join(ROOT, "benchmarks", "results", "results.jsonl")
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+DEFAULT_FORMATS = ['csv']
+OUTPUT_FORMAT = 'csv'
+
+# Stages reported for every case, in pipeline order
+STAGES = ['read', 'normalize', 'mask', 'rules', 'predict', 'decode', 'fill', 'write']
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return 'unknown'
+
+
+def load_manager(model_dir):
+    """Load the stand-in model, training it on first use"""
+    from ml_utils import MLModelManager
+
+    model_path = os.path.join(model_dir, "ayala_categorizer.joblib")
+    encoder_path = os.path.join(model_dir, "ayala_label_encoder.joblib")
+    if not (os.path.exists(model_path) and os.path.exists(encoder_path)):
+        print(f"🏋️ Training stand-in model into {model_dir}")
+        train_standin_model(model_dir)
+
+    # The cache would turn repeated runs into lookups; measure raw inference
+    manager = MLModelManager(cache=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not manager.load_models(model_path, encoder_path):
+            raise Exception("Stand-in model could not be loaded")
+    return manager
+
+
+def run_case(manager, path, output_format=OUTPUT_FORMAT):
+    """Time each pipeline stage for one input file"""
+    from werkzeug.datastructures import FileStorage
+    from routes import generate_output_file, read_uploaded_file
+
+    timings = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        with open(path, 'rb') as f:
+            started = time.perf_counter()
+            df = read_uploaded_file(FileStorage(stream=f, filename=os.path.basename(path)))
+            timings['read'] = time.perf_counter() - started
+
+        df = manager.predict_categories(df, COL_ITEM)
+        stats = df.attrs.get('prediction_stats', {})
+        timings.update(stats.get('timings', {}))
+
+        started = time.perf_counter()
+        output_path = generate_output_file(df, output_format)
+        timings['write'] = time.perf_counter() - started
+
+    output_bytes = os.path.getsize(output_path)
+    os.remove(output_path)
+    return timings, stats, output_bytes
+
+
+def run(rows_list, formats, duplication, words, results_path):
+    commit = git_commit()
+    manager = load_manager(os.path.join(WORK_DIR, "models"))
+    records = []
+
+    for rows in rows_list:
+        df = generate_dataframe(rows, duplication=duplication, words=words)
+        for file_format in formats:
+            if file_format == 'xlsx' and rows > XLSX_MAX_ROWS:
+                print(f"⏭️ Skipping xlsx at {rows} rows (Excel row limit)")
+                continue
+
+            path = write_dataset(df, os.path.join(WORK_DIR, "data"), file_format, name=f"synthetic_{rows}")
+            input_bytes = os.path.getsize(path)
+            timings, stats, output_bytes = run_case(manager, path)
+            os.remove(path)
+
+            total = sum(timings.get(stage, 0.0) for stage in STAGES)
+            record = {
+                'commit': commit,
+                'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'rows': rows,
+                'format': file_format,
+                'duplication': duplication,
+                'words': words,
+                'unique_ratio': stats.get('unique_ratio'),
+                'input_bytes': input_bytes,
+                'output_bytes': output_bytes,
+                'stages': {stage: round(timings.get(stage, 0.0), 6) for stage in STAGES},
+                'total_seconds': round(total, 6),
+                'rows_per_second': round(rows / total, 1) if total else None,
+                'python': platform.python_version(),
+            }
+            records.append(record)
+            stage_text = "  ".join(f"{stage}={timings.get(stage, 0.0):.3f}s" for stage in STAGES)
+            print(f"⏱️ {rows:>9} rows {file_format:<4} total={total:.3f}s  {stage_text}")
+
+    os.makedirs(os.path.dirname(results_path), exist_ok=True)
+    with open(results_path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    print(f"💾 {len(records)} results appended to {results_path}")
+    return records
+
+
+def run_scorer(rows_list, duplication, words, results_path):
+    """Time the sklearn pipeline against the compiled sparse scorer; predictions must be identical"""
+    import numpy as np
+    from ml_utils import normalize_descriptions
+
+    commit = git_commit()
+    manager = load_manager(os.path.join(WORK_DIR, "models"))
+    if manager.scorer is None:
+        raise Exception("Model could not be compiled to a sparse scorer")
+    records = []
+
+    for rows in rows_list:
+        df = generate_dataframe(rows, duplication=duplication, words=words)
+        descriptions = normalize_descriptions(df[COL_ITEM]).tolist()
+
+        started = time.perf_counter()
+        expected = manager.model.predict(descriptions)
+        pipeline_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        predicted = manager.scorer.predict(descriptions)
+        scorer_seconds = time.perf_counter() - started
+
+        if not np.array_equal(expected, predicted):
+            raise Exception(f"Sparse scorer predictions differ from the pipeline at {rows} rows")
+
+        speedup = pipeline_seconds / scorer_seconds if scorer_seconds else None
+        records.append({
+            'commit': commit,
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'case': 'scorer',
+            'rows': rows,
+            'duplication': duplication,
+            'words': words,
+            'pipeline_seconds': round(pipeline_seconds, 6),
+            'scorer_seconds': round(scorer_seconds, 6),
+            'speedup': round(speedup, 2) if speedup else None,
+            'python': platform.python_version(),
+        })
+        print(f"⚡ {rows:>9} rows  pipeline={pipeline_seconds:.3f}s  scorer={scorer_seconds:.3f}s  "
+              f"{speedup:.2f}x  identical predictions")
+
+    os.makedirs(os.path.dirname(results_path), exist_ok=True)
+    with open(results_path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    print(f"💾 {len(records)} results appended to {results_path}")
+    return records
+
+
+def compare(results_path, base_commit, head_commit):
+    """Print per-stage speed ratios between two commits' latest results"""
+    latest = {}
+    with open(results_path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('case') == 'scorer':
+                continue
+            if record['commit'] in (base_commit, head_commit):
+                key = (record['commit'], record['rows'], record['format'], record['duplication'])
+                latest[key] = record
+
+    print(f"📊 {base_commit} -> {head_commit} (ratio > 1 means faster)")
+    for (commit, rows, file_format, duplication), base in sorted(latest.items()):
+        if commit != base_commit:
+            continue
+        head = latest.get((head_commit, rows, file_format, duplication))
+        if head is None:
+            continue
+        ratios = "  ".join(
+            f"{stage}={base['stages'][stage] / head['stages'][stage]:.2f}x"
+            # Results recorded before a stage existed do not report it
+            for stage in STAGES if head['stages'].get(stage) and stage in base['stages']
+        )
+        print(f"   {rows:>9} rows {file_format:<4} dup={duplication}  "
+              f"total={base['total_seconds'] / head['total_seconds']:.2f}x  {ratios}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the categorization pipeline")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--formats', nargs='+', default=DEFAULT_FORMATS, choices=['csv', 'xlsx', 'json', 'txt', 'parquet', 'arrow'])
+    parser.add_argument('--duplication', type=float, default=0.8, help="share of rows repeating a description")
+    parser.add_argument('--words', type=int, default=6, help="words per description")
+    parser.add_argument('--results', default=RESULTS_PATH)
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help="compare two commits' results")
+    parser.add_argument('--scorer', action='store_true', help="compare the sparse scorer with the sklearn pipeline")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(args.results, *args.compare)
+    elif args.scorer:
+        run_scorer(args.rows, args.duplication, args.words, args.results)
+    else:
+        run(args.rows, args.formats, args.duplication, args.words, args.results)
+
+
+if __name__ == "__main__":
+    main()
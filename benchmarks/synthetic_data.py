@@ -0,0 +1,130 @@
+"""Synthetic procurement-like data and a small stand-in model for benchmarking"""
+import os
+import random
+
+# --- ⚙️ GENERATOR CONFIGURATIONS ---
+N_MAJOR = 12
+N_MINOR_PER_MAJOR = 8
+WORDS_PER_CLASS = 40
+SHARED_WORDS = 400
+TRAIN_SAMPLES_PER_CLASS = 30
+
+# Column names written by the generator
+COL_SUPPLIER = "Supplier"
+COL_ITEM = "Item Description"
+
+FORMAT_EXTENSIONS = {'csv': 'csv', 'xlsx': 'xlsx', 'json': 'json', 'txt': 'txt', 'parquet': 'parquet', 'arrow': 'arrow'}
+XLSX_MAX_ROWS = 1_048_575
+
+
+def make_taxonomy(seed=0):
+    """Return class labels ('S/NS | Major | Minor') and each class's vocabulary"""
+    rng = random.Random(seed)
+    labels = []
+    vocabularies = []
+    for major in range(N_MAJOR):
+        for minor in range(N_MINOR_PER_MAJOR):
+            sns = "S" if rng.random() < 0.5 else "NS"
+            labels.append(f"{sns} | Major {major:02d} | Minor {major:02d}-{minor:02d}")
+            vocabularies.append([f"m{major}n{minor}w{i}" for i in range(WORDS_PER_CLASS)])
+    shared = [f"common{i}" for i in range(SHARED_WORDS)]
+    return labels, vocabularies, shared
+
+
+def _description(rng, vocabulary, shared, words):
+    # Mostly class-specific tokens plus some shared noise (units, brands, ...)
+    n_specific = max(1, words * 2 // 3)
+    tokens = rng.choices(vocabulary, k=n_specific) + rng.choices(shared, k=words - n_specific)
+    rng.shuffle(tokens)
+    return " ".join(tokens)
+
+
+def generate_dataframe(rows, duplication=0.8, words=6, seed=0):
+    """Build a procurement-like DataFrame.
+
+    duplication is the share of rows repeating an earlier description:
+    0.0 gives all-unique descriptions, 0.9 gives roughly rows / 10 distinct ones.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = random.Random(seed)
+    labels, vocabularies, shared = make_taxonomy(seed)
+    n_distinct = max(1, int(round(rows * (1.0 - duplication))))
+
+    pool_classes = [rng.randrange(len(labels)) for _ in range(n_distinct)]
+    pool = [_description(rng, vocabularies[c], shared, words) for c in pool_classes]
+    # Every pooled description appears at least once; the rest are repeats
+    np_rng = np.random.default_rng(seed)
+    picks = np_rng.integers(0, n_distinct, size=rows)
+    picks[:n_distinct] = np.arange(n_distinct)[:rows]
+    picks = np_rng.permutation(picks)
+
+    descriptions = np.asarray(pool, dtype=object)[picks]
+    suppliers = np.asarray([f"Supplier {i:04d}" for i in range(500)], dtype=object)
+    return pd.DataFrame({
+        "Row ID": np.arange(rows),
+        COL_SUPPLIER: suppliers[picks % len(suppliers)],
+        COL_ITEM: descriptions,
+        "Amount": np.round(np.random.default_rng(seed + 1).random(rows) * 1000, 2),
+    })
+
+
+def write_dataset(df, directory, file_format, name="synthetic"):
+    """Write df in one of the upload formats; returns the file path"""
+    if file_format not in FORMAT_EXTENSIONS:
+        raise Exception(f"Unsupported benchmark format: {file_format}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.{FORMAT_EXTENSIONS[file_format]}")
+
+    if file_format == 'csv':
+        df.to_csv(path, index=False)
+    elif file_format == 'txt':
+        df.to_csv(path, index=False, sep='\t')
+    elif file_format == 'json':
+        df.to_json(path, orient='records')
+    elif file_format == 'xlsx':
+        if len(df) > XLSX_MAX_ROWS:
+            raise Exception(f"Excel holds at most {XLSX_MAX_ROWS} data rows")
+        df.to_excel(path, index=False, engine='xlsxwriter')
+    elif file_format == 'parquet':
+        df.to_parquet(path, index=False)
+    elif file_format == 'arrow':
+        df.to_feather(path)
+    return path
+
+
+def train_standin_model(directory, seed=0):
+    """Train a TF-IDF + linear classifier on the synthetic taxonomy.
+
+    Writes ayala_categorizer.joblib and ayala_label_encoder.joblib (uncompressed,
+    so they can be memory-mapped) and returns their paths.
+    """
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import LabelEncoder
+
+    rng = random.Random(seed)
+    labels, vocabularies, shared = make_taxonomy(seed)
+    texts, targets = [], []
+    for class_index, vocabulary in enumerate(vocabularies):
+        for _ in range(TRAIN_SAMPLES_PER_CLASS):
+            texts.append(_description(rng, vocabulary, shared, 6))
+            targets.append(labels[class_index])
+
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(targets)
+    model = Pipeline([
+        ("tfidf", TfidfVectorizer()),
+        ("clf", LogisticRegression(max_iter=300)),
+    ])
+    model.fit(texts, y)
+
+    os.makedirs(directory, exist_ok=True)
+    model_path = os.path.join(directory, "ayala_categorizer.joblib")
+    encoder_path = os.path.join(directory, "ayala_label_encoder.joblib")
+    joblib.dump(model, model_path, compress=0)
+    joblib.dump(label_encoder, encoder_path, compress=0)
+    return model_path, encoder_path
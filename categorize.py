@@ -0,0 +1,386 @@
+"""Headless batch categorization of files, directories and glob patterns.
+
+Usage (from the repository root):
+    python categorize.py data/2024/ extra/*.csv --description-column Description \\
+        --output-dir categorized --format csv --jobs 4 --workers 2
+
+Progress is checkpointed per file and per chunk in the output directory, so
+re-running the same command after an interruption resumes where it stopped;
+files already categorized are skipped until they change (--restart redoes them).
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain, islice
+
+from werkzeug.datastructures import FileStorage
+
+from ml_utils import progress, set_console_progress
+from model_registry import ModelRegistry, file_signature
+from routes import (
+    STREAMING_CHUNK_ROWS,
+    combine_sheets,
+    get_file_extension,
+    is_streamable,
+    is_workbook,
+    iter_frame_blocks,
+    iter_output_bytes,
+    iter_uploaded_file_chunks,
+    new_stream_stats,
+    parse_sheet_names,
+    predict_chunks,
+    read_uploaded_file,
+    read_workbook,
+    write_output,
+)
+
+# --- ⚙️ BATCH CLI CONFIGURATIONS ---
+INPUT_EXTENSIONS = ('.csv', '.xlsx', '.json', '.jsonl', '.txt', '.parquet', '.arrow', '.feather')
+OUTPUT_FORMATS = ('excel', 'csv', 'json', 'jsonl', 'parquet', 'arrow')
+DEFAULT_OUTPUT_FORMAT = 'csv'
+OUTPUT_SUFFIX = "_categorized"
+
+# Kept in the output directory; finished files are skipped until their input changes
+CHECKPOINT_FILENAME = ".categorize_checkpoint.json"
+PARTS_DIRNAME = ".categorize_parts"
+
+# Outputs a resumed file appends to in place; other formats are assembled from saved chunks
+APPENDABLE_OUTPUT_FORMATS = ('csv', 'jsonl')
+
+
+class Interrupted(Exception):
+    """Raised between chunks once the run has been asked to stop"""
+
+
+class Checkpoint:
+    """Per-file and per-chunk progress of a run, saved atomically after every step"""
+
+    def __init__(self, output_dir, settings):
+        self.path = os.path.join(output_dir, CHECKPOINT_FILENAME)
+        self.settings = settings
+        self._lock = threading.Lock()
+        self.files = {}
+
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('settings') == settings:
+                self.files = state.get('files', {})
+                print(f"📌 Resuming from {self.path}")
+            else:
+                print(f"⚠️ Settings changed since the last run; ignoring {self.path}")
+
+    def get(self, key):
+        with self._lock:
+            return dict(self.files.get(key, {}))
+
+    def update(self, key, reset=False, **fields):
+        """Record progress for one input file (reset=True drops what was recorded before)"""
+        with self._lock:
+            if reset or key not in self.files:
+                self.files[key] = {}
+            self.files[key].update(fields)
+            self._save()
+
+    def _save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'settings': self.settings, 'files': self.files}, f, indent=1)
+        os.replace(temp_path, self.path)
+
+
+def collect_inputs(paths, output_dir):
+    """(input file, output name) for each file, directory (recursive) or glob pattern, in order"""
+    output_dir = os.path.abspath(output_dir)
+    found = {}
+    for path in paths:
+        if os.path.isdir(path):
+            matches = [
+                (os.path.join(root, name), os.path.relpath(os.path.join(root, name), path))
+                for root, _, names in os.walk(path) for name in names
+            ]
+        else:
+            matches = [(match, os.path.basename(match)) for match in glob.glob(path, recursive=True)]
+            if not matches:
+                raise Exception(f"No files match: {path}")
+        for match, relative in sorted(matches):
+            absolute = os.path.abspath(match)
+            # Never pick up this (or an earlier) run's outputs and checkpoint files
+            if not match.lower().endswith(INPUT_EXTENSIONS) or absolute.startswith(output_dir + os.sep):
+                continue
+            found.setdefault(absolute, relative)
+    return list(found.items())
+
+
+def output_path_for(relative, output_dir, output_format):
+    """Output file for an input, mirroring its path below the directory it was found in.
+
+    The input's extension is kept (data.csv -> data.csv_categorized.parquet) so inputs
+    differing only by type never share an output.
+    """
+    return os.path.join(output_dir, f"{relative}{OUTPUT_SUFFIX}.{get_file_extension(output_format)}")
+
+
+def iter_input_chunks(file, chunk_rows):
+    """Chunks of an input file: read incrementally when streamable, else split after reading"""
+    if is_streamable(file.filename):
+        return iter_uploaded_file_chunks(file, chunk_rows)
+    df = read_uploaded_file(file)
+    return (block.reset_index(drop=True) for block in iter_frame_blocks(df, chunk_rows))
+
+
+class BatchCategorizer:
+    """Categorizes input files one chunk at a time, checkpointing after each chunk"""
+
+    def __init__(self, manager, checkpoint, output_dir, description_column, output_format,
+                 supplier_column=None, category_column=None, chunk_rows=None, sheet_names=None, parse_workers=1):
+        self.manager = manager
+        self.checkpoint = checkpoint
+        self.output_dir = output_dir
+        self.description_column = description_column
+        self.output_format = output_format
+        self.supplier_column = supplier_column
+        self.category_column = category_column
+        self.chunk_rows = chunk_rows or STREAMING_CHUNK_ROWS
+        self.sheet_names = sheet_names
+        self.parse_workers = parse_workers
+        self.stop = threading.Event()
+
+    def categorize(self, input_path, output_path):
+        """Categorize one file unless a previous run finished it; returns (status, rows)"""
+        signature = [list(item) for item in file_signature([input_path]) or ()]
+        state = self.checkpoint.get(input_path)
+        if state.get('signature') != signature:
+            # New file, or changed since it was checkpointed
+            state = {}
+            self.checkpoint.update(input_path, reset=True, signature=signature, output=output_path)
+        if state.get('status') == 'done' and os.path.exists(output_path):
+            print(f"⏭️ {input_path}: already categorized")
+            return 'skipped', state.get('rows', 0)
+
+        started = time.perf_counter()
+        self.checkpoint.update(input_path, status='running', error=None)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        partial_path = output_path + '.partial'
+
+        if is_workbook(input_path):
+            rows = self._categorize_workbook(input_path, partial_path)
+        elif self.output_format in APPENDABLE_OUTPUT_FORMATS:
+            rows = self._categorize_appending(input_path, partial_path, state)
+        else:
+            rows = self._categorize_parts(input_path, partial_path, state)
+
+        os.replace(partial_path, output_path)
+        shutil.rmtree(self._parts_dir(input_path), ignore_errors=True)
+        seconds = time.perf_counter() - started
+        self.checkpoint.update(input_path, status='done', rows=rows, seconds=round(seconds, 3))
+        print(f"✅ {input_path} -> {output_path}: {rows} rows in {seconds:.1f}s")
+        return 'done', rows
+
+    def _chunks(self, input_path, skip):
+        """Predicted chunks after the first skip (already checkpointed) ones; yields (chunk number, chunk)"""
+        with open(input_path, 'rb') as f:
+            file = FileStorage(stream=f, filename=os.path.basename(input_path))
+            chunks = iter_input_chunks(file, self.chunk_rows)
+            first_chunk = next(chunks, None)
+            if first_chunk is None:
+                raise Exception("Input file is empty")
+            if self.description_column not in first_chunk.columns:
+                raise Exception(f'Column "{self.description_column}" not found. Available columns: {", ".join(map(str, first_chunk.columns))}')
+            if skip:
+                progress(f"⏩ {input_path}: resuming after chunk {skip}")
+
+            # Checkpointed chunks are re-read but not predicted again
+            remaining = islice(chain([first_chunk], chunks), skip, None)
+            predicted = predict_chunks(
+                remaining, self.description_column, self.manager, new_stream_stats(),
+                self.supplier_column, self.category_column,
+            )
+            for number, chunk in enumerate(predicted, start=skip + 1):
+                if self.stop.is_set():
+                    raise Interrupted()
+                progress(f"📦 {input_path}: chunk {number} ({len(chunk)} rows)")
+                yield number, chunk
+
+    def _categorize_appending(self, input_path, partial_path, state):
+        """CSV/JSON-lines: append each chunk to the partial output and checkpoint its byte offset"""
+        done = state.get('chunks', 0) if os.path.exists(partial_path) else 0
+        rows = state.get('rows_written', 0) if done else 0
+        numbers = []
+
+        def tracked(chunks):
+            for number, chunk in chunks:
+                numbers.append((number, len(chunk)))
+                yield chunk
+
+        with open(partial_path, 'r+b' if done else 'wb') as output:
+            output.truncate(state.get('bytes', 0) if done else 0)
+            output.seek(0, os.SEEK_END)
+            # Each encoded block is yielded after its chunk was pulled, so every pulled chunk is written
+            for data in iter_output_bytes(tracked(self._chunks(input_path, done)), self.output_format, header=not done):
+                output.write(data)
+                output.flush()
+                done = numbers[-1][0]
+                rows += sum(count for _, count in numbers)
+                numbers.clear()
+                self.checkpoint.update(input_path, chunks=done, rows_written=rows, bytes=output.tell())
+        return rows + sum(count for _, count in numbers)
+
+    def _categorize_parts(self, input_path, partial_path, state):
+        """Excel/JSON/Parquet/Arrow: save each predicted chunk, then write the output from the saved chunks"""
+        import pandas as pd
+
+        parts_dir = self._parts_dir(input_path)
+        os.makedirs(parts_dir, exist_ok=True)
+        done = state.get('chunks', 0)
+        if any(not os.path.exists(self._part_path(parts_dir, number)) for number in range(1, done + 1)):
+            done = 0
+        rows = state.get('rows_written', 0) if done else 0
+
+        for number, chunk in self._chunks(input_path, done):
+            chunk.to_pickle(self._part_path(parts_dir, number))
+            done = number
+            rows += len(chunk)
+            self.checkpoint.update(input_path, chunks=done, rows_written=rows)
+
+        parts = (pd.read_pickle(self._part_path(parts_dir, number)) for number in range(1, done + 1))
+        with open(partial_path, 'wb') as output:
+            write_output(parts, self.output_format, output)
+        return rows
+
+    def _categorize_workbook(self, input_path, partial_path):
+        """Workbooks are categorized sheet by sheet in one pass and checkpointed per file"""
+        sheets, targets, skipped = read_workbook(
+            input_path, self.description_column, self.sheet_names, self.parse_workers
+        )
+        if skipped:
+            print(f"⏭️ {input_path}: sheets without column {self.description_column}: {skipped}")
+        self.manager.predict_sheets(targets, self.description_column, self.supplier_column, self.category_column)
+
+        with open(partial_path, 'wb') as output:
+            if self.output_format == 'excel':
+                write_output(sheets, self.output_format, output)
+            else:
+                write_output(iter_frame_blocks(combine_sheets(sheets)), self.output_format, output)
+        return sum(len(df) for df in sheets.values())
+
+    def _parts_dir(self, input_path):
+        key = hashlib.sha256(input_path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.output_dir, PARTS_DIRNAME, key)
+
+    @staticmethod
+    def _part_path(parts_dir, number):
+        return os.path.join(parts_dir, f"part-{number:06d}.pkl")
+
+
+def main(argv=None):
+    """Categorize files, directories or glob patterns without the web app"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('inputs', nargs='+', help="files, directories (searched recursively) or glob patterns")
+    parser.add_argument('--description-column', required=True)
+    parser.add_argument('--supplier-column')
+    parser.add_argument('--category-column')
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--format', default=DEFAULT_OUTPUT_FORMAT, choices=OUTPUT_FORMATS)
+    parser.add_argument('--model', help="model name in the models directory (default model if omitted)")
+    parser.add_argument('--sheets', default='', help="comma-separated sheet names for .xlsx inputs")
+    parser.add_argument('--chunk-rows', type=int, default=STREAMING_CHUNK_ROWS, help="rows per checkpointed chunk")
+    parser.add_argument('--jobs', type=int, default=1, help="files categorized at the same time")
+    parser.add_argument('--workers', type=int, default=None, help="inference worker processes per prediction")
+    parser.add_argument('--parse-workers', type=int, default=1, help="worker processes parsing Excel sheets")
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and categorize every file again")
+    parser.add_argument('--quiet', action='store_true', help="only print per-file results")
+    args = parser.parse_args(argv)
+
+    set_console_progress(not args.quiet)
+    os.makedirs(args.output_dir, exist_ok=True)
+    try:
+        inputs = collect_inputs(args.inputs, args.output_dir)
+    except Exception as e:
+        parser.error(str(e))
+    if not inputs:
+        parser.error("no input files found")
+    outputs = [output_path_for(relative, args.output_dir, args.format) for _, relative in inputs]
+    duplicates = sorted({path for path in outputs if outputs.count(path) > 1})
+    if duplicates:
+        # Same relative path found under two of the given directories
+        parser.error(f"several inputs would write the same output: {', '.join(duplicates)}")
+
+    registry = ModelRegistry(n_workers=args.workers)
+    try:
+        manager = registry.get(args.model)
+    except Exception as e:
+        sys.exit(f"❌ {e}")
+    if manager is None:
+        sys.exit("❌ ML models could not be loaded")
+
+    settings = {
+        'description_column': args.description_column,
+        'supplier_column': args.supplier_column,
+        'category_column': args.category_column,
+        'format': args.format,
+        'model': args.model or registry.default_model,
+        'sheets': args.sheets,
+        'chunk_rows': args.chunk_rows,
+    }
+    checkpoint = Checkpoint(args.output_dir, settings)
+    if args.restart:
+        checkpoint.files = {}
+    categorizer = BatchCategorizer(
+        manager, checkpoint, args.output_dir, args.description_column, args.format,
+        args.supplier_column, args.category_column, args.chunk_rows,
+        parse_sheet_names(args.sheets), args.parse_workers,
+    )
+
+    print(f"🚀 Categorizing {len(inputs)} files with model {settings['model']} ({args.jobs} at a time)")
+    started = time.perf_counter()
+    counts = {'done': 0, 'skipped': 0, 'failed': 0}
+    total_rows = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, args.jobs))
+    futures = {
+        executor.submit(categorizer.categorize, input_path, output_path): input_path
+        for (input_path, _), output_path in zip(inputs, outputs)
+    }
+    try:
+        for future in as_completed(futures):
+            input_path = futures[future]
+            try:
+                status, rows = future.result()
+            except Interrupted:
+                continue
+            except Exception as e:
+                # Checkpointed chunks are kept; the next run retries the file from there
+                checkpoint.update(input_path, status='failed', error=str(e))
+                print(f"❌ {input_path}: {e}")
+                counts['failed'] += 1
+                continue
+            counts[status] += 1
+            if status == 'done':
+                total_rows += rows
+    except KeyboardInterrupt:
+        categorizer.stop.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+        print(f"🛑 Interrupted; progress saved in {checkpoint.path}. Run the same command to resume.")
+        return 130
+    executor.shutdown(wait=True)
+
+    seconds = time.perf_counter() - started
+    print(f"📊 {counts['done']} categorized, {counts['skipped']} already done, {counts['failed']} failed: "
+          f"{total_rows} rows in {seconds:.1f}s")
+    if counts['failed']:
+        return 1
+    shutil.rmtree(os.path.join(args.output_dir, PARTS_DIRNAME), ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import gzip
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ HTTP COMPRESSION CONFIGURATIONS ---
+# Responses of these types are compressed when the client accepts gzip or zstd;
+# Excel, Parquet and Arrow downloads are already compact and are sent as-is
+COMPRESSIBLE_MIMETYPES = (
+    'text/csv', 'text/plain', 'text/html', 'application/json', 'application/x-ndjson',
+)
+# Responses with a known length below this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Compressed request body size, kept in the WSGI environ once the body is decompressed
+REQUEST_BYTES_KEY = 'categorizer.request_bytes'
+
+
+def import_zstandard():
+    """zstandard module, or None when it is not installed (gzip is always available)"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _decompressing_stream(stream, encoding):
+    if encoding == 'gzip':
+        return _DecodingReader(gzip.GzipFile(fileobj=stream, mode='rb'), encoding)
+    if encoding == 'zstd':
+        zstandard = import_zstandard()
+        if zstandard is None:
+            return None
+        return _DecodingReader(zstandard.ZstdDecompressor().stream_reader(stream), encoding)
+    return None
+
+
+class _DecodingReader:
+    """Request body reader that answers a corrupt compressed body with 400 instead of 500"""
+
+    def __init__(self, stream, encoding):
+        self._stream = stream
+        self.encoding = encoding
+
+    def _decode(self, read, size):
+        from werkzeug.exceptions import BadRequest, HTTPException
+
+        try:
+            return read(size)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise BadRequest(f"Invalid {self.encoding} request body: {e}") from e
+
+    def read(self, size=-1):
+        return self._decode(self._stream.read, size)
+
+    def readline(self, size=-1):
+        return self._decode(self._stream.readline, size)
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def close(self):
+        self._stream.close()
+
+
+class _Compressor:
+    """Incremental gzip or zstd compressor with a per-chunk flush so streamed downloads keep flowing"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'zstd':
+            zstandard = import_zstandard()
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self._sync_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            # wbits 31: gzip header and trailer
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._sync_flush = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(self._sync_flush)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """WSGI middleware: decompresses gzip/zstd request bodies and compresses text responses"""
+
+    def __init__(self, app, min_bytes=None):
+        self.app = app
+        self.min_bytes = COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+        self.encodings = ('zstd', 'gzip') if import_zstandard() else ('gzip',)
+
+    def __call__(self, environ, start_response):
+        request_encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if request_encoding and request_encoding != 'identity':
+            if not self._decompress_request(environ, request_encoding):
+                return self._unsupported(start_response, request_encoding)
+
+        encoding = self._response_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        compress = []
+
+        def compressing_start_response(status, headers, exc_info=None):
+            from werkzeug.datastructures import Headers
+
+            headers = Headers(headers)
+            if self._should_compress(status, headers):
+                headers['Content-Encoding'] = encoding
+                headers.remove('Content-Length')
+                headers.add('Vary', 'Accept-Encoding')
+                compress.append(True)
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        body = self.app(environ, compressing_start_response)
+        if not compress:
+            return body
+        return self._compressed(body, encoding)
+
+    def _decompress_request(self, environ, encoding):
+        """Swap wsgi.input for a decompressing reader; False if the encoding is not supported"""
+        from werkzeug.wsgi import LimitedStream
+
+        stream = environ['wsgi.input']
+        length = environ.get('CONTENT_LENGTH')
+        if length and not environ.get('wsgi.input_terminated'):
+            stream = LimitedStream(stream, int(length))
+        decompressed = _decompressing_stream(stream, encoding)
+        if decompressed is None:
+            return False
+        environ['wsgi.input'] = decompressed
+        # Read to the end of the decompressed data; MAX_CONTENT_LENGTH now limits decompressed bytes
+        environ['wsgi.input_terminated'] = True
+        environ[REQUEST_BYTES_KEY] = int(length or 0)
+        environ.pop('CONTENT_LENGTH', None)
+        environ.pop('HTTP_CONTENT_ENCODING', None)
+        return True
+
+    def _response_encoding(self, accept_encoding):
+        """Preferred encoding the client accepts, or None"""
+        if not accept_encoding:
+            return None
+        from werkzeug.http import parse_accept_header
+
+        accepted = parse_accept_header(accept_encoding)
+        for encoding in self.encodings:
+            if accepted.quality(encoding) > 0:
+                return encoding
+        return None
+
+    def _should_compress(self, status, headers):
+        if not status.startswith('200') or 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if headers.get('Content-Type', '').split(';')[0].strip() not in COMPRESSIBLE_MIMETYPES:
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.min_bytes
+
+    @staticmethod
+    def _compressed(body, encoding):
+        compressor = _Compressor(encoding)
+        try:
+            for data in body:
+                if data:
+                    yield compressor.compress(data)
+            yield compressor.finish()
+        finally:
+            # Runs the response's call_on_close callbacks
+            close = getattr(body, 'close', None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def _unsupported(start_response, encoding):
+        message = f"Unsupported Content-Encoding: {encoding}".encode('utf-8')
+        start_response('415 Unsupported Media Type', [
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('Content-Length', str(len(message))),
+        ])
+        return [message]
@@ -0,0 +1,229 @@
+import os
+import re
+import json
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+from ml_utils import progress
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ JOB QUEUE CONFIGURATIONS ---
+JOB_WORKERS = 2
+JOB_RESULT_TTL_SECONDS = 60 * 60
+
+# How long cancelled jobs get to stop (and remove partial output) at shutdown
+JOB_CANCEL_GRACE_SECONDS = 5
+
+# Directory where job status is mirrored so any pre-fork worker can answer /jobs
+# (None keeps status in this process only)
+JOB_STATE_DIR = None
+
+# Job states
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its worker shuts down before the job finished"""
+
+
+class Job:
+    """A single background categorization job"""
+
+    def __init__(self, download_name=None):
+        self.id = uuid.uuid4().hex
+        self.status = STATUS_QUEUED
+        self.progress = {}
+        self.result_path = None
+        self.download_name = download_name
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.on_change = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Ask the job to stop at its next progress update or check_cancelled()"""
+        self._cancelled.set()
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise JobCancelled("Job cancelled: the server restarted before it finished, please resubmit")
+
+    def update_progress(self, **values):
+        """Merge progress counters reported by the worker; raises JobCancelled once cancelled"""
+        self.check_cancelled()
+        self.progress = {**self.progress, **values}
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a job from the status another worker saved"""
+        job = cls(download_name=state.get('download_name'))
+        for name in ('status', 'progress', 'error', 'created_at', 'started_at', 'finished_at', 'result_path'):
+            setattr(job, name, state.get(name))
+        job.id = state['job_id']
+        return job
+
+
+class JobManager:
+    """Runs categorization jobs on a local thread pool and expires their results"""
+
+    def __init__(self, max_workers=None, result_ttl=None, state_dir=None):
+        self.max_workers = max_workers or JOB_WORKERS
+        self.result_ttl = result_ttl or JOB_RESULT_TTL_SECONDS
+        self.state_dir = None
+        self.share_state(state_dir or JOB_STATE_DIR)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="categorizer-job")
+        self._jobs = {}
+        # Jobs queued or running here: id -> (job, future, cleanup paths)
+        self._active = {}
+        self._lock = threading.Lock()
+        print(f"🧵 JobManager initialized with {self.max_workers} workers")
+
+    def submit(self, func, *args, download_name=None, cleanup_paths=(), **kwargs):
+        """Queue func(job, *args, **kwargs); func returns the result file path"""
+        self.purge_expired()
+        job = Job(download_name=download_name)
+        job.on_change = self._save
+        with self._lock:
+            self._jobs[job.id] = job
+            self._save(job)
+            future = self._executor.submit(self._run, job, func, args, kwargs, cleanup_paths)
+            self._active[job.id] = (job, future, cleanup_paths)
+        progress(f"📨 Job queued: {job.id}")
+        return job
+
+    def _run(self, job, func, args, kwargs, cleanup_paths):
+        job.status = STATUS_RUNNING
+        job.started_at = time.time()
+        self._save(job)
+        try:
+            job.result_path = func(job, *args, **kwargs)
+            job.status = STATUS_DONE
+            progress(f"✅ Job completed: {job.id}")
+        except Exception as e:
+            job.error = str(e)
+            job.status = STATUS_FAILED
+            progress(f"❌ Job failed: {job.id}: {e}")
+            logger.error(f"Job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+            for path in cleanup_paths:
+                _remove_file(path)
+            with self._lock:
+                self._active.pop(job.id, None)
+
+    def share_state(self, state_dir):
+        """Mirror job status to state_dir so other worker processes can report it"""
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self.state_dir = state_dir
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        if not self.state_dir:
+            return
+        state = {**job.to_dict(), 'result_path': job.result_path, 'download_name': job.download_name}
+        path = self._state_path(job.id)
+        try:
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not save state of job {job.id}: {e}")
+
+    def _load(self, job_id):
+        """Job saved by another worker, or None"""
+        if not self.state_dir or not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        try:
+            with open(self._state_path(job_id), encoding='utf-8') as f:
+                job = Job.from_state(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+        if job.finished_at is not None and job.finished_at < time.time() - self.result_ttl:
+            return None
+        return job
+
+    def get(self, job_id):
+        """Return the job, or None if it is unknown or expired"""
+        self.purge_expired()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job or self._load(job_id)
+
+    def purge_expired(self):
+        """Forget finished jobs older than the TTL and delete their result files"""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            if job.result_path:
+                _remove_file(job.result_path)
+            if self.state_dir:
+                _remove_file(self._state_path(job.id))
+            logger.info(f"Job {job.id} expired")
+        return len(expired)
+
+    def shutdown(self, wait=True, timeout=None):
+        """Stop taking jobs; with wait, give running jobs up to timeout seconds, then cancel them.
+
+        Jobs that never started or did not stop in time are marked failed (so other
+        workers report them) and their input files are removed.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if not wait:
+            return
+        with self._lock:
+            active = list(self._active.values())
+        # Futures cancelled before they ran never count as done for wait()
+        _, pending = wait_futures([future for _, future, _ in active if not future.cancelled()], timeout=timeout)
+        if pending:
+            for job, future, _ in active:
+                if future in pending:
+                    job.cancel()
+            _, pending = wait_futures(pending, timeout=JOB_CANCEL_GRACE_SECONDS)
+        for job, future, cleanup_paths in active:
+            if future in pending or future.cancelled():
+                job.status = STATUS_FAILED
+                job.error = "The server restarted before the job finished, please resubmit"
+                job.finished_at = time.time()
+                self._save(job)
+                for path in cleanup_paths:
+                    _remove_file(path)
+                logger.warning(f"Job {job.id} abandoned at shutdown")
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove {path}: {e}")
@@ -0,0 +1,278 @@
+import json
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("categorizer.slow")
+
+# --- ⚙️ METRICS CONFIGURATIONS ---
+SLOW_REQUEST_SECONDS = 10.0
+STAGE_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Pipeline stages timed per request
+STAGES = ('parse', 'predict', 'decode', 'merge', 'write', 'index', 'match')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Mirror a total kept by another component (e.g. the prediction cache)"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def clear(self):
+        """Drop every series, for label values that come and go (e.g. evicted models)"""
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted((k, dict(v, counts=list(v['counts']))) for k, v in self._values.items())
+        for key, state in items:
+            for bound, count in zip(self.buckets, state['counts']):
+                labels = _format_labels(self.labelnames + ('le',), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames + ('le',), key + ('+Inf',))
+            lines.append(f"{self.name}_bucket{labels} {state['count']}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {state['sum']}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and scrape-time collectors; renders Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """collector() is called on every scrape to refresh gauges"""
+        self._collectors.append(collector)
+
+    def render(self):
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter("categorizer_requests_total", "Requests handled", ["endpoint", "status"])
+REQUEST_SECONDS = REGISTRY.histogram("categorizer_request_seconds", "End-to-end request time", ["endpoint"])
+STAGE_SECONDS = REGISTRY.histogram("categorizer_stage_seconds", "Time spent per pipeline stage", ["stage"])
+ROWS = REGISTRY.counter("categorizer_rows_total", "Rows categorized", ["endpoint"])
+BYTES_IN = REGISTRY.counter("categorizer_bytes_in_total", "Uploaded bytes", ["endpoint"])
+BYTES_OUT = REGISTRY.counter("categorizer_bytes_out_total", "Bytes returned", ["endpoint"])
+ERRORS = REGISTRY.counter("categorizer_errors_total", "Failed requests by stage", ["endpoint", "stage"])
+MODEL_LOADED = REGISTRY.gauge("categorizer_model_loaded", "1 when the ML model is loaded", ["model"])
+MODEL_LOAD_SECONDS = REGISTRY.gauge("categorizer_model_load_seconds", "Duration of the last model load", ["model"])
+MODELS_RESIDENT = REGISTRY.gauge("categorizer_models_resident", "Models kept in memory")
+MODEL_RELOADS = REGISTRY.counter("categorizer_model_reloads_total", "Models hot-reloaded from disk")
+MODEL_EVICTIONS = REGISTRY.counter("categorizer_model_evictions_total", "Models unloaded to stay within budget")
+CACHE_LOOKUPS = REGISTRY.counter("categorizer_cache_lookups_total", "Prediction cache lookups", ["result"])
+CACHE_EVICTIONS = REGISTRY.counter("categorizer_cache_evictions_total", "Prediction cache evictions")
+CACHE_ENTRIES = REGISTRY.gauge("categorizer_cache_entries", "Prediction cache entries", ["tier"])
+RULE_LOOKUPS = REGISTRY.counter("categorizer_rule_lookups_total", "Rule index lookups", ["model", "result"])
+RULE_ENTRIES = REGISTRY.gauge("categorizer_rule_entries", "Rules in the rule index", ["model"])
+RESULT_CACHE_LOOKUPS = REGISTRY.counter("categorizer_result_cache_lookups_total", "Result cache lookups", ["result"])
+RESULT_CACHE_EVICTIONS = REGISTRY.counter("categorizer_result_cache_evictions_total", "Result cache evictions")
+RESULT_CACHE_ENTRIES = REGISTRY.gauge("categorizer_result_cache_entries", "Results in the result cache")
+RESULT_CACHE_BYTES = REGISTRY.gauge("categorizer_result_cache_bytes", "Size of the result cache on disk")
+ADMISSION_BUDGET = REGISTRY.gauge("categorizer_admission_budget_bytes", "Memory budget for admitted uploads")
+ADMISSION_IN_USE = REGISTRY.gauge("categorizer_admission_in_use_bytes", "Estimated memory held by admitted uploads")
+ADMISSION_ACTIVE = REGISTRY.gauge("categorizer_admission_active", "Uploads currently admitted")
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge("categorizer_admission_queue_depth", "Uploads waiting for memory")
+ADMISSION_DECISIONS = REGISTRY.counter("categorizer_admission_decisions_total", "Admission outcomes", ["result"])
+ADMISSION_WAIT_SECONDS = REGISTRY.counter("categorizer_admission_wait_seconds_total", "Time admitted uploads spent queued")
+
+
+def map_prediction_timings(timings):
+    """Map predict_categories timings onto request stages"""
+    return {
+        'predict': timings.get('normalize', 0.0) + timings.get('rules', 0.0) + timings.get('predict', 0.0),
+        'decode': timings.get('decode', 0.0),
+        'merge': timings.get('mask', 0.0) + timings.get('fill', 0.0),
+    }
+
+
+def record_request(endpoint, status, seconds, timings=None, rows=0, bytes_in=0, bytes_out=0,
+                   slow_seconds=SLOW_REQUEST_SECONDS, **details):
+    """Record one finished request and log it if it was slow"""
+    timings = timings or {}
+    REQUESTS.inc(endpoint=endpoint, status=status)
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint)
+    for stage, value in timings.items():
+        STAGE_SECONDS.observe(value, stage=stage)
+    if rows:
+        ROWS.inc(rows, endpoint=endpoint)
+    if bytes_in:
+        BYTES_IN.inc(bytes_in, endpoint=endpoint)
+    if bytes_out:
+        BYTES_OUT.inc(bytes_out, endpoint=endpoint)
+
+    if seconds >= slow_seconds:
+        slow_logger.warning(json.dumps({
+            'event': 'slow_request',
+            'endpoint': endpoint,
+            'status': status,
+            'seconds': round(seconds, 3),
+            'stages': {stage: round(value, 3) for stage, value in timings.items()},
+            'rows': rows,
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            **details,
+        }))
+
+
+def register_model_collector(model_registry):
+    """Export model and prediction-cache state on every scrape"""
+
+    def collect():
+        MODEL_LOADED.clear()
+        MODEL_LOAD_SECONDS.clear()
+        for name, ml_manager in model_registry.resident():
+            MODEL_LOADED.set(1 if ml_manager.is_loaded else 0, model=name)
+            if ml_manager.load_seconds is not None:
+                MODEL_LOAD_SECONDS.set(round(ml_manager.load_seconds, 6), model=name)
+        stats = model_registry.stats()
+        MODELS_RESIDENT.set(stats['resident_models'])
+        MODEL_RELOADS.set(stats['reloads'])
+        MODEL_EVICTIONS.set(stats['evictions'])
+        if model_registry.cache:
+            stats = model_registry.cache.stats()
+            CACHE_LOOKUPS.set(stats['memory_hits'], result='memory_hit')
+            CACHE_LOOKUPS.set(stats['disk_hits'], result='disk_hit')
+            CACHE_LOOKUPS.set(stats['misses'], result='miss')
+            CACHE_EVICTIONS.set(stats['evictions'])
+            CACHE_ENTRIES.set(stats['memory_entries'], tier='memory')
+            CACHE_ENTRIES.set(stats['disk_entries'], tier='disk')
+        for name, rules in model_registry.rule_indexes().items():
+            stats = rules.stats()
+            RULE_LOOKUPS.set(stats['hits'], model=name, result='hit')
+            RULE_LOOKUPS.set(stats['misses'], model=name, result='miss')
+            RULE_ENTRIES.set(stats['rules'], model=name)
+
+    REGISTRY.add_collector(collect)
+
+
+def register_result_cache_collector(result_cache):
+    """Export result cache state on every scrape"""
+
+    def collect():
+        stats = result_cache.stats()
+        RESULT_CACHE_LOOKUPS.set(stats['hits'], result='hit')
+        RESULT_CACHE_LOOKUPS.set(stats['misses'], result='miss')
+        RESULT_CACHE_EVICTIONS.set(stats['evictions'])
+        RESULT_CACHE_ENTRIES.set(stats['entries'])
+        RESULT_CACHE_BYTES.set(stats['bytes'])
+
+    REGISTRY.add_collector(collect)
+
+
+def register_admission_collector(admission):
+    """Export upload admission state on every scrape"""
+
+    def collect():
+        stats = admission.stats()
+        ADMISSION_BUDGET.set(stats['budget_bytes'])
+        ADMISSION_IN_USE.set(stats['in_use_bytes'])
+        ADMISSION_ACTIVE.set(stats['active'])
+        ADMISSION_QUEUE_DEPTH.set(stats['queue_depth'])
+        ADMISSION_DECISIONS.set(stats['admitted'], result='admitted')
+        ADMISSION_DECISIONS.set(stats['queued'], result='queued')
+        ADMISSION_DECISIONS.set(stats['rejected'], result='rejected')
+        ADMISSION_WAIT_SECONDS.set(round(stats['wait_seconds'], 6))
+
+    REGISTRY.add_collector(collect)
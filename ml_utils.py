@@ -1,9 +1,11 @@
-import joblib
-import pickle
-import pandas as pd
-from tqdm import tqdm
+# pandas, numpy and joblib are imported where used so that importing this
+# module (and creating the app) stays cheap; models load in the background.
 from datetime import date
+import hashlib
 import logging
+import multiprocessing
+import threading
+import time
 import os
 
 logger = logging.getLogger(__name__)
@@ -12,24 +14,242 @@ logger = logging.getLogger(__name__)
 MODEL_PATH = "models/ayala_categorizer.joblib"
 LABEL_ENCODER_PATH = "models/ayala_label_encoder.joblib"
 
+# Memory-map model arrays so worker processes share the same pages.
+# Only takes effect for uncompressed joblib dumps (compress=0).
+MODEL_MMAP_MODE = 'r'
+
+# Persistent prediction cache (see prediction_cache.py)
+USE_PREDICTION_CACHE = True
+
+# Exact-match (supplier, description) rules answered before the model (see rule_index.py)
+USE_RULE_INDEX = True
+
+# Score TF-IDF + linear models with the compiled sparse scorer (see sparse_scorer.py);
+# other models, or False here, go through model.predict
+USE_COMPILED_SCORER = True
+
+# Leave the description column as uploaded and normalize into a side array, fill
+# S/NS, Major, Minor and Date as categoricals, and read Parquet/Arrow text as
+# Arrow-backed strings. False overwrites descriptions and fills object strings.
+COMPACT_DTYPES = True
+
+# Sharded multi-process inference (1 worker = serial)
+PARALLEL_WORKERS = 1
+PARALLEL_SHARD_SIZE = 100_000
+
+# Per-request progress lines on the console; the app disables them outside debug
+CONSOLE_PROGRESS = True
+
+# pandas.api.types.infer_dtype results for columns Arrow cannot store as one type
+MIXED_INFERRED_TYPES = ('mixed', 'mixed-integer')
+
 # Column names
 COL_DESCRIPTION = "Description"
 COL_SNS = "S/NS"
 COL_MAJOR = "Major Category"
 COL_MINOR = "Minor Category"
 COL_DATE = "Date"
+OUTPUT_COLUMNS = [COL_SNS, COL_MAJOR, COL_MINOR, COL_DATE]
+
+# Model (or compiled scorer) handed to forked shard workers; inherited copy-on-write, never pickled
+_shared_model = None
+_parallel_lock = threading.Lock()
+
+def _predict_shard(shard):
+    return _shared_model.predict(shard)
+
+def compute_model_version(*paths):
+    """Hash the model files so cached predictions are tied to exact model bytes"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+def set_console_progress(enabled):
+    """Turn per-request console progress output on or off"""
+    global CONSOLE_PROGRESS
+    CONSOLE_PROGRESS = bool(enabled)
+
+def progress(message):
+    """Print a per-request progress line when console progress is enabled"""
+    if CONSOLE_PROGRESS:
+        print(message)
+
+def split_label(label):
+    """Split a combined 'S/NS | Major | Minor' label into its three parts"""
+    parts = label.split(" | ", 2)
+    return tuple(parts + [None] * (3 - len(parts)))
+
+def normalize_descriptions(descriptions):
+    """Normalize description text the way the model was trained on it"""
+    return descriptions.astype(str).str.lower().str.strip()
+
+def blank_mask(series):
+    """Boolean array, True where a value is missing or only whitespace"""
+    import numpy as np
+    import pandas as pd
+    
+    # Strip each distinct value once instead of every row
+    codes, uniques = pd.factorize(series)
+    blank_uniques = np.asarray(pd.Index(uniques).astype(str).str.strip() == "", dtype=bool)
+    # Code -1 (missing) lands on the trailing True
+    return np.append(blank_uniques, True)[codes]
+
+def normalized_categories(descriptions):
+    """Normalized descriptions as a Categorical; each distinct value is normalized once"""
+    import pandas as pd
+    
+    codes, uniques = pd.factorize(descriptions, use_na_sentinel=False)
+    normalized_codes, normalized = pd.factorize(normalize_descriptions(pd.Series(uniques, dtype=object)))
+    return pd.Categorical.from_codes(normalized_codes[codes], categories=normalized)
+
+def text_column(series):
+    """Description column as uploaded, except numbers mixed into text become their string
+    form (missing values stay missing) so Parquet/Arrow outputs get one column type"""
+    import pandas as pd
+    
+    if series.dtype != object or pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series
+    return series.where(series.isna(), series.astype(str))
+
+def arrow_compatible(df):
+    """df with object and categorical columns that mix types (e.g. dates parsed in some rows,
+    text filled into others) as text, since Arrow needs one type per column; missing values stay missing"""
+    import pandas as pd
+    
+    mixed = {}
+    for name, series in df.items():
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            if pd.api.types.infer_dtype(series.cat.categories, skipna=True) in MIXED_INFERRED_TYPES:
+                mixed[name] = series.astype(object)
+        elif series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in MIXED_INFERRED_TYPES:
+            mixed[name] = series
+    if not mixed:
+        return df
+    df = df.copy(deep=False)
+    for name, series in mixed.items():
+        df[name] = series.where(series.isna(), series.astype(str))
+    return df
+
+def fill_categorical(series, positions, values):
+    """series as a Categorical with values (a Categorical) written at positions"""
+    import pandas as pd
+    
+    current = series.array if isinstance(series.dtype, pd.CategoricalDtype) else pd.Categorical(series)
+    categories = current.categories.union(values.categories, sort=False)
+    codes = current.set_categories(categories).codes.copy()
+    codes[positions] = values.set_categories(categories).codes
+    # Blank values that were replaced leave unused categories behind
+    return pd.Categorical.from_codes(codes, categories=categories).remove_unused_categories()
+
+class LabelDecodeTable:
+    """S/NS, Major and Minor category codes per encoder class, built once at load"""
+    
+    def __init__(self, classes):
+        import numpy as np
+        
+        self.classes = np.asarray(classes, dtype=object)
+        self.label_index = {label: i for i, label in enumerate(self.classes)}
+        parts = [split_label(str(label)) for label in self.classes]
+        
+        # column -> (sorted categories, category code per class; -1 = missing part)
+        self.columns = {}
+        for position, col in enumerate([COL_SNS, COL_MAJOR, COL_MINOR]):
+            values = [p[position] for p in parts]
+            categories = sorted({v for v in values if v is not None})
+            lookup = {v: i for i, v in enumerate(categories)}
+            codes = np.array([lookup.get(v, -1) for v in values], dtype=np.int32)
+            self.columns[col] = (categories, codes)
+    
+    def decode(self, class_indices):
+        """Return {column: pandas.Categorical} for an array of class indices"""
+        import pandas as pd
+        
+        return {
+            col: pd.Categorical.from_codes(codes.take(class_indices), categories=categories)
+            for col, (categories, codes) in self.columns.items()
+        }
+    
+    def decode_tuples(self, class_indices):
+        """Return a (S/NS, Major, Minor) tuple per class index"""
+        import numpy as np
+        
+        decoded = []
+        for categories, codes in self.columns.values():
+            # Code -1 lands on the trailing None
+            values = np.array(categories + [None], dtype=object)
+            decoded.append(values.take(codes.take(class_indices)))
+        return list(zip(*decoded))
+
+def merge_rule_labels(decoded, hit, labels):
+    """Spread model labels (rows where hit is False) and rule labels over all pending rows"""
+    import numpy as np
+    import pandas as pd
+    
+    # Split each distinct rule label once
+    codes, uniques = pd.factorize(labels)
+    parts = [split_label(str(label)) for label in uniques]
+    for position, col in enumerate([COL_SNS, COL_MAJOR, COL_MINOR]):
+        values = np.empty(len(hit), dtype=object)
+        values[~hit] = np.asarray(decoded[col], dtype=object)
+        values[hit] = np.array([p[position] for p in parts], dtype=object)[codes]
+        decoded[col] = pd.Categorical(values)
+    return decoded
 
 class MLModelManager:
     """Manages ML model loading and predictions"""
     
-    def __init__(self):
+    def __init__(self, cache=None, n_workers=None, shard_size=None, rules=None):
         self.model = None
         self.label_encoder = None
+        self.decode_table = None
+        self.model_version = None
+        self.scorer = None
+        self.cache = cache  # None = open the default cache on load, False = disabled
+        self.rules = rules  # This model's RuleIndex (rules hold its labels), or None
+        self.n_workers = n_workers or PARALLEL_WORKERS
+        self.shard_size = shard_size or PARALLEL_SHARD_SIZE
         self.is_loaded = False
+        self.is_loading = False
+        self.load_seconds = None
+        self._load_finished = threading.Event()
         print("🔧 MLModelManager initialized")
     
+    def load_models_in_background(self, model_path=None, encoder_path=None):
+        """Start load_models on a daemon thread; poll is_loaded or wait_until_loaded()"""
+        self.is_loading = True
+        self._load_finished.clear()
+        thread = threading.Thread(
+            target=self.load_models,
+            args=(model_path, encoder_path),
+            name="model-loader",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+    
+    def wait_until_loaded(self, timeout=None):
+        """Block until a background load finishes; returns is_loaded"""
+        if self.is_loading:
+            self._load_finished.wait(timeout)
+        return self.is_loaded
+    
     def load_models(self, model_path=None, encoder_path=None):
         """Load ML models with comprehensive error handling"""
+        self.is_loading = True
+        started = time.perf_counter()
+        try:
+            return self._load_models(model_path, encoder_path)
+        finally:
+            self.load_seconds = time.perf_counter() - started
+            self.is_loading = False
+            self._load_finished.set()
+    
+    def _load_models(self, model_path, encoder_path):
+        started = time.perf_counter()
+        
         # Use default paths if not provided
         if model_path is None:
             model_path = MODEL_PATH
@@ -68,18 +288,42 @@ class MLModelManager:
                 logger.error(f"Encoder file not found: {encoder_path}")
                 return False
             
+            import joblib
+            
             # Load model
             print(f"📥 Loading model from: {model_path}")
-            self.model = joblib.load(model_path)
+            self.model = joblib.load(model_path, mmap_mode=MODEL_MMAP_MODE)
             print(f"✅ Model loaded: {type(self.model)}")
             
             # Load encoder
             print(f"📥 Loading encoder from: {encoder_path}")
-            self.label_encoder = joblib.load(encoder_path)
+            self.label_encoder = joblib.load(encoder_path, mmap_mode=MODEL_MMAP_MODE)
             print(f"✅ Encoder loaded: {type(self.label_encoder)}")
             
+            # Extract vocabulary, IDF and coefficients for the sparse scorer
+            self.scorer = None
+            if USE_COMPILED_SCORER:
+                from sparse_scorer import compile_scorer
+                self.scorer = compile_scorer(self.model)
+                print(f"⚡ Compiled sparse scorer: {'enabled' if self.scorer else 'unsupported model, using model.predict'}")
+            
+            # Split the encoder classes once instead of per predicted row
+            self.decode_table = LabelDecodeTable(self.label_encoder.classes_)
+            print(f"🔓 Decode table built: {len(self.decode_table.classes)} classes")
+            
+            self.model_version = compute_model_version(model_path, encoder_path)
+            print(f"🏷️ Model version: {self.model_version}")
+            
+            if self.cache is None and USE_PREDICTION_CACHE:
+                try:
+                    from prediction_cache import PredictionCache
+                    self.cache = PredictionCache()
+                except Exception as e:
+                    print(f"⚠️ Prediction cache unavailable: {e}")
+                    logger.warning(f"Prediction cache unavailable: {e}")
+            
             self.is_loaded = True
-            print("🎉 ML models loaded successfully!")
+            print(f"🎉 ML models loaded successfully in {time.perf_counter() - started:.2f}s!")
             logger.info("ML models loaded successfully")
             return True
             
@@ -88,68 +332,259 @@ class MLModelManager:
             print(f"💡 Check if your model files are valid joblib files")
             logger.error(f"Error loading ML models: {e}")
             self.model = None
+            self.scorer = None
             self.label_encoder = None
+            self.decode_table = None
+            self.model_version = None
             self.is_loaded = False
             return False
     
-    def predict_categories(self, df, description_column):
-        """Apply ML prediction to the dataframe"""
+    def predict_categories(self, df, description_column, supplier_column=None, category_column=None):
+        """Apply ML prediction to the rows whose output columns are missing or blank"""
+        progress(f"🔍 Starting prediction on {len(df)} rows...")
+        progress(f"📊 Using description column: {description_column}")
+        
+        sheets, stats = self.predict_sheets({None: df}, description_column, supplier_column, category_column)
+        df = sheets[None]
+        df.attrs['prediction_stats'] = stats
+        
+        progress("🎉 Prediction process completed successfully!")
+        return df
+    
+    def predict_sheets(self, sheets, description_column, supplier_column=None, category_column=None):
+        """Predict several DataFrames (e.g. workbook sheets) in one deduplicated model pass.
+        
+        sheets maps a name to a DataFrame; frames are updated in place. With a rule
+        index, rows matching a learned (supplier, description) rule skip the model;
+        supplier_column and category_column are optional and used when present.
+        Returns (sheets, stats) with stats summed over all frames.
+        """
+        import numpy as np
+        import pandas as pd
+        
         if not self.is_loaded:
             raise Exception("ML models not loaded. Call load_models() first.")
         
         if self.model is None or self.label_encoder is None:
             raise Exception("ML models are None. Check model loading.")
         
-        print(f"🔍 Starting prediction on {len(df)} rows...")
-        print(f"📊 Using description column: {description_column}")
-        
         # Validate description column exists
-        if description_column not in df.columns:
-            raise Exception(f"Description column '{description_column}' not found in dataframe")
+        for df in sheets.values():
+            if description_column not in df.columns:
+                raise Exception(f"Description column '{description_column}' not found in dataframe")
         
-        # Prepare description column
-        df[description_column] = df[description_column].astype(str).str.lower().str.strip()
+        # Seconds spent per stage, reported in the prediction stats
+        timings = dict.fromkeys(['normalize', 'mask', 'rules', 'predict', 'decode', 'fill'], 0.0)
+        plans = {name: self._rows_needing_prediction(df, description_column, timings)
+                 for name, df in sheets.items()}
+        total_rows = sum(len(df) for df in sheets.values())
+        pending_rows = sum(len(rows) for rows, _, _ in plans.values())
+        progress(f"🎯 Rows needing prediction: {pending_rows} of {total_rows}")
         
-        # Predict categories
-        print("🔍 Predicting categories...")
-        try:
-            preds = list(tqdm(self.model.predict(df[description_column]), total=len(df), desc="⏳ Predicting"))
-            print(f"✅ Predictions completed: {len(preds)} predictions made")
-        except Exception as e:
-            raise Exception(f"Model prediction failed: {e}")
+        # Rows answered by a learned rule never reach the model
+        started = time.perf_counter()
+        rule_hits = {}
+        if self.rules is not None:
+            for name, (rows, _, _) in plans.items():
+                rule_hits[name] = self.rules.apply(sheets[name], rows, description_column, supplier_column, category_column)
+        model_rows = {name: rows[~rule_hits[name][0]] if name in rule_hits else rows
+                      for name, (rows, _, _) in plans.items()}
+        rule_rows = pending_rows - sum(len(rows) for rows in model_rows.values())
+        timings['rules'] = time.perf_counter() - started
+        if self.rules is not None:
+            progress(f"📒 Rule index hits: {rule_rows} of {pending_rows}")
+        
+        # Every frame's remaining rows go through the model together
+        started = time.perf_counter()
+        if pending_rows - rule_rows:
+            parts = [plans[name][2].take(rows) for name, rows in model_rows.items()]
+            if COMPACT_DTYPES:
+                from pandas.api.types import union_categoricals
+                descriptions = pd.Series(union_categoricals(parts))
+            else:
+                descriptions = pd.concat(parts, ignore_index=True)
+            classes, n_unique = self._predict_classes(descriptions)
+        else:
+            classes, n_unique = np.empty(0, dtype=np.intp), 0
+        timings['predict'] = time.perf_counter() - started
+        model_pending = pending_rows - rule_rows
+        unique_ratio = n_unique / model_pending if model_pending else 0.0
+        progress(f"🧮 Unique-to-total ratio: {unique_ratio:.3f}")
+        
+        offset = 0
+        for name, (rows, blanks, _) in plans.items():
+            count = len(model_rows[name])
+            self._fill_predictions(sheets[name], rows, blanks, classes[offset:offset + count], timings,
+                                   rule_hits.get(name))
+            offset += count
         
-        # Decode predicted labels
-        print("🔓 Decoding labels...")
+        return sheets, {
+            'total_rows': total_rows,
+            'predicted_rows': pending_rows,
+            'rule_rows': rule_rows,
+            'unique_descriptions': n_unique,
+            'unique_ratio': unique_ratio,
+            'timings': timings,
+        }
+    
+    def _rows_needing_prediction(self, df, description_column, timings):
+        """Normalize descriptions; return (row positions to predict, {column: blank mask}, normalized descriptions)"""
+        import numpy as np
+        
+        started = time.perf_counter()
+        if COMPACT_DTYPES:
+            # The uploaded text stays as is; the model reads the normalized side array
+            descriptions = normalized_categories(df[description_column])
+            df[description_column] = text_column(df[description_column])
+        else:
+            df[description_column] = normalize_descriptions(df[description_column])
+            descriptions = df[description_column]
+        timings['normalize'] += time.perf_counter() - started
+        
+        # Rows needing a prediction: any output column missing or blank
+        started = time.perf_counter()
+        blanks = {col: blank_mask(df[col]) for col in OUTPUT_COLUMNS if col in df.columns}
+        if len(blanks) < len(OUTPUT_COLUMNS):
+            rows = np.arange(len(df))
+        else:
+            rows = np.flatnonzero(np.logical_or.reduce(list(blanks.values())))
+        timings['mask'] += time.perf_counter() - started
+        return rows, blanks, descriptions
+    
+    def _fill_predictions(self, df, rows, blanks, classes, timings, rule_hits=None):
+        """Write decoded predictions for rows back into df by position.
+        
+        classes covers the rows not answered by rules; rule_hits is (hit mask over rows, labels).
+        """
+        import numpy as np
+        import pandas as pd
+        
+        # Decode class indices through the precomputed table
+        progress("🔓 Decoding labels...")
+        started = time.perf_counter()
         try:
-            decoded_labels = list(tqdm(self.label_encoder.inverse_transform(preds), total=len(preds), desc="🔄 Decoding"))
-            print(f"✅ Label decoding completed: {len(decoded_labels)} labels decoded")
+            decoded = self.decode_table.decode(classes)
+            if rule_hits is not None and rule_hits[0].any():
+                decoded = merge_rule_labels(decoded, *rule_hits)
+            today = date.today().strftime("%d-%m-%Y")
+            if COMPACT_DTYPES:
+                decoded[COL_DATE] = pd.Categorical.from_codes(np.zeros(len(rows), dtype=np.int8), categories=[today])
+            else:
+                decoded[COL_DATE] = today
+            progress(f"✅ Label decoding completed: {len(rows)} labels decoded")
         except Exception as e:
             raise Exception(f"Label decoding failed: {e}")
+        timings['decode'] += time.perf_counter() - started
         
-        # Split decoded labels into components
-        print("📊 Processing predictions...")
+        progress("📊 Processing predictions...")
+        started = time.perf_counter()
         try:
-            pred_df = pd.DataFrame(decoded_labels, columns=['Combined'])
-            pred_df[[COL_SNS, COL_MAJOR, COL_MINOR]] = pred_df['Combined'].str.split(" \| ", expand=True)
-            pred_df.drop(columns=['Combined'], inplace=True)
-            pred_df[COL_DATE] = date.today().strftime("%d-%m-%Y")
-            
-            # Add prediction columns if they don't exist
-            for col in [COL_SNS, COL_MAJOR, COL_MINOR, COL_DATE]:
-                if col not in df.columns:
-                    df[col] = ""
-            
-            # Fill only if current values are missing or blank
-            print("✏️ Updating missing prediction fields...")
-            for col in [COL_SNS, COL_MAJOR, COL_MINOR, COL_DATE]:
-                mask = df[col].isna() | (df[col].astype(str).str.strip() == "")
-                df.loc[mask, col] = pred_df.loc[mask, col]
-            
-            print("🎉 Prediction process completed successfully!")
-            return df
-            
+            for col in OUTPUT_COLUMNS:
+                if col not in blanks:
+                    # New columns cover every row; labels keep the compact categoricals
+                    df[col] = decoded[col]
+                    continue
+                
+                # Fill only if current values are missing or blank, by position
+                positions = np.flatnonzero(blanks[col])
+                if not len(positions):
+                    continue
+                if COMPACT_DTYPES:
+                    # blanks[col] is a subset of rows, so locate each position in rows
+                    values = decoded[col].take(np.searchsorted(rows, positions))
+                    df[col] = fill_categorical(df[col], positions, values)
+                    continue
+                if df[col].dtype != object:
+                    # e.g. categoricals from Parquet/Arrow, or all-NaN float columns
+                    df[col] = df[col].astype(object)
+                values = decoded[col]
+                if col != COL_DATE:
+                    # blanks[col] is a subset of rows, so locate each position in rows
+                    values = np.asarray(values, dtype=object)[np.searchsorted(rows, positions)]
+                df.iloc[positions, df.columns.get_loc(col)] = values
         except Exception as e:
             raise Exception(f"Error processing predictions: {e}")
+        timings['fill'] += time.perf_counter() - started
+
+    def _predict_classes(self, descriptions):
+        """Encoded class index per row for normalized descriptions; returns (classes, n_unique)"""
+        import numpy as np
+        import pandas as pd
+        
+        # Deduplicate: predict once per distinct description
+        codes, unique_descriptions = pd.factorize(descriptions, sort=False)
+        if isinstance(unique_descriptions.dtype, pd.CategoricalDtype):
+            # Compact side arrays: predict and cache the plain strings
+            unique_descriptions = pd.Index(np.asarray(unique_descriptions, dtype=object))
+        progress(f"🧮 Unique descriptions: {len(unique_descriptions)} of {len(descriptions)} rows")
+        
+        # Look up previously predicted descriptions
+        unique_classes = np.empty(len(unique_descriptions), dtype=np.intp)
+        pending = np.arange(len(unique_descriptions))
+        if self.cache:
+            cached = self.cache.get_many(self.model_version, unique_descriptions.tolist())
+            if cached:
+                label_index = self.decode_table.label_index
+                hit = np.fromiter((d in cached for d in unique_descriptions), dtype=bool, count=len(unique_descriptions))
+                unique_classes[hit] = [label_index[cached[d]] for d in unique_descriptions[hit]]
+                pending = np.flatnonzero(~hit)
+            progress(f"🗄️ Cache hits: {len(cached)}, misses: {len(pending)}")
+        
+        # Predict categories
+        progress("🔍 Predicting categories...")
+        try:
+            to_predict = unique_descriptions[pending]
+            preds = self._predict(to_predict) if len(to_predict) else []
+            progress(f"✅ Predictions completed: {len(preds)} predictions made")
+        except Exception as e:
+            raise Exception(f"Model prediction failed: {e}")
+        
+        if len(preds):
+            unique_classes[pending] = preds
+            if self.cache:
+                labels = self.decode_table.classes.take(unique_classes[pending])
+                self.cache.put_many(self.model_version, dict(zip(to_predict.tolist(), labels.tolist())))
+        
+        # Broadcast back to every row through the factorize codes
+        return unique_classes.take(codes), len(unique_descriptions)
+    
+    def predict_descriptions(self, descriptions):
+        """Predict (S/NS, Major Category, Minor Category) for a list of raw descriptions"""
+        import pandas as pd
+        
+        if not self.is_loaded:
+            raise Exception("ML models not loaded. Call load_models() first.")
+        
+        normalized = normalize_descriptions(pd.Series(descriptions, dtype=object))
+        classes, _ = self._predict_classes(normalized)
+        return self.decode_table.decode_tuples(classes)
+
+    def _predict(self, descriptions):
+        """Run model.predict (or the compiled scorer), sharded across forked workers when configured"""
+        predictor = self.scorer or self.model
+        can_fork = 'fork' in multiprocessing.get_all_start_methods()
+        if self.n_workers <= 1 or len(descriptions) <= self.shard_size or not can_fork:
+            return predictor.predict(descriptions)
+        
+        import numpy as np
+        global _shared_model
+        descriptions = np.asarray(descriptions, dtype=object)
+        shards = [descriptions[start:start + self.shard_size]
+                  for start in range(0, len(descriptions), self.shard_size)]
+        workers = min(self.n_workers, len(shards))
+        progress(f"🧩 Predicting {len(shards)} shards on {workers} workers")
+        
+        with _parallel_lock:
+            _shared_model = predictor
+            try:
+                # Fork after publishing the model so workers share its pages
+                with multiprocessing.get_context('fork').Pool(workers) as pool:
+                    results = pool.map(_predict_shard, shards)
+            finally:
+                _shared_model = None
+        
+        # pool.map preserves shard order, so rows line up with the serial path
+        return np.concatenate(results)
 
 # Test function to check if models can be loaded
 def test_model_loading():
@@ -166,16 +601,13 @@ def test_model_loading():
         return False
 
 # Legacy function for backward compatibility
-def predict_categories(df, description_column):
-    """Legacy function - creates a temporary MLModelManager instance"""
-    manager = MLModelManager()
-    if manager.load_models():
-        return manager.predict_categories(df, description_column)
-    else:
+def predict_categories(df, description_column, supplier_column=None, category_column=None):
+    """Legacy function - predicts with the default model of the process-wide registry"""
+    from model_registry import default_registry
+    manager = default_registry().get()
+    if manager is None:
         raise Exception("ML models could not be loaded")
-
-# Create global instance
-ml_manager = MLModelManager()
+    return manager.predict_categories(df, description_column, supplier_column, category_column)
 
 if __name__ == "__main__":
     # Run test when script is executed directly
@@ -0,0 +1,376 @@
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from ml_utils import MLModelManager, MODEL_PATH, USE_PREDICTION_CACHE, USE_RULE_INDEX
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ MODEL REGISTRY CONFIGURATIONS ---
+# A model is a pair of files in MODELS_DIR: <name>_categorizer.joblib and
+# <name>_label_encoder.joblib (the default pair is named "ayala")
+MODELS_DIR = os.path.dirname(MODEL_PATH)
+MODEL_SUFFIX = "_categorizer.joblib"
+ENCODER_SUFFIX = "_label_encoder.joblib"
+DEFAULT_MODEL = os.path.basename(MODEL_PATH)[:-len(MODEL_SUFFIX)]
+
+# Least recently used models are unloaded beyond either limit; the default stays
+MAX_RESIDENT_MODELS = 4
+MODEL_MEMORY_BUDGET_MB = 2048
+
+# How often the models directory is polled for new versions
+MODEL_WATCH_INTERVAL_SECONDS = 10
+
+
+def file_signature(paths):
+    """(mtime_ns, size) per file; changes whenever a model is replaced"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class _Entry:
+    """A resident model and the file signature it was loaded from"""
+
+    def __init__(self, name, manager, signature):
+        self.name = name
+        self.manager = manager
+        self.signature = signature
+        self.size_bytes = sum(size for _, size in signature or ())
+        self.last_used = time.time()
+
+
+class ModelRegistry:
+    """Named models kept resident with LRU eviction and hot reload from the models directory"""
+
+    def __init__(self, models_dir=None, default_model=None, max_resident=None, memory_budget_mb=None,
+                 cache=None, rules=None, n_workers=None, shard_size=None):
+        self.models_dir = models_dir or MODELS_DIR
+        self.default_model = default_model or DEFAULT_MODEL
+        self.max_resident = max_resident or MAX_RESIDENT_MODELS
+        self.memory_budget = (memory_budget_mb or MODEL_MEMORY_BUDGET_MB) * 1024 * 1024
+        self.cache = cache  # None = share the default cache between models, False = disabled
+        self.rules = rules  # None = one rule index per model, False = disabled
+        self.n_workers = n_workers
+        self.shard_size = shard_size
+        self.reloads = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # Model name -> its RuleIndex (False if it could not be opened); kept across evictions
+        self._rule_indexes = {}
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def discover(self):
+        """{model name: (model path, encoder path)} for every complete pair in the models directory"""
+        try:
+            files = set(os.listdir(self.models_dir))
+        except FileNotFoundError:
+            return {}
+        models = {}
+        for filename in sorted(files):
+            if not filename.endswith(MODEL_SUFFIX):
+                continue
+            name = filename[:-len(MODEL_SUFFIX)]
+            if name + ENCODER_SUFFIX in files:
+                models[name] = (
+                    os.path.join(self.models_dir, filename),
+                    os.path.join(self.models_dir, name + ENCODER_SUFFIX),
+                )
+        return models
+
+    def names(self):
+        """Available model names, default first"""
+        names = sorted(self.discover())
+        if self.default_model in names:
+            names.remove(self.default_model)
+            names.insert(0, self.default_model)
+        return names
+
+    def preload(self, name=None):
+        """Start loading a model in the background; returns its manager"""
+        name = name or self.default_model
+        with self._lock:
+            entry = self._entries.get(name) or self._load(name)
+        return entry.manager if entry else None
+
+    def get(self, name=None, timeout=None):
+        """Loaded manager for a model (the default when name is empty), loading it on first use.
+
+        Returns None if the model cannot be loaded within timeout; raises for unknown names.
+        """
+        name = name or self.default_model
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._load(name)
+                if entry is None:
+                    if name == self.default_model:
+                        return None
+                    raise Exception(f"Unknown model: {name}")
+            self._entries.move_to_end(name)
+            entry.last_used = time.time()
+            # Requests keep this manager even if a reload swaps in a newer one
+            manager = entry.manager
+
+        if not manager.wait_until_loaded(timeout):
+            return None
+        return manager
+
+    def _rule_index(self, name):
+        """The model's own rule index: labels come from the model's label set. Caller holds the lock"""
+        if self.rules is False or not USE_RULE_INDEX:
+            return None
+        if name not in self._rule_indexes:
+            try:
+                from rule_index import RuleIndex, rule_index_path
+                # The default model keeps the original rule index file
+                self._rule_indexes[name] = RuleIndex(rule_index_path(None if name == DEFAULT_MODEL else name))
+            except Exception as e:
+                print(f"⚠️ Rule index of model {name} unavailable: {e}")
+                logger.warning(f"Rule index of model {name} unavailable: {e}")
+                self._rule_indexes[name] = False
+        return self._rule_indexes[name] if self._rule_indexes[name] is not False else None
+
+    def rule_indexes(self):
+        """{model name: RuleIndex} for every rule index opened so far"""
+        with self._lock:
+            return {name: index for name, index in self._rule_indexes.items() if index is not False}
+
+    def _new_manager(self, name):
+        """Manager for a model; caller holds the lock"""
+        if self.cache is None and USE_PREDICTION_CACHE:
+            try:
+                from prediction_cache import PredictionCache
+                self.cache = PredictionCache()
+            except Exception as e:
+                print(f"⚠️ Prediction cache unavailable: {e}")
+                logger.warning(f"Prediction cache unavailable: {e}")
+                self.cache = False
+        return MLModelManager(
+            cache=self.cache or False,
+            rules=self._rule_index(name),
+            n_workers=self.n_workers,
+            shard_size=self.shard_size,
+        )
+
+    def _load(self, name):
+        """Start a background load and make the model resident; caller holds the lock"""
+        paths = self.discover().get(name)
+        if paths is None:
+            return None
+        manager = self._new_manager(name)
+        manager.load_models_in_background(*paths)
+        entry = _Entry(name, manager, file_signature(paths))
+        self._entries[name] = entry
+        print(f"📦 Loading model {name}")
+        self._evict(keep=name)
+        return entry
+
+    def _evict(self, keep):
+        """Unload least recently used models beyond the count or memory budget"""
+        while True:
+            total = sum(entry.size_bytes for entry in self._entries.values())
+            if len(self._entries) <= self.max_resident and total <= self.memory_budget:
+                return
+            victim = next((name for name in self._entries if name not in (keep, self.default_model)), None)
+            if victim is None:
+                return
+            self._entries.pop(victim)
+            self._pending.pop(victim, None)
+            self.evictions += 1
+            print(f"♻️ Model {victim} evicted ({total / 2**20:.0f}MB resident)")
+
+    def reload(self, name, paths=None, signature=None):
+        """Load a model's current files next to the resident version, then swap them in"""
+        paths = paths or self.discover().get(name)
+        if paths is None:
+            raise Exception(f"Unknown model: {name}")
+        signature = signature or file_signature(paths)
+
+        with self._lock:
+            manager = self._new_manager(name)
+        if not manager.load_models(*paths):
+            print(f"⚠️ Reload of model {name} failed; keeping the resident version")
+            logger.warning(f"Reload of model {name} failed; keeping the resident version")
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    # Not retried until the files change again
+                    entry.signature = signature
+            return False
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self._entries[name] = _Entry(name, manager, signature)
+                self._evict(keep=name)
+            else:
+                # Single attribute swap: new requests see the new version, in-flight ones finish on the old
+                entry.manager = manager
+                entry.signature = signature
+                entry.size_bytes = sum(size for _, size in signature or ())
+            self.reloads += 1
+        print(f"🔄 Model {name} now serving version {manager.model_version}")
+        logger.info(f"Model {name} reloaded: version {manager.model_version}")
+        return True
+
+    def check_for_updates(self):
+        """Reload resident models whose files changed; returns the names reloaded"""
+        discovered = self.discover()
+        with self._lock:
+            entries = list(self._entries.values())
+
+        reloaded = []
+        for entry in entries:
+            paths = discovered.get(entry.name)
+            if paths is None:
+                # Files removed: keep serving the resident version
+                continue
+            signature = file_signature(paths)
+            if signature is None or signature == entry.signature:
+                self._pending.pop(entry.name, None)
+                continue
+            # Wait for one unchanged poll so half-copied files are never loaded
+            if self._pending.get(entry.name) != signature:
+                self._pending[entry.name] = signature
+                continue
+            self._pending.pop(entry.name, None)
+            if self.reload(entry.name, paths, signature):
+                reloaded.append(entry.name)
+        return reloaded
+
+    def start_watching(self, interval=None):
+        """Poll the models directory for new versions on a daemon thread"""
+        interval = interval or MODEL_WATCH_INTERVAL_SECONDS
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.check_for_updates()
+                except Exception as e:
+                    logger.warning(f"Model watcher failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+        print(f"👀 Watching {self.models_dir} for model updates every {interval}s")
+        return self._watcher
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def predict_items(self, items):
+        """Predict (model name, description) pairs grouped per model, keeping input order"""
+        positions = {}
+        for i, (name, _) in enumerate(items):
+            positions.setdefault(name or self.default_model, []).append(i)
+
+        results = [None] * len(items)
+        for name, indices in positions.items():
+            manager = self.get(name)
+            if manager is None:
+                raise Exception(f"Model not available: {name}")
+            labels = manager.predict_descriptions([items[i][1] for i in indices])
+            for i, label in zip(indices, labels):
+                results[i] = label
+        return results
+
+    def describe(self):
+        """Available and resident models for the /models endpoint"""
+        discovered = self.discover()
+        with self._lock:
+            entries = dict(self._entries)
+
+        models = []
+        for name in sorted(set(discovered) | set(entries)):
+            entry = entries.get(name)
+            manager = entry.manager if entry else None
+            models.append({
+                'name': name,
+                'default': name == self.default_model,
+                'resident': entry is not None,
+                'loaded': bool(manager and manager.is_loaded),
+                'loading': bool(manager and manager.is_loading),
+                'version': manager.model_version if manager else None,
+                'load_seconds': manager.load_seconds if manager else None,
+                'size_mb': round(entry.size_bytes / 2**20, 1) if entry else None,
+                'last_used': entry.last_used if entry else None,
+            })
+        return models
+
+    def stats(self):
+        """Counters for /models and /metrics"""
+        with self._lock:
+            resident = list(self._entries.values())
+        return {
+            'default_model': self.default_model,
+            'resident_models': len(resident),
+            'resident_mb': round(sum(entry.size_bytes for entry in resident) / 2**20, 1),
+            'memory_budget_mb': round(self.memory_budget / 2**20, 1),
+            'max_resident_models': self.max_resident,
+            'reloads': self.reloads,
+            'evictions': self.evictions,
+        }
+
+    def resident(self):
+        """(name, manager) for every resident model"""
+        with self._lock:
+            return [(entry.name, entry.manager) for entry in self._entries.values()]
+
+    def is_ready(self, name=None):
+        """True once a model (the default when name is empty) is loaded and serving"""
+        with self._lock:
+            entry = self._entries.get(name or self.default_model)
+        return bool(entry and entry.manager.is_loaded)
+
+    def _stores(self):
+        # An empty RuleIndex is falsy (len 0), so compare with False
+        return [store for store in (self.cache, *self._rule_indexes.values()) if store is not False and store is not None]
+
+    def fork(self):
+        """os.fork() with the prediction cache and rule index closed in the parent.
+
+        The child reopens them with reconnect_stores(); the registry lock is held so
+        no model swap is half-done in the child.
+        """
+        with self._lock:
+            for store in self._stores():
+                store.close()
+            return os.fork()
+
+    def reconnect_stores(self):
+        """Reopen the SQLite connections closed by fork()"""
+        for store in self._stores():
+            store.reconnect()
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def default_registry():
+    """Process-wide registry, for callers without an app (e.g. ml_utils.predict_categories)"""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
+
+
+def set_default_registry(registry):
+    """Let legacy callers share the app's resident models"""
+    global _default_registry
+    with _default_lock:
+        _default_registry = registry
@@ -0,0 +1,408 @@
+"""Supplier name matching against a master list of vendor names.
+
+Names are normalized, split into character trigrams and weighted with TF-IDF.
+Candidates for each query come from an inverted index over its rarest trigrams;
+only those candidates are scored (cosine similarity), so a query is never
+compared with the whole master list.
+
+Build the index once from the master list (from the repository root):
+    python name_matcher.py build vendors.csv --name-column "Vendor Name" --id-column "Vendor ID"
+
+then match files against it:
+    python name_matcher.py match invoices.csv --name-column Supplier --output matched.csv
+"""
+import os
+import threading
+import time
+import logging
+
+from ml_utils import progress
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ NAME MATCHING CONFIGURATIONS ---
+# Prebuilt index of the master list; memory-mapped so worker processes share its pages
+NAME_INDEX_PATH = "models/supplier_name_index.joblib"
+NAME_INDEX_MMAP_MODE = 'r'
+
+NGRAM_SIZE = 3
+
+# Candidates come from the postings of each query's rarest n-grams, up to
+# BLOCKING_NGRAMS of them while their postings total at most BLOCKING_MAX_POSTINGS
+# (the rarest one is always used)
+BLOCKING_NGRAMS = 8
+BLOCKING_MAX_POSTINGS = 20_000
+
+# Candidates sharing less than this fraction of the best candidate's blocking
+# weight are dropped; up to MAX_CANDIDATES of the rest are scored exactly
+CANDIDATE_MIN_RATIO = 0.5
+MAX_CANDIDATES = 100
+
+# Distinct query names scored per batch; bounds the candidate matrices held at once
+MATCH_BATCH_ROWS = 1_000
+
+DEFAULT_TOP_K = 3
+
+# Uploads only get a match at or above this similarity (0-1)
+MIN_MATCH_SCORE = 0.6
+
+# Columns added to matched uploads
+COL_MATCHED_NAME = "Matched Supplier"
+COL_MATCHED_ID = "Matched Supplier ID"
+COL_MATCH_SCORE = "Match Score"
+
+# Legal forms dropped from names before matching ("Acme Ltd." == "ACME Limited")
+LEGAL_SUFFIXES = (
+    "ag", "bv", "co", "company", "corp", "corporation", "gmbh", "inc", "incorporated",
+    "limited", "llc", "llp", "lp", "ltd", "nv", "plc", "pte", "pty", "sa", "sarl", "srl",
+)
+_LEGAL_SUFFIX_PATTERN = r"\b(?:" + "|".join(LEGAL_SUFFIXES) + r")\b"
+
+_INDEX_FORMAT = 1
+
+
+def normalize_names(names):
+    """Lowercase ASCII names without punctuation or legal forms; each distinct value is normalized once"""
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(pd.Series(names, dtype=object), use_na_sentinel=False)
+    missing = np.asarray(pd.isna(uniques), dtype=bool)
+    text = pd.Series(uniques, dtype=object).where(~missing, "").astype(str)
+    text = (text.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+            .str.lower().str.replace("&", " and ", regex=False)
+            .str.replace(r"[^a-z0-9]+", " ", regex=True))
+    stripped = text.str.replace(_LEGAL_SUFFIX_PATTERN, " ", regex=True)
+    # A name that is only a legal form keeps it
+    text = stripped.where(stripped.str.strip() != "", text)
+    text = text.str.replace(r"\s+", " ", regex=True).str.strip()
+    return text.to_numpy(dtype=object)[codes]
+
+
+def _rank_per_row(rows, values):
+    """(order, rank): positions sorted by row, then value (descending), and each one's rank within its row"""
+    import numpy as np
+
+    order = np.lexsort((-values, rows))
+    sorted_rows = rows[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_rows, sorted_rows, side='left')
+    return order, rank
+
+
+def _top_positions(rows, values, k):
+    """Positions of the k largest values per row, ordered by row, then value (descending)"""
+    order, rank = _rank_per_row(rows, values)
+    return order[rank < k]
+
+
+def _row_ids(matrix):
+    """Row of each stored entry of a CSR matrix"""
+    import numpy as np
+
+    return np.repeat(np.arange(matrix.shape[0], dtype=np.int64), np.diff(matrix.indptr))
+
+
+def _clean_ids(ids):
+    """Ids as plain Python values with None for missing ones.
+
+    A numeric id column with blanks is read as float; whole-number floats go back
+    to ints so ids stay 1, 2, 3 rather than 1.0, 2.0, 3.0
+    """
+    import numpy as np
+    import pandas as pd
+
+    ids = pd.Series(np.asarray(ids, dtype=object)).infer_objects()
+    if pd.api.types.is_float_dtype(ids):
+        present = ids.dropna()
+        if (present % 1 == 0).all():
+            ids = ids.astype('Int64')
+    return np.array([None if pd.isna(value) else value.item() if isinstance(value, np.generic) else value
+                     for value in ids.astype(object)], dtype=object)
+
+
+class NameIndex:
+    """Character n-gram TF-IDF vectors of the master names with an n-gram -> names inverted index"""
+
+    def __init__(self, names, ids, vectorizer, matrix, postings, version=None):
+        import numpy as np
+
+        self.names = names
+        self.ids = ids
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.postings = postings
+        self.posting_lengths = np.diff(postings.indptr)
+        self.idf = np.asarray(vectorizer.idf_, dtype=np.float32)
+        self.version = version
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def build(cls, names, ids=None, ngram_size=None):
+        """Index a master list of names (and optional ids, one per name)"""
+        import numpy as np
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        started = time.perf_counter()
+        names = np.asarray(names, dtype=object)
+        if ids is not None:
+            ids = _clean_ids(ids)
+            if len(ids) != len(names):
+                raise Exception("Every master name needs an id")
+        ngram_size = ngram_size or NGRAM_SIZE
+        vectorizer = TfidfVectorizer(
+            analyzer='char_wb',
+            ngram_range=(ngram_size, ngram_size),
+            lowercase=False,
+            sublinear_tf=True,
+            dtype=np.float32,
+        )
+        matrix = vectorizer.fit_transform(normalize_names(names)).tocsr()
+        # n-gram -> names holding it, with the same weights, for candidate blocking
+        postings = matrix.T.tocsr()
+        index = cls(names, ids, vectorizer, matrix, postings)
+        print(f"🗂️ Name index built: {len(names)} names, {len(vectorizer.vocabulary_)} n-grams "
+              f"in {time.perf_counter() - started:.2f}s")
+        return index
+
+    def save(self, path=None):
+        """Write the index uncompressed so it can be memory-mapped on load"""
+        import joblib
+
+        path = path or NAME_INDEX_PATH
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        state = {
+            'format': _INDEX_FORMAT,
+            'names': self.names,
+            'ids': self.ids,
+            'vectorizer': self.vectorizer,
+            'matrix': self.matrix,
+            'postings': self.postings,
+        }
+        # Readers never see a partly written index
+        temp_path = f"{path}.tmp"
+        joblib.dump(state, temp_path, compress=0)
+        os.replace(temp_path, path)
+        print(f"💾 Name index saved: {path}")
+
+    @classmethod
+    def load(cls, path=None, mmap_mode=NAME_INDEX_MMAP_MODE):
+        import joblib
+        from ml_utils import compute_model_version
+
+        path = path or NAME_INDEX_PATH
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        if not isinstance(state, dict) or state.get('format') != _INDEX_FORMAT:
+            raise Exception(f"Unsupported name index file: {path}; rebuild it with name_matcher.py build")
+        ids = None if state['ids'] is None else _clean_ids(state['ids'])
+        index = cls(state['names'], ids, state['vectorizer'], state['matrix'], state['postings'],
+                    version=compute_model_version(path))
+        print(f"🗂️ Name index loaded: {path} ({len(index)} names, version {index.version})")
+        return index
+
+    def match(self, names, top_k=None, min_score=0.0, batch_rows=None):
+        """(positions, scores): the top_k master names per query, best first.
+
+        Both arrays are (len(names), top_k); positions index self.names and are -1
+        where fewer than top_k candidates score at least min_score.
+        """
+        import numpy as np
+        import pandas as pd
+
+        top_k = top_k or DEFAULT_TOP_K
+        batch_rows = batch_rows or MATCH_BATCH_ROWS
+        # Score each distinct normalized name once
+        codes, queries = pd.factorize(pd.Series(normalize_names(names), dtype=object))
+        positions = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.zeros((len(queries), top_k), dtype=np.float32)
+        for start in range(0, len(queries), batch_rows):
+            batch = slice(start, start + batch_rows)
+            positions[batch], scores[batch] = self._match_batch(queries[batch], top_k)
+
+        positions[scores < min_score] = -1
+        scores[positions < 0] = 0.0
+        return positions[codes], scores[codes]
+
+    def _match_batch(self, queries, top_k):
+        import numpy as np
+        from scipy import sparse
+
+        vectors = self.vectorizer.transform(queries).tocsr()
+        positions = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.zeros((len(queries), top_k), dtype=np.float32)
+
+        # Blocking: each query's rarest n-grams (highest IDF) pull candidates from
+        # their postings, ranked by the weight they share with the query
+        rows = _row_ids(vectors)
+        order, rank = _rank_per_row(rows, self.idf[vectors.indices])
+        lengths = self.posting_lengths[vectors.indices[order]]
+        # Postings already pulled in by rarer n-grams of the same query
+        seen = np.cumsum(lengths) - lengths
+        seen -= seen[np.arange(len(order)) - rank]
+        kept = order[(rank < BLOCKING_NGRAMS) & ((rank == 0) | (seen + lengths <= BLOCKING_MAX_POSTINGS))]
+        blocking = sparse.csr_matrix(
+            (vectors.data[kept], (rows[kept], vectors.indices[kept])),
+            shape=vectors.shape,
+        )
+        candidates = (blocking @ self.postings).tocsr()
+        if not candidates.nnz:
+            return positions, scores
+
+        # Only candidates close to the query's best overlap are worth scoring
+        candidate_rows = _row_ids(candidates)
+        starts = np.flatnonzero(np.diff(candidates.indptr))
+        best_overlap = np.zeros(len(queries), dtype=candidates.dtype)
+        best_overlap[starts] = np.maximum.reduceat(candidates.data, candidates.indptr[starts])
+        strong = np.flatnonzero(candidates.data >= CANDIDATE_MIN_RATIO * best_overlap[candidate_rows])
+        kept = strong[_top_positions(candidate_rows[strong], candidates.data[strong], MAX_CANDIDATES)]
+        pair_rows, pair_names = candidate_rows[kept], candidates.indices[kept]
+
+        # Scoring: full cosine similarity of every (query, candidate) pair at once
+        similarity = np.asarray(
+            vectors[pair_rows].multiply(self.matrix[pair_names]).sum(axis=1),
+            dtype=np.float32,
+        ).ravel()
+        best = _top_positions(pair_rows, similarity, top_k)
+        best_rows = pair_rows[best]
+        rank = np.arange(len(best)) - np.searchsorted(best_rows, best_rows, side='left')
+        positions[best_rows, rank] = pair_names[best]
+        scores[best_rows, rank] = np.minimum(similarity[best], 1.0)
+        return positions, scores
+
+    def top_matches(self, names, top_k=None, min_score=0.0):
+        """Per query name, a list of {'name', 'id', 'score'} dicts, best first"""
+        positions, scores = self.match(names, top_k=top_k, min_score=min_score)
+        return [
+            [
+                {
+                    'name': self.names[position],
+                    'id': None if self.ids is None else self.ids[position],
+                    'score': round(float(score), 4),
+                }
+                for position, score in zip(row_positions, row_scores) if position >= 0
+            ]
+            for row_positions, row_scores in zip(positions, scores)
+        ]
+
+    def match_frame(self, df, name_column, min_score=None):
+        """Add the best master name (and id) and its score to each row of df; returns df"""
+        import numpy as np
+        import pandas as pd
+
+        if name_column not in df.columns:
+            raise Exception(f"Column '{name_column}' not found. Available columns: {', '.join(map(str, df.columns))}")
+        min_score = MIN_MATCH_SCORE if min_score is None else min_score
+        started = time.perf_counter()
+        positions, scores = self.match(df[name_column], top_k=1, min_score=min_score)
+        positions, scores = positions[:, 0], scores[:, 0]
+        matched = positions >= 0
+
+        # Matched names repeat heavily, so they are filled as categoricals
+        position_codes, unique_positions = pd.factorize(positions[matched])
+        df[COL_MATCHED_NAME] = _categorical_at(matched, position_codes, self.names[unique_positions])
+        if self.ids is not None:
+            df[COL_MATCHED_ID] = _categorical_at(matched, position_codes, self.ids[unique_positions])
+        df[COL_MATCH_SCORE] = pd.Series(np.round(scores, 4), index=df.index).where(matched)
+
+        elapsed = time.perf_counter() - started
+        df.attrs['match_stats'] = {'rows': len(df), 'matched': int(matched.sum()), 'seconds': elapsed}
+        progress(f"🔗 Matched {int(matched.sum())}/{len(df)} names in {elapsed:.2f}s")
+        return df
+
+
+def _categorical_at(mask, codes, values):
+    """Categorical that is values[codes] where mask is set and missing elsewhere"""
+    import numpy as np
+    import pandas as pd
+
+    # Several master entries may share a name, so values are deduplicated first
+    value_codes, categories = pd.factorize(pd.Series(values, dtype=object))
+    full = np.full(len(mask), -1, dtype=np.int64)
+    full[mask] = value_codes[codes]
+    return pd.Categorical.from_codes(full, categories=categories)
+
+
+class NameIndexLoader:
+    """Loads the prebuilt index on first use and again whenever its file is replaced"""
+
+    def __init__(self, path=None):
+        self.path = path or NAME_INDEX_PATH
+        self._lock = threading.Lock()
+        self._index = None
+        self._signature = None
+
+    def get(self):
+        """The current index, or None when it has not been built"""
+        from model_registry import file_signature
+
+        signature = file_signature([self.path])
+        if signature is None:
+            return None
+        if signature == self._signature:
+            return self._index
+        with self._lock:
+            if signature != self._signature:
+                self._index = NameIndex.load(self.path)
+                self._signature = signature
+                logger.info(f"Name index loaded: version {self._index.version}")
+            return self._index
+
+
+def read_names_file(path):
+    """DataFrame from a CSV, Excel, JSON, JSON-lines, TXT, Parquet or Arrow file"""
+    from werkzeug.datastructures import FileStorage
+    from routes import read_uploaded_file
+
+    with open(path, 'rb') as f:
+        return read_uploaded_file(FileStorage(f, filename=path))
+
+
+def main(argv=None):
+    """Build the supplier name index from a master list, or match files against it"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--path', default=NAME_INDEX_PATH, help='Index file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Index the names of a master list')
+    build.add_argument('master')
+    build.add_argument('--name-column', required=True)
+    build.add_argument('--id-column')
+
+    match = commands.add_parser('match', help='Add the best master name to every row of a file')
+    match.add_argument('input')
+    match.add_argument('--name-column', required=True)
+    match.add_argument('--output', required=True, help='Output file (.csv, .jsonl or .parquet)')
+    match.add_argument('--min-score', type=float, default=MIN_MATCH_SCORE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        master = read_names_file(args.master)
+        for column in (args.name_column, args.id_column):
+            if column and column not in master.columns:
+                raise Exception(f"Column '{column}' not found in {args.master}")
+        ids = master[args.id_column] if args.id_column else None
+        NameIndex.build(master[args.name_column], ids).save(args.path)
+        return
+
+    index = NameIndex.load(args.path)
+    df = index.match_frame(read_names_file(args.input), args.name_column, args.min_score)
+    extension = os.path.splitext(args.output)[1].lower()
+    if extension == '.csv':
+        df.to_csv(args.output, index=False)
+    elif extension == '.jsonl':
+        df.to_json(args.output, orient='records', lines=True)
+    elif extension == '.parquet':
+        df.to_parquet(args.output, index=False)
+    else:
+        raise Exception(f"Unsupported output file type: {args.output}")
+    stats = df.attrs['match_stats']
+    print(f"✅ {stats['matched']}/{stats['rows']} rows matched in {stats['seconds']:.2f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
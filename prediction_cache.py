@@ -0,0 +1,181 @@
+import sqlite3
+import threading
+import time
+import os
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ CACHE CONFIGURATIONS ---
+CACHE_PATH = "cache/prediction_cache.sqlite3"
+MEMORY_MAX_ENTRIES = 100_000
+DISK_MAX_ENTRIES = 5_000_000
+
+# How long a write waits for another worker's write lock before giving up; the
+# cache is only an accelerator, so a busy or failing database never fails a request
+CACHE_BUSY_TIMEOUT_SECONDS = 1.0
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+class PredictionCache:
+    """Two-tier (memory LRU + SQLite) cache of decoded labels per model version"""
+
+    def __init__(self, path=None, memory_max_entries=None, disk_max_entries=None):
+        self.path = path or CACHE_PATH
+        self.memory_max_entries = memory_max_entries or MEMORY_MAX_ENTRIES
+        self.disk_max_entries = disk_max_entries or DISK_MAX_ENTRIES
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=CACHE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS predictions (
+                   model_version TEXT NOT NULL,
+                   description TEXT NOT NULL,
+                   label TEXT NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (model_version, description)
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_last_used ON predictions (last_used)")
+        self._conn.commit()
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        print(f"🗄️ Prediction cache opened: {self.path} ({self._disk_count} entries on disk)")
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    def get_many(self, model_version, descriptions):
+        """Return {description: label} for every description found in the cache"""
+        found = {}
+        pending = []
+        with self._lock:
+            for description in descriptions:
+                key = (model_version, description)
+                label = self._memory.get(key)
+                if label is not None:
+                    self._memory.move_to_end(key)
+                    found[description] = label
+                else:
+                    pending.append(description)
+            self.memory_hits += len(found)
+
+            if pending:
+                now = time.time()
+                disk_found = {}
+                for start in range(0, len(pending), _SQL_BATCH):
+                    batch = pending[start:start + _SQL_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT description, label FROM predictions "
+                        f"WHERE model_version = ? AND description IN ({placeholders})",
+                        [model_version, *batch],
+                    ).fetchall()
+                    disk_found.update(rows)
+                if disk_found:
+                    try:
+                        self._conn.executemany(
+                            "UPDATE predictions SET last_used = ? WHERE model_version = ? AND description = ?",
+                            [(now, model_version, d) for d in disk_found],
+                        )
+                        self._conn.commit()
+                    except sqlite3.Error as e:
+                        # Only the eviction order suffers
+                        self._conn.rollback()
+                        logger.warning(f"Prediction cache last-used update skipped: {e}")
+                    for description, label in disk_found.items():
+                        self._remember((model_version, description), label)
+                    found.update(disk_found)
+                self.disk_hits += len(disk_found)
+                self.misses += len(pending) - len(disk_found)
+        return found
+
+    def put_many(self, model_version, labels):
+        """Store {description: label} for the given model version; disk errors are logged, not raised"""
+        if not labels:
+            return
+        now = time.time()
+        with self._lock:
+            for description, label in labels.items():
+                self._remember((model_version, description), label)
+            try:
+                cursor = self._conn.executemany(
+                    "INSERT OR REPLACE INTO predictions (model_version, description, label, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(model_version, d, l, now) for d, l in labels.items()],
+                )
+                self._disk_count += max(cursor.rowcount, 0)
+                self._conn.commit()
+                if self._disk_count > self.disk_max_entries:
+                    self._evict_disk()
+            except sqlite3.Error as e:
+                # e.g. "database is locked" by another worker, or a full disk
+                self._conn.rollback()
+                logger.warning(f"Prediction cache write skipped ({len(labels)} labels): {e}")
+
+    def _remember(self, key, label):
+        self._memory[key] = label
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        # Trim to 90% of the cap so eviction does not run on every insert
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        excess = self._disk_count - int(self.disk_max_entries * 0.9)
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM predictions WHERE rowid IN "
+            "(SELECT rowid FROM predictions ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._conn.commit()
+        self._disk_count -= excess
+        self.evictions += excess
+        logger.info(f"Prediction cache evicted {excess} entries")
+
+    def stats(self):
+        """Return hit/miss counters and current sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'disk_entries': self._disk_count,
+            }
+
+    def clear(self):
+        """Drop every cached prediction"""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM predictions")
+            self._conn.commit()
+            self._disk_count = 0
+
+    def reconnect(self):
+        """Open a fresh connection, e.g. in a forked worker; SQLite connections must not cross fork()"""
+        with self._lock:
+            self._conn = sqlite3.connect(self.path, timeout=CACHE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,316 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+import logging
+
+from ml_utils import progress
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ PROFILING CONFIGURATIONS ---
+PROFILE_DIR = "profiles"
+
+# Share of profiled requests captured without being asked to (0 disables sampling)
+PROFILE_SAMPLE_RATE = 0.0
+
+# Requests sent with this header set to ADMIN_TOKEN are always profiled
+PROFILE_HEADER = "X-Profile"
+# Admin endpoints (/admin/profiles) require ADMIN_TOKEN in this header
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# Stack sampling period; the sampler only runs while a request is being profiled
+PROFILE_INTERVAL_SECONDS = 0.005
+
+# Profiles that also track peak allocations with tracemalloc, by trigger. Stack
+# sampling adds a few percent; tracemalloc can make allocation-heavy requests
+# 3x slower, so sampled production traffic only gets stacks by default
+PROFILE_TRACE_MEMORY = ('requested',)
+# An allocation snapshot is taken when traced memory grows this much past the last one
+PROFILE_SNAPSHOT_GROWTH = 1.2
+PROFILE_SNAPSHOT_MIN_SECONDS = 0.5
+
+# Functions, lines and allocation sites kept in a profile's summary
+PROFILE_TOP_ENTRIES = 25
+
+# Oldest profiles are deleted beyond this many
+PROFILE_MAX_FILES = 200
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}-[0-9]{6}-[a-z_]+-[0-9a-f]{8}$")
+
+
+def _short_path(filename):
+    """Last two path components, enough to tell site-packages modules apart"""
+    parts = filename.replace("\\", "/").rsplit("/", 2)
+    return "/".join(parts[-2:])
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack every interval until stopped"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.lines = Counter()
+        self.samples = 0
+        self._labels = {}
+        self._stop_event = threading.Event()
+        self.on_sample = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.lines[(frame.f_code.co_name, _short_path(frame.f_code.co_filename), frame.f_lineno)] += 1
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+            if self.on_sample is not None:
+                self.on_sample()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileCapture:
+    """A running profile of the calling thread: stack samples plus traced allocations"""
+
+    def __init__(self, profiler, endpoint, trigger):
+        self.profiler = profiler
+        self.endpoint = endpoint
+        self.trigger = trigger
+        self.id = f"{datetime.now():%Y%m%d-%H%M%S}-{endpoint}-{uuid.uuid4().hex[:8]}"
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._stopped = False
+        self._owns_tracemalloc = False
+        self._snapshot = None
+        self._snapshot_bytes = 0
+        self._snapshot_time = 0.0
+        self.trace_memory = trigger in profiler.trace_memory
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+            tracemalloc.reset_peak()
+        self.sampler = StackSampler(threading.get_ident(), profiler.interval)
+        if self.trace_memory:
+            self.sampler.on_sample = self._track_peak
+        self.sampler.start()
+
+    def _track_peak(self):
+        # Snapshots are taken on the sampler thread as memory grows, so the largest
+        # one shows what was allocated close to the peak
+        current, _ = tracemalloc.get_traced_memory()
+        now = time.perf_counter()
+        if (current > self._snapshot_bytes * PROFILE_SNAPSHOT_GROWTH
+                and now - self._snapshot_time >= PROFILE_SNAPSHOT_MIN_SECONDS):
+            self._snapshot = tracemalloc.take_snapshot()
+            self._snapshot_bytes = current
+            self._snapshot_time = now
+
+    def stop(self, **details):
+        """Stop sampling and save the profile; returns its id (None if already stopped)"""
+        if self._stopped:
+            return None
+        self._stopped = True
+        seconds = time.perf_counter() - self._started
+        try:
+            self.sampler.stop()
+            memory = self._memory_summary() if self.trace_memory else None
+        finally:
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            self.profiler._finished()
+        summary = {
+            'id': self.id,
+            'endpoint': self.endpoint,
+            'trigger': self.trigger,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'seconds': round(seconds, 4),
+            'pid': os.getpid(),
+            'interval_seconds': self.profiler.interval,
+            'samples': self.sampler.samples,
+            **details,
+            'hot_functions': self._hot_functions(),
+            'hot_lines': [
+                {'function': name, 'file': filename, 'line': line, 'samples': count}
+                for (name, filename, line), count in self.sampler.lines.most_common(PROFILE_TOP_ENTRIES)
+            ],
+            'memory': memory,
+        }
+        try:
+            self.profiler.save(self.id, summary, self.sampler.stacks)
+        except OSError as e:
+            logger.warning(f"Profile {self.id} not saved: {e}")
+            return None
+        return self.id
+
+    def _hot_functions(self):
+        """Functions by samples spent in them (self) and under them (total)"""
+        own = Counter()
+        total = Counter()
+        for stack, count in self.sampler.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        samples = max(self.sampler.samples, 1)
+        return [
+            {'function': label, 'self': own[label], 'total': count, 'total_pct': round(100 * count / samples, 1)}
+            for label, count in total.most_common(PROFILE_TOP_ENTRIES)
+        ]
+
+    def _memory_summary(self):
+        current, peak = tracemalloc.get_traced_memory()
+        top = []
+        if self._snapshot is not None:
+            for stat in self._snapshot.statistics('lineno')[:PROFILE_TOP_ENTRIES]:
+                frame = stat.traceback[0]
+                top.append({
+                    'location': f"{_short_path(frame.filename)}:{frame.lineno}",
+                    'bytes': stat.size,
+                    'blocks': stat.count,
+                })
+        return {
+            'traced_peak_bytes': peak,
+            'traced_end_bytes': current,
+            'snapshot_bytes': self._snapshot_bytes,
+            'top_allocations': top,
+        }
+
+
+class Profiler:
+    """Decides which requests to profile, runs one capture at a time and stores the results"""
+
+    def __init__(self, directory=None, sample_rate=None, token=None, interval=None, trace_memory=None,
+                 max_profiles=None):
+        self.directory = directory or PROFILE_DIR
+        self.sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.token = token
+        self.interval = interval or PROFILE_INTERVAL_SECONDS
+        self.trace_memory = tuple(PROFILE_TRACE_MEMORY if trace_memory is None else trace_memory)
+        self.max_profiles = max_profiles or PROFILE_MAX_FILES
+        self._lock = threading.Lock()
+        self._busy = False
+        os.makedirs(self.directory, exist_ok=True)
+        logger.info(f"Profiling to {self.directory} (sample rate {self.sample_rate:g}, "
+                    f"on request {'enabled' if token else 'disabled'})")
+
+    def check_token(self, value):
+        """True when value matches the admin token (never when no token is configured)"""
+        import hmac
+
+        return bool(self.token and value) and hmac.compare_digest(str(value), str(self.token))
+
+    def trigger(self, header_value):
+        """Why a request should be profiled ('requested' or 'sampled'), or None"""
+        if header_value and self.check_token(header_value):
+            return 'requested'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def start(self, endpoint, trigger):
+        """Start profiling the calling thread; None while another request is being profiled"""
+        with self._lock:
+            if self._busy:
+                return None
+            self._busy = True
+        try:
+            capture = ProfileCapture(self, endpoint, trigger)
+        except Exception:
+            self._finished()
+            raise
+        return capture
+
+    def _finished(self):
+        with self._lock:
+            self._busy = False
+
+    # --- Storage ---
+
+    def _path(self, profile_id, suffix):
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def save(self, profile_id, summary, stacks):
+        """Write the summary (JSON) and collapsed stacks (flame graph input) of a profile"""
+        folded = "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.items())
+        for suffix, text in (('.folded', folded), ('.json', json.dumps(summary, indent=1))):
+            tmp = self._path(profile_id, suffix + '.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp, self._path(profile_id, suffix))
+        progress(f"🩺 Profile saved: {profile_id} ({summary['samples']} samples, {summary['seconds']:.2f}s)")
+        self.prune()
+
+    def prune(self):
+        """Delete the oldest profiles beyond max_profiles"""
+        ids = self.ids()
+        for profile_id in ids[:-self.max_profiles]:
+            for suffix in ('.json', '.folded'):
+                try:
+                    os.remove(self._path(profile_id, suffix))
+                except OSError:
+                    pass
+
+    def ids(self):
+        """Saved profile ids, oldest first"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.name.endswith('.json') and PROFILE_ID_PATTERN.match(entry.name[:-5])]
+            entries.sort(key=lambda entry: (entry.stat().st_mtime, entry.name))
+        except OSError:
+            return []
+        return [entry.name[:-5] for entry in entries]
+
+    def path(self, profile_id, kind='summary'):
+        """File of a saved profile ('summary' or 'stacks'); None for unknown ids"""
+        if not PROFILE_ID_PATTERN.match(profile_id or ''):
+            return None
+        path = self._path(profile_id, '.json' if kind == 'summary' else '.folded')
+        return path if os.path.exists(path) else None
+
+    def list(self):
+        """Newest first, with the fields needed to pick one"""
+        profiles = []
+        for profile_id in reversed(self.ids()):
+            try:
+                with open(self._path(profile_id, '.json'), encoding='utf-8') as f:
+                    summary = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.info(f"Skipping unreadable profile {profile_id}: {e}")
+                continue
+            memory = summary.get('memory') or {}
+            profiles.append({
+                'id': profile_id,
+                'endpoint': summary.get('endpoint'),
+                'trigger': summary.get('trigger'),
+                'started_at': summary.get('started_at'),
+                'seconds': summary.get('seconds'),
+                'status': summary.get('status'),
+                'samples': summary.get('samples'),
+                'traced_peak_bytes': memory.get('traced_peak_bytes'),
+            })
+        return profiles
@@ -0,0 +1,341 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import logging
+
+from werkzeug.datastructures import FileStorage
+
+from ml_utils import arrow_compatible
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ RESULT CACHE CONFIGURATIONS ---
+RESULT_CACHE_DIR = "cache/results"
+RESULT_CACHE_MAX_MB = 2048
+RESULT_CACHE_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# Upload bytes read per step while spooling and hashing
+SPOOL_BLOCK_BYTES = 1024 * 1024
+
+# Bumped whenever the stored layout changes so older entries are never read
+_FORMAT_VERSION = 1
+_META_FILENAME = "meta.json"
+_TEMP_PREFIX = ".tmp-"
+
+
+def spool_upload(file):
+    """Copy an upload into an anonymous temp file while hashing it; returns (copy, sha256 hex digest)"""
+    digest = hashlib.sha256()
+    spooled = tempfile.TemporaryFile()
+    try:
+        for block in iter(lambda: file.stream.read(SPOOL_BLOCK_BYTES), b''):
+            digest.update(block)
+            spooled.write(block)
+        spooled.seek(0)
+    except Exception:
+        spooled.close()
+        raise
+    return FileStorage(stream=spooled, filename=file.filename), digest.hexdigest()
+
+
+def result_key(content_hash, filename, model_version, **options):
+    """Key for a predicted result: upload content and type, model version and every option that changes the output"""
+    parts = {
+        'layout': _FORMAT_VERSION,
+        'content': content_hash,
+        'extension': os.path.splitext(filename)[1].lower(),
+        'model_version': model_version,
+        **options,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class CachedResult:
+    """A cache entry opened for reading; its Parquet files stay readable even if the entry is evicted"""
+
+    def __init__(self, path, meta):
+        import pyarrow.parquet as pq
+
+        self.meta = meta
+        self.sheet_names = meta['sheets']
+        self.rows = meta['rows']
+        self._files = [pq.ParquetFile(os.path.join(path, name)) for name in meta['files']]
+
+    @property
+    def is_workbook(self):
+        return self.sheet_names != [None]
+
+    def iter_tables(self, index=0, batch_rows=None):
+        """Yield one stored sheet as pyarrow Tables of at most batch_rows rows"""
+        import pyarrow as pa
+
+        parquet_file = self._files[index]
+        if parquet_file.metadata.num_rows == 0:
+            yield parquet_file.schema_arrow.empty_table()
+            return
+        for batch in parquet_file.iter_batches(batch_size=batch_rows or 65_536):
+            yield pa.Table.from_batches([batch])
+
+    def read_table(self, index=0):
+        """One stored sheet as a single pyarrow Table"""
+        return self._files[index].read()
+
+    def close(self):
+        for parquet_file in self._files:
+            parquet_file.close()
+
+
+class ResultWriter:
+    """Writes one entry sheet by sheet and chunk by chunk; nothing is visible until commit()"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.path = tempfile.mkdtemp(prefix=_TEMP_PREFIX, dir=cache.directory)
+        self.sheets = []
+        self.files = []
+        self.rows = 0
+        self.failed = False
+        self._writer = None
+        self._schema = None
+
+    def start_sheet(self, name=None):
+        """Begin the next sheet (None for uploads that are not workbooks)"""
+        self._close_sheet()
+        self.sheets.append(name)
+        self.files.append(f"sheet-{len(self.files):03d}.parquet")
+
+    def write(self, chunk):
+        """Append a DataFrame or pyarrow Table to the current sheet; failures only disable caching"""
+        if self.failed:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        try:
+            if not self.files:
+                self.start_sheet()
+            table = chunk if isinstance(chunk, pa.Table) else pa.Table.from_pandas(arrow_compatible(chunk), preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(os.path.join(self.path, self.files[-1]), self._schema)
+            elif not table.schema.equals(self._schema, check_metadata=False):
+                table = table.cast(self._schema)
+            self._writer.write_table(table)
+            self.rows += table.num_rows
+        except Exception as e:
+            logger.warning(f"Result not cached: {e}")
+            self.abort()
+
+    def _close_sheet(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._schema = None
+
+    def commit(self, key):
+        """Publish the entry under key"""
+        if self.failed:
+            return False
+        try:
+            self._close_sheet()
+            # Every sheet must have been written
+            for name in self.files:
+                if not os.path.exists(os.path.join(self.path, name)):
+                    raise Exception(f"Result sheet {name} was never written")
+            size = sum(os.path.getsize(os.path.join(self.path, name)) for name in self.files)
+            meta = {
+                'created': time.time(),
+                'sheets': self.sheets,
+                'files': self.files,
+                'rows': self.rows,
+                'bytes': size,
+            }
+            with open(os.path.join(self.path, _META_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        except Exception as e:
+            logger.warning(f"Result not cached: {e}")
+            self.abort()
+            return False
+        return self.cache._publish(key, self.path, size)
+
+    def abort(self):
+        self.failed = True
+        try:
+            self._close_sheet()
+        except Exception:
+            pass
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def cache_chunks(chunks, writer, key):
+    """Pass chunks through while writing them to a new entry; key() is called once every chunk is written"""
+    completed = False
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+            yield chunk
+        completed = True
+    finally:
+        # Failed or abandoned (e.g. client disconnected) results are never published
+        if completed:
+            writer.commit(key())
+        else:
+            writer.abort()
+
+
+class ResultCache:
+    """Predicted uploads stored as Parquet under a content-addressed key, with size and age limits"""
+
+    def __init__(self, directory=None, max_mb=None, max_age_seconds=None):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            raise Exception("pyarrow is required for the result cache. Install with: pip install pyarrow")
+
+        self.directory = directory or RESULT_CACHE_DIR
+        self.max_bytes = (max_mb or RESULT_CACHE_MAX_MB) * 1024 * 1024
+        self.max_age = max_age_seconds or RESULT_CACHE_MAX_AGE_SECONDS
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.entries = 0
+        self.total_bytes = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Entries left half-written by a crash
+        for name in os.listdir(self.directory):
+            if name.startswith(_TEMP_PREFIX):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        self.evict()
+        print(f"📦 Result cache opened: {self.directory} ({self.entries} entries, {self.total_bytes / 2**20:.1f}MB)")
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key)
+
+    @staticmethod
+    def _read_meta(path):
+        try:
+            with open(os.path.join(path, _META_FILENAME), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        """Open the entry for key, or None if it is missing or expired"""
+        path = self._entry_path(key)
+        with self._lock:
+            meta = self._read_meta(path)
+            if meta is not None and time.time() - meta['created'] > self.max_age:
+                self._remove(path, meta)
+                self.evictions += 1
+                meta = None
+            if meta is None:
+                self.misses += 1
+                return None
+            try:
+                result = CachedResult(path, meta)
+            except Exception as e:
+                logger.warning(f"Dropping unreadable result cache entry {key}: {e}")
+                self._remove(path, meta)
+                self.misses += 1
+                return None
+            # The meta file's mtime is the entry's last use, for LRU eviction
+            os.utime(os.path.join(path, _META_FILENAME))
+            self.hits += 1
+        return result
+
+    def writer(self):
+        """New entry writer; call commit(key) once every sheet is written"""
+        return ResultWriter(self)
+
+    def put(self, key, sheets):
+        """Store {sheet name: DataFrame or pyarrow Table}; the name is None for uploads that are not workbooks"""
+        writer = self.writer()
+        for name, frame in sheets.items():
+            writer.start_sheet(name)
+            writer.write(frame)
+        return writer.commit(key)
+
+    def _publish(self, key, temp_path, size):
+        path = self._entry_path(key)
+        with self._lock:
+            old_meta = self._read_meta(path)
+            if old_meta is not None:
+                self._remove(path, old_meta)
+            try:
+                os.rename(temp_path, path)
+            except OSError as e:
+                # e.g. a concurrent request published the same entry first
+                logger.info(f"Result not cached: {e}")
+                shutil.rmtree(temp_path, ignore_errors=True)
+                return False
+            self.stores += 1
+            self.entries += 1
+            self.total_bytes += size
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        return True
+
+    def _remove(self, path, meta):
+        """Delete an entry; caller holds the lock"""
+        shutil.rmtree(path, ignore_errors=True)
+        self.entries = max(self.entries - 1, 0)
+        self.total_bytes = max(self.total_bytes - meta.get('bytes', 0), 0)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under 90% of the size limit"""
+        now = time.time()
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                path = self._entry_path(name)
+                if name.startswith(_TEMP_PREFIX) or not os.path.isdir(path):
+                    continue
+                meta = self._read_meta(path)
+                if meta is None or now - meta['created'] > self.max_age:
+                    shutil.rmtree(path, ignore_errors=True)
+                    if meta is not None:
+                        self.evictions += 1
+                    continue
+                last_used = os.path.getmtime(os.path.join(path, _META_FILENAME))
+                entries.append((last_used, path, meta['bytes']))
+
+            entries.sort()
+            total = sum(size for _, _, size in entries)
+            if total > self.max_bytes:
+                # Trim to 90% of the cap so eviction does not run on every store
+                while entries and total > self.max_bytes * 0.9:
+                    _, path, size = entries.pop(0)
+                    shutil.rmtree(path, ignore_errors=True)
+                    total -= size
+                    self.evictions += 1
+            self.entries = len(entries)
+            self.total_bytes = total
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'entries': self.entries,
+                'bytes': self.total_bytes,
+            }
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            for name in os.listdir(self.directory):
+                shutil.rmtree(self._entry_path(name), ignore_errors=True)
+            self.entries = 0
+            self.total_bytes = 0
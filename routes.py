@@ -1,20 +1,259 @@
 # filepath: d:\Categorizer U.I\routes.py
-from flask import render_template, request, send_file, flash, redirect, url_for, jsonify
-import pandas as pd
+from flask import render_template, request, send_file, flash, redirect, url_for, jsonify, Response, stream_with_context, g, make_response
 import os
-from datetime import datetime
+import time
+from datetime import datetime, date
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import FileStorage
+from itertools import chain
 import tempfile
+import shutil
+import multiprocessing
+from ml_utils import COL_SNS, COL_MAJOR, COL_MINOR, COL_DATE, COMPACT_DTYPES, progress, arrow_compatible
+from metrics import REGISTRY, ERRORS, SLOW_REQUEST_SECONDS, map_prediction_timings, record_request
+from result_cache import spool_upload, result_key, cache_chunks
+from compression import REQUEST_BYTES_KEY
+from name_matcher import NameIndex, MIN_MATCH_SCORE, DEFAULT_TOP_K
+from admission import AdmissionRejected, estimate_upload_bytes, estimate_frame_bytes
+from profiling import PROFILE_HEADER, ADMIN_TOKEN_HEADER
+
+# --- ⚙️ STREAMING CONFIGURATIONS ---
+# Inputs that can be read incrementally and outputs that can be appended to
+STREAMABLE_EXTENSIONS = ('.csv', '.txt', '.jsonl', '.parquet', '.arrow', '.feather')
+STREAMING_OUTPUT_FORMATS = ('csv', 'json', 'jsonl', 'excel', 'parquet', 'arrow')
+STREAMING_CHUNK_ROWS = 50_000
+STREAMING_THRESHOLD_BYTES = 8 * 1024 * 1024
+
+# --- ⚙️ OUTPUT CONFIGURATIONS ---
+OUTPUT_BLOCK_ROWS = 50_000
+EXCEL_MAX_ROWS = 1_048_575
+OUTPUT_MIMETYPES = {
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+# Binary formats that need a finished file before they can be sent
+SPOOLED_OUTPUT_FORMATS = ('excel', 'parquet', 'arrow')
+
+# --- ⚙️ COLUMNAR CONFIGURATIONS ---
+# Parquet/Arrow uploads exported as Parquet/Arrow never leave Arrow memory;
+# only the description and label columns are converted for prediction
+COLUMNAR_EXTENSIONS = ('.parquet', '.arrow', '.feather')
+COLUMNAR_OUTPUT_FORMATS = ('parquet', 'arrow')
+PREDICTION_COLUMNS = (COL_SNS, COL_MAJOR, COL_MINOR, COL_DATE)
+
+# --- ⚙️ EXCEL CONFIGURATIONS ---
+# Workbooks are read with calamine when installed, otherwise openpyxl (read-only)
+EXCEL_PARSE_WORKERS = 1  # >1 parses sheets in forked worker processes
+COL_SHEET = "Sheet"
+
+# How long an upload waits for a background model load to finish
+MODEL_LOAD_WAIT_SECONDS = 30
+
+# Largest number of descriptions accepted by one /api/predict call (and names by /api/name-match)
+API_MAX_ITEMS = 10_000
+
+# Most candidates /api/name-match returns per name
+NAME_MATCH_MAX_TOP_K = 20
+
+# Endpoints that can be profiled on request (or sampled)
+PROFILED_ENDPOINTS = ('upload', 'upload_slim', 'name_assign_upload', 'api_predict', 'api_name_match')
 
 def register_routes(app):
     
     # Define allowed extensions with fallback
-    ALLOWED_EXTENSIONS = getattr(app.config, 'ALLOWED_EXTENSIONS', {'csv', 'xlsx', 'json', 'txt'})
+    ALLOWED_EXTENSIONS = getattr(app.config, 'ALLOWED_EXTENSIONS', {'csv', 'xlsx', 'json', 'jsonl', 'txt', 'parquet', 'arrow', 'feather'})
+    STREAMING_THRESHOLD = app.config.get('STREAMING_THRESHOLD_BYTES', STREAMING_THRESHOLD_BYTES)
+    CHUNK_ROWS = app.config.get('STREAMING_CHUNK_ROWS', STREAMING_CHUNK_ROWS)
+    MODEL_LOAD_WAIT = app.config.get('MODEL_LOAD_WAIT_SECONDS', MODEL_LOAD_WAIT_SECONDS)
+    API_MAX = app.config.get('API_MAX_ITEMS', API_MAX_ITEMS)
+    SLOW_SECONDS = app.config.get('SLOW_REQUEST_SECONDS', SLOW_REQUEST_SECONDS)
+    NAME_MIN_SCORE = app.config.get('NAME_MATCH_MIN_SCORE', MIN_MATCH_SCORE)
+    NAME_MAX_TOP_K = app.config.get('NAME_MATCH_MAX_TOP_K', NAME_MATCH_MAX_TOP_K)
+    PARSE_WORKERS = app.config.get('EXCEL_PARSE_WORKERS', EXCEL_PARSE_WORKERS)
     
     def allowed_file(filename):
         return '.' in filename and \
                filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
     
+    def admit_upload(estimate):
+        """Hold estimate bytes of the upload memory budget until the response is closed.
+        
+        Raises AdmissionRejected when the upload cannot be admitted within the queue timeout.
+        """
+        if app.admission is not None:
+            g.admission_ticket = app.admission.acquire(estimate)
+    
+    @app.after_request
+    def release_admission_on_close(response):
+        # Streamed and spooled bodies keep their memory until they are sent
+        ticket = g.pop('admission_ticket', None)
+        if ticket is not None:
+            response.call_on_close(lambda: app.admission.release(ticket))
+        return response
+    
+    @app.teardown_request
+    def release_admission(exc):
+        ticket = g.pop('admission_ticket', None)
+        if ticket is not None:
+            app.admission.release(ticket)
+    
+    @app.before_request
+    def start_profile():
+        if app.profiler is None or request.endpoint not in PROFILED_ENDPOINTS:
+            return
+        trigger = app.profiler.trigger(request.headers.get(PROFILE_HEADER))
+        if trigger is not None:
+            # None while this process is already profiling another request
+            g.profile = app.profiler.start(request.endpoint, trigger)
+    
+    @app.after_request
+    def stop_profile_on_close(response):
+        # Profiles cover the whole response, including streamed bodies
+        capture = g.pop('profile', None)
+        if capture is not None:
+            details = {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'bytes_in': request_bytes(),
+            }
+            response.headers['X-Profile-Id'] = capture.id
+            response.call_on_close(lambda: capture.stop(**details))
+        return response
+    
+    @app.teardown_request
+    def stop_profile(exc):
+        capture = g.pop('profile', None)
+        if capture is not None:
+            capture.stop(method=request.method, path=request.path, error=str(exc) if exc else None)
+    
+    def admin_denied():
+        """Error response unless profiling is on and the request carries the admin token"""
+        if app.profiler is None:
+            return jsonify({'error': 'Profiling is disabled: set ADMIN_TOKEN or PROFILE_SAMPLE_RATE'}), 404
+        if not app.profiler.check_token(request.headers.get(ADMIN_TOKEN_HEADER)):
+            return jsonify({'error': f'{ADMIN_TOKEN_HEADER} header with the admin token is required'}), 403
+        return None
+    
+    def busy_response(error, page=None):
+        """429 with a Retry-After hint; the page endpoint is re-rendered with the message, or JSON is returned"""
+        message = f'Server is busy with other uploads, please retry in {error.retry_after} seconds'
+        if page is None:
+            response = make_response(jsonify({'error': message, 'retry_after': error.retry_after}), 429)
+        else:
+            flash(message, 'error')
+            response = make_response(app.view_functions[page](), 429)
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+    
+    def download_name(output_format, prefix='categorized_data'):
+        return f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{get_file_extension(output_format)}'
+    
+    def send_spooled_output(output, output_format, prefix='categorized_data'):
+        """Send an anonymous temp file; closing it after the response deletes it"""
+        return send_file(
+            output,
+            as_attachment=True,
+            download_name=download_name(output_format, prefix),
+            mimetype=OUTPUT_MIMETYPES.get(output_format),
+        )
+    
+    def send_dataframe(df, output_format, timings, finish, mode, endpoint='upload', prefix='categorized_data'):
+        """Send an in-memory result: spooled for binary formats, streamed for text"""
+        timings['write'] = 0.0
+        if output_format in SPOOLED_OUTPUT_FORMATS:
+            output = spool_output(iter_frame_blocks(df), output_format, timings)
+            finish('ok', rows=len(df), bytes_out=os.fstat(output.fileno()).st_size, mode=mode)
+            return send_spooled_output(output, output_format, prefix)
+        
+        # Text formats are encoded block by block as the response is sent
+        def on_write_complete(status, bytes_out):
+            if status != 'ok':
+                ERRORS.inc(endpoint=endpoint, stage='write')
+            finish(status, rows=len(df), bytes_out=bytes_out, mode=mode)
+        
+        return streamed_download(
+            iter_output_bytes(iter_frame_blocks(df), output_format, timings),
+            output_format,
+            on_write_complete,
+            prefix,
+        )
+    
+    def streamed_download(byte_chunks, output_format, on_complete, prefix='categorized_data'):
+        """Send encoder output as it is produced; on_complete(status, bytes_out) runs at the end"""
+        def generate():
+            bytes_out = 0
+            try:
+                for data in byte_chunks:
+                    bytes_out += len(data)
+                    yield data
+            except Exception as e:
+                # Headers are already sent; the client sees a truncated download
+                print(f"❌ Error streaming output: {e}")
+                on_complete('error', bytes_out)
+                raise
+            on_complete('ok', bytes_out)
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype=OUTPUT_MIMETYPES.get(output_format),
+            headers={'Content-Disposition': f'attachment; filename={download_name(output_format, prefix)}'},
+        )
+    
+    def upload_cache_key(content_hash, filename, ml_manager, **options):
+        """Result cache key; taken again after prediction since the rule index learns from the upload"""
+        rules = ml_manager.rules
+        return result_key(
+            content_hash, filename, ml_manager.model_version,
+            rules_revision=rules.refresh() if rules is not None else None,
+            compact=COMPACT_DTYPES,
+            # Predicted rows carry the day they were categorized
+            date=date.today().isoformat(),
+            **options,
+        )
+    
+    def send_cached_result(result, output_format, timings, finish):
+        """Re-encode a cached result in the requested format"""
+        timings['write'] = 0.0
+        handed_off = False
+        try:
+            if result.is_workbook:
+                sheets = {name: arrow_to_pandas(result.read_table(i)) for i, name in enumerate(result.sheet_names)}
+                if output_format == 'excel':
+                    output = spool_output(sheets, output_format, timings)
+                    finish('ok', rows=result.rows, bytes_out=os.fstat(output.fileno()).st_size, mode='cached')
+                    return send_spooled_output(output, output_format)
+                return send_dataframe(combine_sheets(sheets), output_format, timings, finish, 'cached')
+            
+            tables = result.iter_tables(0, OUTPUT_BLOCK_ROWS)
+            if output_format in SPOOLED_OUTPUT_FORMATS:
+                # Parquet and Arrow are written from the stored Tables without a pandas round trip
+                chunks = tables if output_format in COLUMNAR_OUTPUT_FORMATS else map(arrow_to_pandas, tables)
+                output = spool_output(chunks, output_format, timings)
+                finish('ok', rows=result.rows, bytes_out=os.fstat(output.fileno()).st_size, mode='cached')
+                return send_spooled_output(output, output_format)
+            
+            def on_write_complete(status, bytes_out):
+                if status != 'ok':
+                    ERRORS.inc(endpoint='upload', stage='write')
+                finish(status, rows=result.rows, bytes_out=bytes_out, mode='cached')
+            
+            response = streamed_download(
+                iter_output_bytes(map(arrow_to_pandas, tables), output_format, timings),
+                output_format,
+                on_write_complete,
+            )
+            response.call_on_close(result.close)
+            handed_off = True
+            return response
+        finally:
+            if not handed_off:
+                result.close()
+    
     @app.route('/')
     def index():
         """Main menu page - Landing page"""
@@ -23,50 +262,395 @@ def register_routes(app):
     @app.route('/data-categorizer')
     def data_categorizer():
         """Data categorizer page"""
-        return render_template('data_categorizer.html')
+        return render_template(
+            'data_categorizer.html',
+            models=app.model_registry.names(),
+            default_model=app.model_registry.default_model,
+        )
     
     @app.route('/name-assign')
     def name_assign():
-        """Name assignment page (placeholder)"""
-        return "<h1>Name Assignment</h1><p>Coming soon!</p><a href='/'>Back to Menu</a>"
+        """Supplier name assignment page"""
+        try:
+            index = app.name_index.get()
+        except Exception as e:
+            print(f"⚠️ Name index unavailable: {e}")
+            index = None
+        return render_template(
+            'name_assign.html',
+            index_size=len(index) if index is not None else None,
+            min_score=NAME_MIN_SCORE,
+        )
+    
+    @app.route('/name-assign/upload', methods=['POST'])
+    def name_assign_upload():
+        """Add the closest master-list supplier name (and id) to every row of an uploaded file"""
+        started = time.perf_counter()
+        timings = {}
+        stage = 'validate'
+        
+        def assign_error(message):
+            flash(message, 'error')
+            return redirect(url_for('name_assign'))
+        
+        def finish(status, rows=0, bytes_out=0, **details):
+            record_request(
+                'name_assign', status, time.perf_counter() - started, timings,
+                rows=rows,
+                bytes_in=request_bytes(),
+                bytes_out=bytes_out,
+                slow_seconds=SLOW_SECONDS,
+                **details,
+            )
+        
+        file = request.files.get('datafile')
+        if file is None or file.filename == '':
+            return assign_error('No file selected')
+        if not allowed_file(file.filename):
+            return assign_error('Invalid file type. Please upload CSV, Excel, JSON, JSON-lines, TXT, Parquet or Arrow files.')
+        name_col = request.form.get('name_column', '').strip()
+        output_format = request.form.get('output_format', 'excel')
+        if not name_col:
+            return assign_error('Supplier column name is required')
+        if output_format not in OUTPUT_MIMETYPES:
+            return assign_error(f'Unsupported output format: {output_format}')
+        try:
+            min_score = float(request.form.get('min_score') or NAME_MIN_SCORE)
+        except ValueError:
+            return assign_error('Minimum score must be a number between 0 and 1')
+        
+        master = request.files.get('masterfile')
+        try:
+            estimate = estimate_upload_bytes(file, output_format)
+            if master is not None and master.filename:
+                estimate += estimate_upload_bytes(master, None)
+            admit_upload(estimate)
+        except AdmissionRejected as e:
+            finish('rejected', retry_after=e.retry_after)
+            return busy_response(e, 'name_assign')
+        
+        try:
+            # An uploaded master list is indexed for this request only; otherwise the prebuilt index is used
+            stage = 'index'
+            index_started = time.perf_counter()
+            if master is not None and master.filename:
+                master_col = request.form.get('master_column', '').strip() or name_col
+                master_id_col = request.form.get('master_id_column', '').strip() or None
+                master_df = read_uploaded_file(master)
+                for column in (master_col, master_id_col):
+                    if column and column not in master_df.columns:
+                        return assign_error(f'Column "{column}" not found in the master list. '
+                                            f'Available columns: {", ".join(map(str, master_df.columns))}')
+                index = NameIndex.build(master_df[master_col], master_df[master_id_col] if master_id_col else None)
+                del master_df
+            else:
+                index = app.name_index.get()
+                if index is None:
+                    return assign_error('No supplier master list: upload one, or build the index with '
+                                        '"python name_matcher.py build"')
+            timings['index'] = time.perf_counter() - index_started
+            
+            stage = 'parse'
+            parse_started = time.perf_counter()
+            df = read_uploaded_file(file)
+            timings['parse'] = time.perf_counter() - parse_started
+            
+            stage = 'match'
+            match_started = time.perf_counter()
+            df = index.match_frame(df, name_col, min_score)
+            timings['match'] = time.perf_counter() - match_started
+        except Exception as e:
+            print(f"❌ Name assignment failed: {e}")
+            ERRORS.inc(endpoint='name_assign', stage=stage)
+            finish('error')
+            return assign_error(f'Error processing data: {str(e)}')
+        
+        return send_dataframe(df, output_format, timings, finish, 'in_memory', endpoint='name_assign',
+                              prefix='matched_suppliers')
     
     @app.route('/upload', methods=['POST'])
     def upload():
+        # Async mode returns a job id instead of the processed file
+        is_async = request.values.get('async', '').lower() in ('1', 'true', 'yes')
+        
+        def upload_error(message):
+            if is_async:
+                return jsonify({'error': message}), 400
+            flash(message, 'error')
+            return redirect('/data-categorizer')
+        
+        # Per-stage timings reported to /metrics
+        started = time.perf_counter()
+        timings = {}
+        stage = 'validate'
+        
+        def finish(status, rows=0, bytes_out=0, **details):
+            record_request(
+                'upload', status, time.perf_counter() - started, timings,
+                rows=rows,
+                bytes_in=request_bytes(),
+                bytes_out=bytes_out,
+                slow_seconds=SLOW_SECONDS,
+                **details,
+            )
+        
+        # Spooled copy of the upload made for the result cache
+        upload_copy = None
+        
         try:
             # Check if file was uploaded
             if 'datafile' not in request.files:
-                flash('No file selected', 'error')
-                return redirect('/data-categorizer')
+                return upload_error('No file selected')
             
             file = request.files['datafile']
             if file.filename == '':
-                flash('No file selected', 'error')
-                return redirect('/data-categorizer')
+                return upload_error('No file selected')
             
             # Validate file type
             if not allowed_file(file.filename):
-                flash('Invalid file type. Please upload CSV, Excel, JSON, or TXT files.', 'error')
-                return redirect('/data-categorizer')
+                return upload_error('Invalid file type. Please upload CSV, Excel, JSON, JSON-lines, TXT, Parquet or Arrow files.')
             
             # Get form data
-            supplier_col = request.form.get('variable1', '').strip()
+            supplier_col = request.form.get('variable1', '').strip() or None
             description_col = request.form.get('variable2', '').strip()
-            category_col = request.form.get('variable3', '').strip()
+            category_col = request.form.get('variable3', '').strip() or None
             output_format = request.form.get('output_format', 'excel')
+            sheet_names = parse_sheet_names(request.form.get('sheets', ''))
+            model_name = request.form.get('model', '').strip() or None
             
             # Validate required fields
             if not description_col:
-                flash('Description column name is required', 'error')
-                return redirect('/data-categorizer')
+                return upload_error('Description column name is required')
+            if output_format not in OUTPUT_MIMETYPES:
+                return upload_error(f'Unsupported output format: {output_format}')
             
-            print(f"📊 Processing file: {file.filename}")
-            print(f"📋 Description column: {description_col}")
-            print(f"📤 Output format: {output_format}")
+            progress(f"📊 Processing file: {file.filename}")
+            progress(f"📋 Description column: {description_col}")
+            progress(f"📤 Output format: {output_format}")
+            
+            # The manager is held for the whole request, so a hot reload never swaps models mid-file
+            try:
+                ml_manager = app.model_registry.get(model_name, timeout=MODEL_LOAD_WAIT)
+            except Exception as e:
+                return upload_error(str(e))
+            ml_ready = ml_manager is not None
+            
+            # Spool the upload to disk and let the job pool process it
+            if is_async:
+                if not hasattr(app, 'job_manager'):
+                    return upload_error('Async processing is not available')
+                # Jobs wait for upload memory in the pool rather than being turned away
+                job_func, admission_args = run_categorization_job, ()
+                if app.admission is not None:
+                    streamed = is_streamable(file.filename) and output_format in STREAMING_OUTPUT_FORMATS
+                    estimate = estimate_upload_bytes(file, output_format, streamed, CHUNK_ROWS)
+                    job_func, admission_args = run_admitted_job, (app.admission, estimate)
+                fd, input_path = tempfile.mkstemp(suffix=os.path.splitext(file.filename)[1].lower())
+                os.close(fd)
+                file.save(input_path)
+                job = app.job_manager.submit(
+                    job_func,
+                    *admission_args,
+                    input_path,
+                    file.filename,
+                    description_col,
+                    output_format,
+                    ml_manager,
+                    CHUNK_ROWS,
+                    download_name=download_name(output_format),
+                    cleanup_paths=[input_path],
+                    sheet_names=sheet_names,
+                    parse_workers=PARSE_WORKERS,
+                    supplier_column=supplier_col,
+                    category_column=category_col,
+                )
+                return jsonify({
+                    'job_id': job.id,
+                    'status': job.status,
+                    'status_url': url_for('job_status', job_id=job.id),
+                    'result_url': url_for('job_result', job_id=job.id),
+                }), 202
+            
+            # Repeated uploads are answered from the result cache without parsing or predicting
+            result_cache = app.result_cache if ml_ready else None
+            if result_cache is not None:
+                stage = 'spool'
+                upload_copy, content_hash = spool_upload(file)
+                file = upload_copy
+                cache_options = {
+                    'description_column': description_col,
+                    'supplier_column': supplier_col,
+                    'category_column': category_col,
+                    'sheets': sheet_names,
+                }
+                
+                def cache_key():
+                    return upload_cache_key(content_hash, file.filename, ml_manager, **cache_options)
+                
+                cached = result_cache.get(cache_key())
+                if cached is not None:
+                    progress(f"📦 Serving {cached.rows} cached rows")
+                    stage = 'write'
+                    flash('Data processed successfully with ML predictions! (cached result)', 'success')
+                    return send_cached_result(cached, output_format, timings, finish)
+            
+            # Large CSV/TXT/JSON-lines uploads are processed chunk by chunk
+            use_streaming = (
+                is_streamable(file.filename)
+                and output_format in STREAMING_OUTPUT_FORMATS
+                and request_bytes() >= STREAMING_THRESHOLD
+            )
+            
+            # Wait for the memory this upload is expected to need (cached results skip this)
+            stage = 'admit'
+            admit_upload(estimate_upload_bytes(file, output_format, use_streaming, CHUNK_ROWS))
+            
+            if use_streaming:
+                # Flask closes the request's upload when the view returns, so the
+                # streamed response reads from a private copy
+                input_file, upload_copy = upload_copy or copy_upload(file), None
+                handed_off = False
+                try:
+                    progress(f"🌊 Streaming mode: {CHUNK_ROWS} rows per chunk")
+                    stage = 'stream'
+                    parse_started = time.perf_counter()
+                    chunks = iter_uploaded_file_chunks(input_file, CHUNK_ROWS)
+                    first_chunk = next(chunks, None)
+                    first_parse = time.perf_counter() - parse_started
+                    if first_chunk is None:
+                        flash('Uploaded file is empty', 'error')
+                        return redirect('/data-categorizer')
+                    if description_col not in first_chunk.columns:
+                        available_cols = ', '.join(first_chunk.columns)
+                        flash(f'Column "{description_col}" not found. Available columns: {available_cols}', 'error')
+                        return redirect('/data-categorizer')
+                    if not ml_ready:
+                        progress("⚠️ ML models not available - streaming original data")
+                        flash('ML models not available - returning original data', 'warning')
+                    stats = new_stream_stats()
+                    stats['timings']['parse'] += first_parse
+                    predicted = predict_chunks(
+                        chain([first_chunk], chunks),
+                        description_col,
+                        ml_manager,
+                        stats,
+                        supplier_column=supplier_col,
+                        category_column=category_col,
+                    )
+                    if result_cache is not None:
+                        predicted = cache_chunks(predicted, result_cache.writer(), cache_key)
+                    
+                    # Excel, Parquet and Arrow need a finished file, so they go through a temp file
+                    if output_format in SPOOLED_OUTPUT_FORMATS:
+                        output = spool_output(predicted, output_format, stats['timings'])
+                        timings.update(stats['timings'])
+                        finish('ok', rows=stats['total_rows'], bytes_out=os.fstat(output.fileno()).st_size, mode='streaming')
+                        return send_spooled_output(output, output_format)
+                    
+                    # CSV/JSON/JSON-lines bytes are sent while later chunks are still predicted
+                    def on_stream_complete(status, bytes_out):
+                        progress(f"🌊 Streamed {stats['total_rows']} rows in {stats['chunks']} chunks")
+                        timings.update(stats['timings'])
+                        if status != 'ok':
+                            ERRORS.inc(endpoint='upload', stage='stream')
+                        finish(status, rows=stats['total_rows'], bytes_out=bytes_out, mode='streaming')
+                    
+                    response = streamed_download(
+                        iter_output_bytes(predicted, output_format, stats['timings']),
+                        output_format,
+                        on_stream_complete,
+                    )
+                    response.call_on_close(input_file.close)
+                    handed_off = True
+                    return response
+                finally:
+                    if not handed_off:
+                        input_file.close()
+            
+            # Columnar in and out: predict on the projected columns, keep the rest in Arrow
+            if is_columnar(file.filename) and output_format in COLUMNAR_OUTPUT_FORMATS:
+                stage = 'parse'
+                parse_started = time.perf_counter()
+                table = read_arrow_table(file)
+                timings['parse'] = time.perf_counter() - parse_started
+                progress(f"📊 Columnar file loaded: {table.num_rows} rows, {table.num_columns} columns")
+                
+                if description_col not in table.column_names:
+                    available_cols = ', '.join(table.column_names)
+                    flash(f'Column "{description_col}" not found. Available columns: {available_cols}', 'error')
+                    return redirect('/data-categorizer')
+                
+                if ml_ready:
+                    stage = 'predict'
+                    try:
+                        table, stats = predict_arrow_table(
+                            table, description_col, ml_manager, supplier_col, category_col
+                        )
+                        timings.update(map_prediction_timings(stats.get('timings', {})))
+                        if result_cache is not None:
+                            result_cache.put(cache_key(), {None: table})
+                        flash('Data processed successfully with ML predictions!', 'success')
+                    except Exception as e:
+                        print(f"❌ ML processing failed: {e}")
+                        ERRORS.inc(endpoint='upload', stage='predict')
+                        flash(f'ML processing failed: {str(e)}', 'warning')
+                else:
+                    flash('ML models not available - returning original data', 'warning')
+                
+                stage = 'write'
+                timings['write'] = 0.0
+                output = spool_output([table], output_format, timings)
+                finish('ok', rows=table.num_rows, bytes_out=os.fstat(output.fileno()).st_size, mode='columnar')
+                return send_spooled_output(output, output_format)
+            
+            # Workbooks: every sheet (or the chosen ones) is categorized in one model pass
+            if is_workbook(file.filename):
+                stage = 'parse'
+                parse_started = time.perf_counter()
+                fd, input_path = tempfile.mkstemp(suffix='.xlsx')
+                os.close(fd)
+                try:
+                    file.save(input_path)
+                    sheets, targets, skipped = read_workbook(input_path, description_col, sheet_names, PARSE_WORKERS)
+                finally:
+                    remove_file(input_path)
+                timings['parse'] = time.perf_counter() - parse_started
+                progress(f"📊 Workbook loaded: {len(sheets)} sheets, {sum(len(df) for df in sheets.values())} rows")
+                if skipped:
+                    flash(f'Sheets without column "{description_col}" were copied unchanged: {", ".join(skipped)}', 'warning')
+                
+                if ml_ready:
+                    stage = 'predict'
+                    try:
+                        _, stats = ml_manager.predict_sheets(targets, description_col, supplier_col, category_col)
+                        timings.update(map_prediction_timings(stats.get('timings', {})))
+                        if result_cache is not None:
+                            result_cache.put(cache_key(), sheets)
+                        flash('Data processed successfully with ML predictions!', 'success')
+                    except Exception as e:
+                        print(f"❌ ML processing failed: {e}")
+                        ERRORS.inc(endpoint='upload', stage='predict')
+                        flash(f'ML processing failed: {str(e)}', 'warning')
+                else:
+                    flash('ML models not available - returning original data', 'warning')
+                
+                stage = 'write'
+                if output_format == 'excel':
+                    # Each sheet keeps its own worksheet
+                    timings['write'] = 0.0
+                    output = spool_output(sheets, output_format, timings)
+                    rows = sum(len(df) for df in sheets.values())
+                    finish('ok', rows=rows, bytes_out=os.fstat(output.fileno()).st_size, mode='workbook')
+                    return send_spooled_output(output, output_format)
+                return send_dataframe(combine_sheets(sheets), output_format, timings, finish, 'workbook')
             
             # Read the uploaded file
+            stage = 'parse'
+            parse_started = time.perf_counter()
             df = read_uploaded_file(file)
-            print(f"📊 File loaded: {len(df)} rows, {len(df.columns)} columns")
-            print(f"📋 Available columns: {list(df.columns)}")
+            timings['parse'] = time.perf_counter() - parse_started
+            progress(f"📊 File loaded: {len(df)} rows, {len(df.columns)} columns")
+            progress(f"📋 Available columns: {list(df.columns)}")
             
             # Validate that the description column exists
             if description_col not in df.columns:
@@ -75,83 +659,864 @@ def register_routes(app):
                 return redirect('/data-categorizer')
             
             # Process with ML model if available
-            if hasattr(app, 'ml_manager') and app.ml_manager and app.ml_manager.is_loaded:
+            if ml_ready:
+                stage = 'predict'
                 try:
-                    print("🤖 Running ML predictions...")
-                    df = app.ml_manager.predict_categories(df, description_col)
+                    progress("🤖 Running ML predictions...")
+                    df = ml_manager.predict_categories(df, description_col, supplier_col, category_col)
+                    stats = df.attrs.get('prediction_stats', {})
+                    timings.update(map_prediction_timings(stats.get('timings', {})))
+                    progress(f"🧮 Unique-to-total ratio: {stats.get('unique_ratio', 1.0):.3f}")
+                    if result_cache is not None:
+                        result_cache.put(cache_key(), {None: df})
                     flash('Data processed successfully with ML predictions!', 'success')
                 except Exception as e:
                     print(f"❌ ML processing failed: {e}")
+                    ERRORS.inc(endpoint='upload', stage='predict')
                     flash(f'ML processing failed: {str(e)}', 'warning')
             else:
-                print("⚠️ ML models not available")
-                if hasattr(app, 'ml_manager'):
-                    print(f"ML Manager exists: {app.ml_manager is not None}")
-                    if app.ml_manager:
-                        print(f"ML Models loaded: {app.ml_manager.is_loaded}")
-                else:
-                    print("ML Manager not found in app")
+                progress(f"⚠️ ML model {model_name or app.model_registry.default_model} not available")
                 flash('ML models not available - returning original data', 'warning')
             
             # Generate output file
-            output_file = generate_output_file(df, output_format)
-            
-            return send_file(
-                output_file,
-                as_attachment=True,
-                download_name=f'categorized_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{get_file_extension(output_format)}'
-            )
+            stage = 'write'
+            return send_dataframe(df, output_format, timings, finish, 'in_memory')
             
+        except AdmissionRejected as e:
+            finish('rejected', retry_after=e.retry_after)
+            return busy_response(e, 'data_categorizer')
         except Exception as e:
             print(f"❌ Error processing data: {e}")
-            flash(f'Error processing data: {str(e)}', 'error')
-            return redirect('/data-categorizer')
+            ERRORS.inc(endpoint='upload', stage=stage)
+            finish('error', stage=stage, error=str(e))
+            return upload_error(f'Error processing data: {str(e)}')
+        finally:
+            if upload_copy is not None:
+                upload_copy.close()
+    
+    @app.route('/upload/slim', methods=['POST'])
+    def upload_slim():
+        """Categorize columns extracted from a file in the browser; returns only the predicted columns.
+        
+        Body: {"description_column": "...", "supplier_column": "...", "category_column": "...",
+               "model": "...", "columns": {"<column>": [value per row], ...}}
+        """
+        import pandas as pd
+        
+        started = time.perf_counter()
+        timings = {}
+        payload = request.get_json(silent=True) or {}
+        columns = payload.get('columns')
+        description_col = str(payload.get('description_column') or '').strip()
+        supplier_col = str(payload.get('supplier_column') or '').strip() or None
+        category_col = str(payload.get('category_column') or '').strip() or None
+        model_name = payload.get('model') or app.model_registry.default_model
+        if not isinstance(columns, dict) or not all(isinstance(values, list) for values in columns.values()):
+            return jsonify({'error': 'Request body must include "columns": {"<column>": [...]}'}), 400
+        if description_col not in columns:
+            return jsonify({'error': f'Column "{description_col}" not found. Available columns: {", ".join(columns)}'}), 400
+        if len({len(values) for values in columns.values()}) > 1:
+            return jsonify({'error': 'Every column must have the same number of rows'}), 400
+        
+        try:
+            ml_manager = app.model_registry.get(model_name, timeout=MODEL_LOAD_WAIT)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 404
+        if ml_manager is None:
+            return jsonify({'error': 'ML models not available'}), 503
+        
+        try:
+            rows = len(next(iter(columns.values()), []))
+            admit_upload(estimate_frame_bytes(rows, len(columns)))
+        except AdmissionRejected as e:
+            record_request('upload_slim', 'rejected', time.perf_counter() - started, timings,
+                           bytes_in=request_bytes(), slow_seconds=SLOW_SECONDS, retry_after=e.retry_after)
+            return busy_response(e)
+        
+        df = pd.DataFrame(columns)
+        timings['parse'] = time.perf_counter() - started
+        try:
+            df = ml_manager.predict_categories(df, description_col, supplier_col, category_col)
+        except Exception as e:
+            print(f"❌ ML processing failed: {e}")
+            ERRORS.inc(endpoint='upload_slim', stage='predict')
+            record_request('upload_slim', 'error', time.perf_counter() - started, timings, slow_seconds=SLOW_SECONDS)
+            return jsonify({'error': f'ML processing failed: {str(e)}'}), 500
+        timings.update(map_prediction_timings(df.attrs.get('prediction_stats', {}).get('timings', {})))
+        
+        write_started = time.perf_counter()
+        response = jsonify({
+            'model': model_name,
+            'model_version': ml_manager.model_version,
+            'rows': len(df),
+            'columns': encode_slim_columns(df),
+        })
+        timings['write'] = time.perf_counter() - write_started
+        record_request(
+            'upload_slim', 'ok', time.perf_counter() - started, timings,
+            rows=len(df),
+            bytes_in=request_bytes(),
+            bytes_out=response.content_length or 0,
+            slow_seconds=SLOW_SECONDS,
+        )
+        return response
+    
+    @app.route('/api/predict', methods=['POST'])
+    def api_predict():
+        """Categorize a JSON list of descriptions: {"descriptions": ["...", ...], "model": "..."}"""
+        payload = request.get_json(silent=True) or {}
+        descriptions = payload.get('descriptions')
+        model_name = payload.get('model') or app.model_registry.default_model
+        if not isinstance(descriptions, list):
+            return jsonify({'error': 'Request body must be {"descriptions": [...]}'}), 400
+        if len(descriptions) > API_MAX:
+            return jsonify({'error': f'At most {API_MAX} descriptions per request'}), 413
+        # null, numbers or nested lists would otherwise be predicted as their str() ("none", "42")
+        invalid = next((i for i, description in enumerate(descriptions) if not isinstance(description, str)), None)
+        if invalid is not None:
+            return jsonify({'error': f'"descriptions" must all be strings (item {invalid} is not)'}), 400
+        
+        try:
+            ml_manager = app.model_registry.get(model_name, timeout=MODEL_LOAD_WAIT)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 404
+        if ml_manager is None:
+            return jsonify({'error': 'ML models not available'}), 503
+        
+        started = time.perf_counter()
+        try:
+            # Concurrent requests are merged into one model.predict call per model
+            labels = app.prediction_batcher.submit(
+                [(model_name, description) for description in descriptions],
+                timeout=MODEL_LOAD_WAIT,
+            )
+        except Exception as e:
+            print(f"❌ API prediction failed: {e}")
+            ERRORS.inc(endpoint='api_predict', stage='predict')
+            record_request('api_predict', 'error', time.perf_counter() - started, slow_seconds=SLOW_SECONDS)
+            return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
+        
+        record_request(
+            'api_predict', 'ok', time.perf_counter() - started,
+            {'predict': time.perf_counter() - started},
+            rows=len(descriptions),
+            bytes_in=request_bytes(),
+            slow_seconds=SLOW_SECONDS,
+        )
+        return jsonify({
+            'model': model_name,
+            'model_version': ml_manager.model_version,
+            'predictions': [
+                {'description': description, COL_SNS: sns, COL_MAJOR: major, COL_MINOR: minor}
+                for description, (sns, major, minor) in zip(descriptions, labels)
+            ],
+        })
+    
+    @app.route('/api/name-match', methods=['POST'])
+    def api_name_match():
+        """Closest master-list names: {"names": ["...", ...], "top_k": 3, "min_score": 0.0}"""
+        payload = request.get_json(silent=True) or {}
+        names = payload.get('names')
+        if not isinstance(names, list):
+            return jsonify({'error': 'Request body must be {"names": [...]}'}), 400
+        if len(names) > API_MAX:
+            return jsonify({'error': f'At most {API_MAX} names per request'}), 413
+        invalid = next((i for i, name in enumerate(names) if not isinstance(name, str)), None)
+        if invalid is not None:
+            return jsonify({'error': f'"names" must all be strings (item {invalid} is not)'}), 400
+        try:
+            top_k = int(payload.get('top_k') or DEFAULT_TOP_K)
+            min_score = float(payload.get('min_score') or 0.0)
+        except (TypeError, ValueError):
+            return jsonify({'error': '"top_k" must be an integer and "min_score" a number'}), 400
+        if not 1 <= top_k <= NAME_MAX_TOP_K:
+            return jsonify({'error': f'"top_k" must be between 1 and {NAME_MAX_TOP_K}'}), 400
+        
+        index = app.name_index.get()
+        if index is None:
+            return jsonify({'error': 'Supplier name index not built'}), 503
+        
+        started = time.perf_counter()
+        try:
+            matches = index.top_matches(names, top_k=top_k, min_score=min_score)
+        except Exception as e:
+            print(f"❌ Name matching failed: {e}")
+            ERRORS.inc(endpoint='api_name_match', stage='match')
+            record_request('api_name_match', 'error', time.perf_counter() - started, slow_seconds=SLOW_SECONDS)
+            return jsonify({'error': f'Name matching failed: {str(e)}'}), 500
+        
+        record_request(
+            'api_name_match', 'ok', time.perf_counter() - started,
+            {'match': time.perf_counter() - started},
+            rows=len(names),
+            bytes_in=request_bytes(),
+            slow_seconds=SLOW_SECONDS,
+        )
+        return jsonify({
+            'index_version': index.version,
+            'matches': [{'name': name, 'candidates': candidates} for name, candidates in zip(names, matches)],
+        })
+    
+    @app.route('/api/predict/stats')
+    def api_predict_stats():
+        """Throughput, batch size and latency percentiles of /api/predict"""
+        return jsonify(app.prediction_batcher.stats())
+    
+    @app.route('/models')
+    def models():
+        """Available and resident models with their versions"""
+        return jsonify({**app.model_registry.stats(), 'models': app.model_registry.describe()})
+    
+    @app.route('/healthz')
+    def healthz():
+        """Liveness: the process is up and answering requests"""
+        return jsonify({'status': 'alive', 'pid': os.getpid()})
+    
+    @app.route('/readyz')
+    def readyz():
+        """Readiness: 200 once the default model is loaded, 503 until then"""
+        registry = app.model_registry
+        ready = registry.is_ready()
+        return jsonify({
+            'status': 'ready' if ready else 'loading',
+            'pid': os.getpid(),
+            'default_model': registry.default_model,
+            'models': {name: manager.is_loaded for name, manager in registry.resident()},
+        }), 200 if ready else 503
+    
+    @app.route('/metrics')
+    def metrics():
+        """Pipeline metrics in Prometheus text exposition format"""
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+    
+    @app.route('/admin/profiles')
+    def admin_profiles():
+        """Saved request profiles, newest first"""
+        denied = admin_denied()
+        if denied is not None:
+            return denied
+        profiles = app.profiler.list()
+        for profile in profiles:
+            profile['summary_url'] = url_for('admin_profile', profile_id=profile['id'])
+            profile['stacks_url'] = url_for('admin_profile_stacks', profile_id=profile['id'])
+        return jsonify({'pid': os.getpid(), 'profiles': profiles})
+    
+    @app.route('/admin/profiles/<profile_id>')
+    def admin_profile(profile_id):
+        """Profile summary: hot functions and lines, peak traced memory and top allocation sites"""
+        denied = admin_denied()
+        if denied is not None:
+            return denied
+        path = app.profiler.path(profile_id, 'summary')
+        if path is None:
+            return jsonify({'error': 'Unknown profile'}), 404
+        return send_file(path, mimetype='application/json', as_attachment=bool(request.args.get('download')),
+                         download_name=f'{profile_id}.json')
+    
+    @app.route('/admin/profiles/<profile_id>/stacks')
+    def admin_profile_stacks(profile_id):
+        """Collapsed stack samples, for flamegraph.pl or speedscope"""
+        denied = admin_denied()
+        if denied is not None:
+            return denied
+        path = app.profiler.path(profile_id, 'stacks')
+        if path is None:
+            return jsonify({'error': 'Unknown profile'}), 404
+        return send_file(path, mimetype='text/plain', as_attachment=True, download_name=f'{profile_id}.folded')
+    
+    @app.route('/jobs/<job_id>')
+    def job_status(job_id):
+        """Status and progress of an async upload job"""
+        job = app.job_manager.get(job_id) if hasattr(app, 'job_manager') else None
+        if job is None:
+            return jsonify({'error': 'Job not found or expired'}), 404
+        
+        payload = job.to_dict()
+        if job.status == 'done':
+            payload['result_url'] = url_for('job_result', job_id=job.id)
+        return jsonify(payload)
+    
+    @app.route('/jobs/<job_id>/result')
+    def job_result(job_id):
+        """Download the output of a finished async upload job"""
+        job = app.job_manager.get(job_id) if hasattr(app, 'job_manager') else None
+        if job is None:
+            return jsonify({'error': 'Job not found or expired'}), 404
+        if job.status != 'done':
+            return jsonify({'error': f'Job is {job.status}', 'status': job.status}), 409
+        
+        return send_file(job.result_path, as_attachment=True, download_name=job.download_name)
+
+def request_bytes():
+    """Request body size as sent, before a gzip/zstd Content-Encoding was undone"""
+    return request.content_length or request.environ.get(REQUEST_BYTES_KEY, 0)
 
 def read_uploaded_file(file):
     """Read uploaded file based on its extension"""
+    import pandas as pd
+    
     filename = file.filename.lower()
     
     try:
         if filename.endswith('.csv'):
             return pd.read_csv(file)
         elif filename.endswith('.xlsx'):
-            try:
-                return pd.read_excel(file, engine='openpyxl')
-            except ImportError:
-                raise Exception("openpyxl is required for Excel files. Install with: pip install openpyxl")
+            return pd.read_excel(file, engine=excel_engine())
         elif filename.endswith('.json'):
             return pd.read_json(file)
+        elif filename.endswith('.jsonl'):
+            return pd.read_json(file, lines=True)
         elif filename.endswith('.txt'):
             return pd.read_csv(file, sep='\t')
+        elif filename.endswith(COLUMNAR_EXTENSIONS):
+            return arrow_to_pandas(read_arrow_table(file))
         else:
             raise Exception(f"Unsupported file format: {filename}")
     except Exception as e:
         raise Exception(f"Failed to read file: {str(e)}")
 
+def excel_engine():
+    """Fastest installed Excel reader: calamine, else openpyxl in read-only mode"""
+    try:
+        import python_calamine
+        return 'calamine'
+    except ImportError:
+        pass
+    try:
+        import openpyxl
+        return 'openpyxl'
+    except ImportError:
+        raise Exception("openpyxl is required for Excel files. Install with: pip install openpyxl")
+
+def is_workbook(filename):
+    """Check whether a file is an Excel workbook"""
+    return filename.lower().endswith('.xlsx')
+
+def parse_sheet_names(value):
+    """Comma-separated sheet names from the upload form; None means every sheet"""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    return names or None
+
+def _parse_excel_sheets(path, sheet_names, engine):
+    """Parse some sheets of a workbook; runs in a worker process when parsing in parallel"""
+    import pandas as pd
+    
+    with pd.ExcelFile(path, engine=engine) as workbook:
+        return [(name, workbook.parse(name)) for name in sheet_names]
+
+def read_excel_sheets(path, sheet_names=None, workers=1):
+    """Read the chosen sheets (default: all) of a workbook as {sheet name: DataFrame} in workbook order"""
+    import pandas as pd
+    
+    engine = excel_engine()
+    try:
+        with pd.ExcelFile(path, engine=engine) as workbook:
+            available = workbook.sheet_names
+        if sheet_names:
+            missing = [name for name in sheet_names if name not in available]
+            if missing:
+                raise Exception(f"Sheet(s) not found: {', '.join(missing)}. Available sheets: {', '.join(available)}")
+            names = [name for name in available if name in sheet_names]
+        else:
+            names = available
+        
+        can_fork = 'fork' in multiprocessing.get_all_start_methods()
+        if workers <= 1 or len(names) <= 1 or not can_fork:
+            parsed = _parse_excel_sheets(path, names, engine)
+        else:
+            # Round-robin so large and small sheets spread across workers
+            groups = [names[i::workers] for i in range(min(workers, len(names)))]
+            progress(f"🧩 Parsing {len(names)} sheets on {len(groups)} workers")
+            with multiprocessing.get_context('fork').Pool(len(groups)) as pool:
+                results = pool.starmap(_parse_excel_sheets, [(path, group, engine) for group in groups])
+            parsed = [item for group in results for item in group]
+    except Exception as e:
+        raise Exception(f"Failed to read file: {str(e)}")
+    
+    sheets = dict(parsed)
+    return {name: sheets[name] for name in names}
+
+def read_workbook(path, description_column, sheet_names=None, workers=1):
+    """Read a workbook; returns (all sheets, sheets to categorize, names of sheets skipped)"""
+    sheets = read_excel_sheets(path, sheet_names, workers)
+    targets = {name: df for name, df in sheets.items() if description_column in df.columns}
+    skipped = [name for name in sheets if name not in targets]
+    if not targets:
+        first = next(iter(sheets.values()), None)
+        available_cols = ', '.join(map(str, first.columns)) if first is not None else ''
+        raise Exception(f'Column "{description_column}" not found in any sheet. Available columns: {available_cols}')
+    if skipped:
+        progress(f"⏭️ Sheets without column {description_column}: {skipped}")
+    return sheets, targets, skipped
+
+def combine_sheets(sheets):
+    """One DataFrame for non-Excel outputs; a Sheet column records each row's sheet"""
+    import pandas as pd
+    
+    if len(sheets) == 1:
+        return next(iter(sheets.values()))
+    return pd.concat(
+        list(sheets.values()), keys=list(sheets), names=[COL_SHEET, None]
+    ).reset_index(level=0).reset_index(drop=True)
+
+def import_pyarrow():
+    """Import pyarrow, which is only needed for Parquet and Arrow files"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise Exception("pyarrow is required for Parquet and Arrow files. Install with: pip install pyarrow")
+    return pyarrow
+
+def arrow_to_pandas(table):
+    """Table or record batch as a DataFrame; compact mode keeps text Arrow-backed instead of Python strings"""
+    if not COMPACT_DTYPES:
+        return table.to_pandas()
+    import numpy as np
+    import pandas as pd
+    pa = import_pyarrow()
+    try:
+        string_dtype = pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        # pandas < 2.3; same NaN-for-missing semantics as object columns
+        string_dtype = pd.StringDtype('pyarrow_numpy')
+    return table.to_pandas(types_mapper={pa.string(): string_dtype, pa.large_string(): string_dtype}.get)
+
+def is_columnar(filename):
+    """Check whether a file is Parquet or Arrow IPC/Feather"""
+    return filename.lower().endswith(COLUMNAR_EXTENSIONS)
+
+def read_arrow_table(file):
+    """Read an uploaded Parquet or Arrow IPC/Feather file as a pyarrow Table"""
+    import_pyarrow()
+    if file.filename.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(file.stream)
+    import pyarrow.feather as feather
+    return feather.read_table(file.stream)
+
+def iter_ipc_frames(source, chunksize):
+    """Yield an Arrow IPC file's record batches as DataFrames of at most chunksize rows"""
+    pa = import_pyarrow()
+    reader = pa.ipc.open_file(source)
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        for offset in range(0, batch.num_rows, chunksize):
+            yield arrow_to_pandas(batch.slice(offset, chunksize))
+
+def predict_arrow_table(table, description_column, ml_manager, supplier_column=None, category_column=None):
+    """Predict from the projected description and label columns, then set them back on the table"""
+    pa = import_pyarrow()
+    projected = [description_column] + [
+        col for col in PREDICTION_COLUMNS if col in table.column_names and col != description_column
+    ]
+    # Supplier and category columns are only read, for the rule index
+    rule_columns = [
+        col for col in dict.fromkeys((supplier_column, category_column))
+        if col in table.column_names and col not in projected
+    ]
+    df = ml_manager.predict_categories(
+        arrow_to_pandas(table.select(projected + rule_columns)), description_column, supplier_column, category_column
+    )
+    
+    # Compact mode leaves the description column unchanged, so only the labels are set back
+    unchanged = rule_columns + ([description_column] if COMPACT_DTYPES else [])
+    for name in df.columns.difference(unchanged, sort=False):
+        column = pa.Array.from_pandas(df[name])
+        if name in table.column_names:
+            table = table.set_column(table.column_names.index(name), name, column)
+        else:
+            table = table.append_column(name, column)
+    return encode_prediction_columns(table), df.attrs.get('prediction_stats', {})
+
+def encode_prediction_columns(table):
+    """Dictionary-encode prediction columns that are still plain strings"""
+    pa = import_pyarrow()
+    for i, field in enumerate(table.schema):
+        if field.name in PREDICTION_COLUMNS and (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+    return table
+
+def encode_slim_columns(df):
+    """Prediction columns as {"categories": [...], "codes": [...]}; code -1 is a missing value"""
+    import pandas as pd
+    
+    encoded = {}
+    for col in PREDICTION_COLUMNS:
+        if col in df.columns:
+            codes, categories = pd.factorize(df[col])
+            encoded[col] = {'categories': [str(value) for value in categories], 'codes': codes.tolist()}
+    return encoded
+
+def is_streamable(filename):
+    """Check whether a file can be read chunk by chunk"""
+    return filename.lower().endswith(STREAMABLE_EXTENSIONS)
+
+def iter_uploaded_file_chunks(file, chunksize=STREAMING_CHUNK_ROWS):
+    """Yield an uploaded CSV, TXT or JSON-lines file as DataFrame chunks"""
+    import pandas as pd
+    
+    filename = file.filename.lower()
+    
+    try:
+        if filename.endswith('.csv'):
+            reader = pd.read_csv(file, chunksize=chunksize)
+        elif filename.endswith('.txt'):
+            reader = pd.read_csv(file, sep='\t', chunksize=chunksize)
+        elif filename.endswith('.jsonl'):
+            reader = pd.read_json(file, lines=True, chunksize=chunksize)
+        elif filename.endswith('.parquet'):
+            import_pyarrow()
+            import pyarrow.parquet as pq
+            # Row groups are read batch by batch, never the whole file
+            batches = pq.ParquetFile(file.stream).iter_batches(batch_size=chunksize)
+            reader = (arrow_to_pandas(batch) for batch in batches)
+        elif filename.endswith(('.arrow', '.feather')):
+            reader = iter_ipc_frames(file.stream, chunksize)
+        else:
+            raise Exception(f"Streaming is not supported for: {filename}")
+        
+        for chunk in reader:
+            # Chunks keep a running index; predictions align by position
+            yield chunk.reset_index(drop=True)
+    except Exception as e:
+        raise Exception(f"Failed to read file: {str(e)}")
+
+def copy_upload(file):
+    """Copy an upload into an anonymous temp file that outlives the request"""
+    spooled = tempfile.TemporaryFile()
+    shutil.copyfileobj(file.stream, spooled)
+    spooled.seek(0)
+    return FileStorage(stream=spooled, filename=file.filename)
+
+def new_stream_stats():
+    """Counters and per-stage timings filled in by predict_chunks and the writers"""
+    return {
+        'chunks': 0,
+        'total_rows': 0,
+        'unique_descriptions': 0,
+        'timings': {'parse': 0.0, 'predict': 0.0, 'decode': 0.0, 'merge': 0.0, 'write': 0.0},
+    }
+
+def predict_chunks(chunks, description_column, ml_manager=None, stats=None, supplier_column=None, category_column=None):
+    """Yield each chunk after prediction, keeping only one chunk in memory at a time"""
+    if stats is None:
+        stats = new_stream_stats()
+    timings = stats['timings']
+    
+    chunks = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        timings['parse'] += time.perf_counter() - started
+        if chunk is None:
+            return
+        
+        if ml_manager is not None:
+            chunk = ml_manager.predict_categories(chunk, description_column, supplier_column, category_column)
+            chunk_stats = chunk.attrs.get('prediction_stats', {})
+            stats['unique_descriptions'] += chunk_stats.get('unique_descriptions', 0)
+            for stage, seconds in map_prediction_timings(chunk_stats.get('timings', {})).items():
+                timings[stage] += seconds
+        
+        stats['chunks'] += 1
+        stats['total_rows'] += len(chunk)
+        yield chunk
+
+def iter_frame_blocks(df, rows=OUTPUT_BLOCK_ROWS):
+    """Split an in-memory DataFrame into blocks for the streaming writers"""
+    if len(df) == 0:
+        yield df
+        return
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+def iter_output_bytes(chunks, output_format, timings=None, header=True):
+    """Encode DataFrame chunks as CSV, JSON or JSON-lines, yielding bytes per chunk.
+    
+    header=False leaves out the CSV header, for appending to an existing file.
+    """
+    if output_format not in ('csv', 'json', 'jsonl'):
+        raise Exception(f"Streaming output is not supported for: {output_format}")
+    
+    first_chunk = header
+    wrote_records = False
+    if output_format == 'json':
+        yield b'[\n'
+    
+    for chunk in chunks:
+        started = time.perf_counter()
+        if output_format == 'csv':
+            data = chunk.to_csv(index=False, header=first_chunk)
+        elif output_format == 'jsonl':
+            data = chunk.to_json(orient='records', lines=True) if len(chunk) else ''
+            if data and not data.endswith('\n'):
+                data += '\n'
+        else:
+            data = chunk.to_json(orient='records', lines=True).strip().replace('\n', ',\n') if len(chunk) else ''
+            if data and wrote_records:
+                data = ',\n' + data
+            wrote_records = wrote_records or bool(data)
+        first_chunk = False
+        if timings is not None:
+            timings['write'] += time.perf_counter() - started
+        if data:
+            yield data.encode('utf-8')
+    
+    if output_format == 'json':
+        yield b'\n]\n'
+
+def write_excel_file(chunks, target, timings=None):
+    """Write DataFrame chunks to a single-sheet .xlsx"""
+    write_excel_sheets([(None, chunks)], target, timings)
+
+def write_excel_sheets(sheets, target, timings=None):
+    """Write (sheet name, DataFrame chunks) pairs to .xlsx row by row using xlsxwriter's constant-memory mode"""
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise Exception("xlsxwriter is required for Excel export. Install with: pip install xlsxwriter")
+    
+    workbook = xlsxwriter.Workbook(target, {
+        'constant_memory': True,
+        'strings_to_urls': False,
+        'nan_inf_to_errors': True,
+        'remove_timezone': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    try:
+        header_format = workbook.add_format({'bold': True})
+        # constant_memory needs each sheet finished before the next one starts
+        for sheet_name, chunks in sheets:
+            worksheet = workbook.add_worksheet(sheet_name)
+            row = 0
+            for chunk in chunks:
+                started = time.perf_counter()
+                if row == 0:
+                    worksheet.write_row(0, 0, [str(col) for col in chunk.columns], header_format)
+                    row = 1
+                if row + len(chunk) > EXCEL_MAX_ROWS + 1:
+                    raise Exception(f"Excel output is limited to {EXCEL_MAX_ROWS} rows per sheet; choose CSV or JSON")
+                # Plain Python values with blanks for missing cells
+                values = chunk.astype(object).where(chunk.notna(), None)
+                for record in values.itertuples(index=False, name=None):
+                    worksheet.write_row(row, 0, record)
+                    row += 1
+                if timings is not None:
+                    timings['write'] += time.perf_counter() - started
+    finally:
+        workbook.close()
+
+def extend_dictionaries(table, dictionaries):
+    """Re-encode dictionary columns so each chunk's dictionary extends the previous chunk's.
+
+    Arrow IPC files accept dictionary deltas but not replacements; dictionaries
+    maps column name to the dictionary written so far and is updated in place.
+    """
+    pa = import_pyarrow()
+    import pyarrow.compute as pc
+    
+    for i, field in enumerate(table.schema):
+        if not pa.types.is_dictionary(field.type):
+            continue
+        values = table.column(i).cast(field.type.value_type).combine_chunks()
+        unique = pc.drop_null(pc.unique(values))
+        previous = dictionaries.get(field.name)
+        if previous is None:
+            dictionary = unique
+        else:
+            added = unique.filter(pc.invert(pc.is_in(unique, value_set=previous)))
+            dictionary = pa.concat_arrays([previous, added])
+        dictionaries[field.name] = dictionary
+        indices = pc.index_in(values, value_set=dictionary).cast(pa.int32())
+        table = table.set_column(i, field.name, pa.DictionaryArray.from_arrays(indices, dictionary))
+    return table
+
+def write_arrow_file(chunks, output_format, output, timings=None):
+    """Write DataFrame or Table chunks as Parquet row groups or Arrow IPC record batches"""
+    pa = import_pyarrow()
+    import pyarrow.parquet as pq
+    
+    writer = None
+    schema = None
+    dictionaries = {}
+    try:
+        for chunk in chunks:
+            started = time.perf_counter()
+            if isinstance(chunk, pa.Table):
+                table = encode_prediction_columns(chunk)
+            else:
+                table = encode_prediction_columns(pa.Table.from_pandas(arrow_compatible(chunk), preserve_index=False))
+            if output_format == 'arrow':
+                table = extend_dictionaries(table, dictionaries)
+            if writer is None:
+                schema = table.schema
+                if output_format == 'parquet':
+                    writer = pq.ParquetWriter(output, schema)
+                else:
+                    options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                    writer = pa.ipc.new_file(output, schema, options=options)
+            elif not table.schema.equals(schema, check_metadata=False):
+                # e.g. a column that is all-null in this chunk only
+                table = table.cast(schema)
+            writer.write_table(table)
+            if timings is not None:
+                timings['write'] += time.perf_counter() - started
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_output(chunks, output_format, output, timings=None):
+    """Write DataFrame chunks to a binary file object in the requested format.
+    
+    For Excel, chunks may also be a {sheet name: DataFrame} dict, written one worksheet per sheet.
+    """
+    if output_format == 'excel' and isinstance(chunks, dict):
+        write_excel_sheets([(name, iter_frame_blocks(df)) for name, df in chunks.items()], output, timings)
+    elif output_format == 'excel':
+        write_excel_file(chunks, output, timings)
+    elif output_format in COLUMNAR_OUTPUT_FORMATS:
+        write_arrow_file(chunks, output_format, output, timings)
+    elif output_format in ('csv', 'json', 'jsonl'):
+        for data in iter_output_bytes(chunks, output_format, timings):
+            output.write(data)
+    else:
+        raise Exception(f"Unsupported output format: {output_format}")
+
+def write_output_file(chunks, output_format, timings=None):
+    """Write DataFrame chunks to a new temporary file; the caller must remove it"""
+    fd, path = tempfile.mkstemp(suffix=f'.{get_file_extension(output_format)}')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_output(chunks, output_format, f, timings)
+        return path
+    except Exception:
+        remove_file(path)
+        raise
+
+def spool_output(chunks, output_format, timings=None):
+    """Write DataFrame chunks to an anonymous temp file, deleted as soon as it is closed"""
+    output = tempfile.TemporaryFile()
+    try:
+        write_output(chunks, output_format, output, timings)
+        output.seek(0)
+        return output
+    except Exception:
+        output.close()
+        raise
+
+def remove_file(path):
+    """Delete a temporary file, ignoring files that are already gone"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ Could not remove temporary file {path}: {e}")
+
 def generate_output_file(df, output_format):
-    """Generate output file in the requested format"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    """Generate output file in the requested format; the caller must remove it"""
+    try:
+        return write_output_file(iter_frame_blocks(df), output_format)
+    except Exception as e:
+        raise Exception(f"Failed to generate {output_format} file: {str(e)}")
+
+def run_categorization_job(job, input_path, filename, description_column, output_format, ml_manager, chunk_rows,
+                           sheet_names=None, parse_workers=1, supplier_column=None, category_column=None):
+    """Background worker for async uploads; returns the output file path"""
+    started = time.perf_counter()
+    if ml_manager is None:
+        job.update_progress(warning='ML models not available - returning original data')
     
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{get_file_extension(output_format)}') as tmp:
-        try:
-            if output_format == 'excel':
-                df.to_excel(tmp.name, index=False, engine='openpyxl')
-            elif output_format == 'csv':
-                df.to_csv(tmp.name, index=False)
-            elif output_format == 'json':
-                df.to_json(tmp.name, orient='records', indent=2)
+    with open(input_path, 'rb') as f:
+        file = FileStorage(stream=f, filename=filename)
+        
+        if is_streamable(filename) and output_format in STREAMING_OUTPUT_FORMATS:
+            job.update_progress(stage='streaming', rows_processed=0)
+            chunks = iter_uploaded_file_chunks(file, chunk_rows)
+            first_chunk = next(chunks, None)
+            if first_chunk is None:
+                raise Exception("Uploaded file is empty")
+            if description_column not in first_chunk.columns:
+                raise Exception(f'Column "{description_column}" not found. Available columns: {", ".join(first_chunk.columns)}')
             
-            return tmp.name
-        except Exception as e:
+            def tracked(chunks):
+                rows = 0
+                for chunk in chunks:
+                    yield chunk
+                    # Resumed once the previous chunk has been written
+                    rows += len(chunk)
+                    job.update_progress(rows_processed=rows)
+            
+            stats = new_stream_stats()
+            output_file = write_output_file(
+                tracked(predict_chunks(
+                    chain([first_chunk], chunks), description_column, ml_manager, stats, supplier_column, category_column
+                )),
+                output_format,
+                stats['timings'],
+            )
+            total_rows = stats['total_rows']
+        elif is_workbook(filename):
+            job.update_progress(stage='reading')
+            sheets, targets, skipped = read_workbook(input_path, description_column, sheet_names, parse_workers)
+            total_rows = sum(len(df) for df in sheets.values())
+            if skipped:
+                job.update_progress(skipped_sheets=skipped)
+            
+            if ml_manager is not None:
+                job.update_progress(stage='predicting', total_rows=total_rows)
+                ml_manager.predict_sheets(targets, description_column, supplier_column, category_column)
+            
+            job.update_progress(stage='writing')
             if output_format == 'excel':
-                raise Exception("Excel export failed. Install openpyxl: pip install openpyxl")
-            raise Exception(f"Failed to generate {output_format} file: {str(e)}")
+                output_file = write_output_file(sheets, output_format)
+            else:
+                output_file = write_output_file(cancellable(job, iter_frame_blocks(combine_sheets(sheets))), output_format)
+        else:
+            job.update_progress(stage='reading')
+            df = read_uploaded_file(file)
+            if description_column not in df.columns:
+                raise Exception(f'Column "{description_column}" not found. Available columns: {", ".join(df.columns)}')
+            
+            if ml_manager is not None:
+                job.update_progress(stage='predicting', total_rows=len(df))
+                df = ml_manager.predict_categories(df, description_column, supplier_column, category_column)
+            
+            job.update_progress(stage='writing')
+            # Checked per block so a worker shutting down does not wait for (or leave) a half-written file
+            output_file = write_output_file(cancellable(job, iter_frame_blocks(df)), output_format)
+            total_rows = len(df)
+    
+    job.update_progress(stage='done', rows_processed=total_rows)
+    record_request(
+        'job', 'ok', time.perf_counter() - started,
+        rows=total_rows,
+        bytes_in=os.path.getsize(input_path),
+        bytes_out=os.path.getsize(output_file),
+        job_id=job.id,
+    )
+    return output_file
+
+def cancellable(job, chunks):
+    """Chunks of a job's output, stopping with JobCancelled once the job is cancelled"""
+    for chunk in chunks:
+        job.check_cancelled()
+        yield chunk
+
+def run_admitted_job(job, admission, estimate, *args, **kwargs):
+    """run_categorization_job once the upload's memory estimate fits the admission budget"""
+    job.update_progress(stage='waiting for memory')
+    with admission.admit(estimate, timeout=None):
+        return run_categorization_job(job, *args, **kwargs)
 
 def get_file_extension(output_format):
     """Get file extension for output format"""
     extensions = {
         'excel': 'xlsx',
         'csv': 'csv',
-        'json': 'json'
+        'json': 'json',
+        'jsonl': 'jsonl',
+        'parquet': 'parquet',
+        'arrow': 'arrow'
     }
     return extensions.get(output_format, 'xlsx')
\ No newline at end of file
@@ -0,0 +1,354 @@
+import sqlite3
+import threading
+import time
+import os
+import logging
+
+from ml_utils import COL_SNS, COL_MAJOR, COL_MINOR, normalize_descriptions, blank_mask
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ RULE INDEX CONFIGURATIONS ---
+# Rules of the default model; other models keep theirs next to it
+# (rule_index_<model>.sqlite3) since labels differ between models
+RULE_INDEX_PATH = "cache/rule_index.sqlite3"
+
+# Uploads teach rules from explicit corrections: full labels in the category column
+LEARN_FROM_UPLOADS = True
+
+# Also learn every uploaded row with S/NS, Major and Minor filled. Off by default:
+# re-uploaded output would turn one model's predictions into permanent rules that
+# override every later retrained model. The rebuild CLI always reads these columns.
+LEARN_FROM_LABEL_COLUMNS = False
+
+# Labels use the model's class format: "S/NS | Major | Minor"
+LABEL_SEPARATOR = " | "
+
+# Joins supplier and description into one lookup key
+_KEY_SEPARATOR = "\x1f"
+
+
+def rule_index_path(model=None):
+    """Rule index file of a model (None: the default model)"""
+    if not model:
+        return RULE_INDEX_PATH
+    root, extension = os.path.splitext(RULE_INDEX_PATH)
+    return f"{root}_{model}{extension}"
+
+
+def factorize_text(series, normalize=False):
+    """(code per row, distinct values stripped or normalized, blank flag per distinct value)"""
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    missing = np.asarray(pd.isna(uniques), dtype=bool)
+    distinct = pd.Series(uniques, dtype=object).where(~missing, "")
+    distinct = normalize_descriptions(distinct) if normalize else distinct.astype(str).str.strip()
+    values = distinct.to_numpy(dtype=object)
+    return codes, values, missing | (values == "")
+
+
+def factorize_rows(code_arrays):
+    """(code per row, position of each code's first row) over several aligned code arrays"""
+    import numpy as np
+    import pandas as pd
+
+    if not len(code_arrays[0]):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    combined = None
+    for codes in code_arrays:
+        if combined is None:
+            combined, _ = pd.factorize(codes)
+        else:
+            # Re-factorize after each column so codes stay below the row count
+            combined, _ = pd.factorize(combined.astype(np.int64) * (codes.max() + 1) + codes)
+    _, first = np.unique(combined, return_index=True)
+    return combined, first
+
+
+def key_columns(df, description_column, supplier_column=None):
+    """Factorized (supplier, description) columns that make up the lookup key"""
+    import numpy as np
+
+    description = factorize_text(df[description_column], normalize=True)
+    if not supplier_column or supplier_column not in df.columns:
+        # No supplier: every row shares the empty supplier
+        return [(np.zeros(len(df), dtype=np.intp), np.array([""], dtype=object), None), description]
+    return [factorize_text(df[supplier_column], normalize=True), description]
+
+
+def distinct_rules(keys, labels, mask):
+    """{key: label} built once per distinct key and label combination among the masked rows"""
+    import numpy as np
+
+    columns = keys + labels
+    _, first = factorize_rows([codes[mask] for codes, _, _ in columns])
+    positions = np.flatnonzero(mask)[first]
+    parts = [values[codes[positions]] for codes, values, _ in columns]
+    suppliers, descriptions, label_parts = parts[0], parts[1], parts[2:]
+    rule_keys = [supplier + _KEY_SEPARATOR + description for supplier, description in zip(suppliers, descriptions)]
+    rule_labels = [LABEL_SEPARATOR.join(label) for label in zip(*label_parts)]
+    # Later rows win when the same key has several labels
+    return dict(zip(rule_keys, rule_labels))
+
+
+class RuleIndex:
+    """Exact-match (supplier, description) -> label rules learned from categorized rows.
+
+    Rules live in a dict for hash lookups and are persisted to SQLite. Every write
+    bumps a revision stored next to the rules, so other processes (pre-fork workers,
+    the rebuild CLI) see the change on their next refresh().
+    """
+
+    def __init__(self, path=None, learn=None, learn_label_columns=None):
+        self.path = path or RULE_INDEX_PATH
+        self.learn = LEARN_FROM_UPLOADS if learn is None else learn
+        self.learn_label_columns = LEARN_FROM_LABEL_COLUMNS if learn_label_columns is None else learn_label_columns
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.learned = 0
+
+        index_dir = os.path.dirname(self.path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS rules (
+                   rule_key TEXT PRIMARY KEY,
+                   label TEXT NOT NULL,
+                   updated_at REAL NOT NULL
+               )"""
+        )
+        # revision: updated_at of the latest write; cleared: time of the last clear()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (name, value) SELECT 'revision', COALESCE(MAX(updated_at), 0) FROM rules"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('cleared', 0)")
+        self._conn.commit()
+        self._rules = {}
+        # Time of the latest change; results computed with other rules are not reused
+        self.revision = None
+        self._cleared = None
+        self._sync()
+        print(f"📒 Rule index opened: {self.path} ({len(self._rules)} rules)")
+
+    def __len__(self):
+        return len(self._rules)
+
+    def _stored_state(self):
+        return dict(self._conn.execute("SELECT name, value FROM meta"))
+
+    def _sync(self):
+        """Load what other processes wrote since the last sync (everything after a clear); lock held"""
+        state = self._stored_state()
+        revision, cleared = state.get('revision', 0.0), state.get('cleared', 0.0)
+        if revision == self.revision and cleared == self._cleared:
+            return False
+        if cleared != self._cleared:
+            self._rules = dict(self._conn.execute("SELECT rule_key, label FROM rules"))
+        else:
+            self._rules.update(self._conn.execute(
+                "SELECT rule_key, label FROM rules WHERE updated_at > ?", (self.revision,)
+            ))
+        self.revision, self._cleared = revision, cleared
+        return True
+
+    def _write(self, statements):
+        """Run statements(now) in one write transaction and bump the stored revision; lock held.
+
+        now is taken once the database is locked for writing and is above every earlier
+        revision, so rules written by other processes are never skipped by _sync().
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = self._stored_state().get('revision', 0.0)
+            now = max(time.time(), stored + 1e-6)
+            statements(now)
+            self._conn.execute("UPDATE meta SET value = ? WHERE name = 'revision'", (now,))
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._sync()
+
+    def refresh(self):
+        """Pick up rules written by other processes; returns the current revision"""
+        with self._lock:
+            if self._sync():
+                logger.info(f"Rule index reloaded: {len(self._rules)} rules")
+            return self.revision
+
+    def put_many(self, rules):
+        """Store {key: label}; returns the number of new or changed rules"""
+        with self._lock:
+            self._sync()
+            changed = [(key, label) for key, label in rules.items() if self._rules.get(key) != label]
+            if not changed:
+                return 0
+            self._write(lambda now: self._conn.executemany(
+                "INSERT OR REPLACE INTO rules (rule_key, label, updated_at) VALUES (?, ?, ?)",
+                [(key, label, now) for key, label in changed],
+            ))
+            self.learned += len(changed)
+        return len(changed)
+
+    def learn_frame(self, df, description_column, supplier_column=None, category_column=None):
+        """Learn rules from corrections in df (and filled label columns if enabled); returns rules added or changed"""
+        return self.put_many(self._frame_rules(
+            df, description_column, supplier_column, category_column, self.learn_label_columns
+        ))
+
+    @staticmethod
+    def _frame_rules(df, description_column, supplier_column=None, category_column=None, label_columns=True):
+        """{key: label} for the categorized rows of df; strings are built once per distinct row"""
+        import numpy as np
+
+        keys = key_columns(df, description_column, supplier_column)
+        rules = {}
+        label_columns = [COL_SNS, COL_MAJOR, COL_MINOR] if label_columns else []
+        if label_columns and all(col in df.columns for col in label_columns):
+            labels = [factorize_text(df[col]) for col in label_columns]
+            categorized = ~np.logical_or.reduce([blank[codes] for codes, _, blank in labels])
+            if categorized.any():
+                rules.update(distinct_rules(keys, labels, categorized))
+
+        # Full labels in the category column are corrections and win over the label columns
+        if category_column and category_column in df.columns:
+            codes, values, blank = factorize_text(df[category_column])
+            valid = ~blank & np.array([value.count(LABEL_SEPARATOR) == 2 for value in values], dtype=bool)
+            labelled = valid[codes]
+            if labelled.any():
+                rules.update(distinct_rules(keys, [(codes, values, blank)], labelled))
+
+        return rules
+
+    def lookup(self, df, description_column, supplier_column=None):
+        """(hit mask, label per hit row) for the rows of df"""
+        import numpy as np
+        import pandas as pd
+
+        if not self._rules:
+            self.misses += len(df)
+            return np.zeros(len(df), dtype=bool), np.empty(0, dtype=object)
+
+        # Build and look up each distinct key once
+        keys = key_columns(df, description_column, supplier_column)
+        codes, first = factorize_rows([codes for codes, _, _ in keys])
+        (supplier_codes, suppliers, _), (description_codes, descriptions, _) = keys
+        with self._lock:
+            found = np.array([
+                self._rules.get(suppliers[supplier_codes[i]] + _KEY_SEPARATOR + descriptions[description_codes[i]])
+                for i in first
+            ], dtype=object)
+        labels = found[codes]
+        hit = pd.notna(labels)
+        hits = int(hit.sum())
+        self.hits += hits
+        self.misses += len(df) - hits
+        return hit, labels[hit]
+
+    def apply(self, df, rows, description_column, supplier_column=None, category_column=None):
+        """Learn from df, then look up rows (positions); returns (hit mask over rows, labels of hits)"""
+        self.refresh()
+        if self.learn:
+            self.learn_frame(df, description_column, supplier_column, category_column)
+        return self.lookup(df.iloc[rows], description_column, supplier_column)
+
+    def rebuild(self, frames, description_column, supplier_column=None, category_column=None):
+        """Replace every rule with those learned from frames (an iterable of DataFrames)"""
+        # Read everything first so a failing file leaves the current rules in place
+        rules = {}
+        for df in frames:
+            rules.update(self._frame_rules(df, description_column, supplier_column, category_column))
+        # One transaction, so other processes never see the index empty in between
+        def replace_all(now):
+            self._delete_all(now)
+            self._conn.executemany(
+                "INSERT INTO rules (rule_key, label, updated_at) VALUES (?, ?, ?)",
+                [(key, label, now) for key, label in rules.items()],
+            )
+
+        with self._lock:
+            self._write(replace_all)
+            count = len(self._rules)
+        print(f"📒 Rule index rebuilt: {count} rules")
+        return count
+
+    def stats(self):
+        """Return hit/miss counters and the rule count"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'rules': len(self._rules),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'learned': self.learned,
+            }
+
+    def _delete_all(self, now):
+        self._conn.execute("DELETE FROM rules")
+        self._conn.execute("UPDATE meta SET value = ? WHERE name = 'cleared'", (now,))
+
+    def clear(self):
+        """Drop every rule"""
+        with self._lock:
+            self._write(self._delete_all)
+
+    def reconnect(self):
+        """Open a fresh connection, e.g. in a forked worker; SQLite connections must not cross fork()"""
+        with self._lock:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # Rules written since the master loaded them are only in SQLite
+            self._cleared = None
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    """Rebuild the rule index from categorized CSV, Excel, JSON-lines or Parquet files"""
+    import argparse
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--description-column', required=True)
+    parser.add_argument('--supplier-column')
+    parser.add_argument('--category-column')
+    parser.add_argument('--model', help='Model the rules are for (default: the default model)')
+    parser.add_argument('--path', help='Rule index file (default: the model\'s)')
+    args = parser.parse_args(argv)
+
+    readers = {
+        '.csv': pd.read_csv,
+        '.txt': lambda path: pd.read_csv(path, sep='\t'),
+        '.xlsx': lambda path: pd.concat(pd.read_excel(path, sheet_name=None).values(), ignore_index=True),
+        '.json': pd.read_json,
+        '.jsonl': lambda path: pd.read_json(path, lines=True),
+        '.parquet': pd.read_parquet,
+    }
+
+    def frames():
+        for path in args.files:
+            extension = os.path.splitext(path)[1].lower()
+            if extension not in readers:
+                raise Exception(f"Unsupported file type: {path}")
+            print(f"📥 Learning from {path}")
+            yield readers[extension](path)
+
+    index = RuleIndex(args.path or rule_index_path(args.model))
+    index.rebuild(frames(), args.description_column, args.supplier_column, args.category_column)
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
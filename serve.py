@@ -0,0 +1,291 @@
+import gc
+import os
+import sys
+import signal
+import socket
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ SERVER CONFIGURATIONS ---
+SERVE_HOST = "0.0.0.0"
+SERVE_PORT = 8000
+SERVE_CONFIG = "production"
+
+# Worker processes forked from the master after the default model is loaded;
+# they share the model's memory pages copy-on-write
+SERVE_WORKERS = os.cpu_count() or 1
+
+# Requests handled at once by each worker; a busy worker stops accepting so
+# idle workers pick up new connections
+SERVE_THREADS = 4
+
+SERVE_BACKLOG = 128
+
+# How long the default model may take to load before workers start anyway
+# (they answer /readyz with 503 until it is loaded)
+STARTUP_LOAD_TIMEOUT_SECONDS = 300
+
+# In-flight requests and async jobs get this long to finish on shutdown or worker rotation
+GRACEFUL_TIMEOUT_SECONDS = 30
+
+# Extra time the master allows a stopping worker to fail its unfinished jobs
+# (and remove their files) before killing it; must exceed JOB_CANCEL_GRACE_SECONDS
+WORKER_EXIT_GRACE_SECONDS = 10
+
+# Async job status is shared through this directory when several workers run
+SHARED_JOB_STATE_DIR = "cache/jobs"
+
+
+def _bounded_server_class():
+    from werkzeug.serving import ThreadedWSGIServer
+
+    class BoundedWSGIServer(ThreadedWSGIServer):
+        """Threaded WSGI server that runs at most `threads` requests at once"""
+
+        def __init__(self, host, port, app, threads, fd=None):
+            self.threads = threads
+            self._slots = threading.BoundedSemaphore(threads)
+            super().__init__(host, port, app, fd=fd)
+
+        def process_request(self, request, client_address):
+            # Waiting here, before the next accept(), leaves new connections to other workers
+            self._slots.acquire()
+            try:
+                super().process_request(request, client_address)
+            except BaseException:
+                self._slots.release()
+                raise
+
+        def process_request_thread(self, request, client_address):
+            try:
+                super().process_request_thread(request, client_address)
+            finally:
+                self._slots.release()
+
+        def drain(self, timeout):
+            """Wait for in-flight requests; returns False if some were still running at the deadline"""
+            deadline = time.monotonic() + timeout
+            acquired = 0
+            try:
+                while acquired < self.threads:
+                    if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                        return False
+                    acquired += 1
+                return True
+            finally:
+                for _ in range(acquired):
+                    self._slots.release()
+
+    return BoundedWSGIServer
+
+
+def listen(host, port, backlog=None):
+    """Bound, listening socket shared by every worker"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog or SERVE_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, threads, graceful_timeout):
+    """Serve requests from the shared socket until SIGTERM/SIGINT, then drain"""
+    server = _bounded_server_class()(sock.getsockname()[0], sock.getsockname()[1], app, threads, fd=sock.fileno())
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it cannot run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    print(f"👷 Worker {os.getpid()} serving with {threads} threads")
+    server.serve_forever()
+    deadline = time.monotonic() + graceful_timeout
+    if not server.drain(graceful_timeout):
+        logger.warning(f"Worker {os.getpid()} stopped with requests still running")
+    # Async jobs run on the job manager's threads, which os._exit would kill mid-file
+    job_manager = getattr(app, 'job_manager', None)
+    if job_manager is not None:
+        job_manager.shutdown(wait=True, timeout=max(deadline - time.monotonic(), 0))
+    print(f"👋 Worker {os.getpid()} stopped")
+
+
+class PreforkServer:
+    """Master process: loads models once, forks workers, restarts them when they exit or a model reloads"""
+
+    def __init__(self, app, sock, workers=None, threads=None, graceful_timeout=None):
+        self.app = app
+        self.sock = sock
+        self.workers = workers or SERVE_WORKERS
+        self.threads = threads or SERVE_THREADS
+        self.graceful_timeout = graceful_timeout or GRACEFUL_TIMEOUT_SECONDS
+        self.children = set()
+        self._stopping = False
+        self._rotate = False
+        self._retiring = set()
+
+    def spawn(self):
+        """Fork one worker; returns its pid in the master and never returns in the worker"""
+        registry = self.app.model_registry
+        # Keep the loaded model out of the garbage collector's reach so its pages stay shared
+        gc.freeze()
+        pid = registry.fork()
+        if pid:
+            self.children.add(pid)
+            return pid
+
+        # Worker: the master's signal handlers and model watcher do not apply here
+        exit_code = 0
+        try:
+            registry.reconnect_stores()
+            run_worker(self.app, self.sock, self.threads, self.graceful_timeout)
+        except BaseException as e:
+            print(f"❌ Worker {os.getpid()} failed: {e}")
+            exit_code = 1
+        finally:
+            # Skip the master's atexit handlers
+            sys.stdout.flush()
+            os._exit(exit_code)
+
+    def stop_children(self, pids):
+        """SIGTERM workers, then SIGKILL any still running after the graceful timeout (plus time to fail their jobs)"""
+        self._retiring |= set(pids)
+        for pid in pids:
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + WORKER_EXIT_GRACE_SECONDS
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            remaining -= self._reap()
+            time.sleep(0.1)
+        for pid in remaining:
+            logger.warning(f"Worker {pid} did not stop in time; killing it")
+            self._signal(pid, signal.SIGKILL)
+        while remaining and self.children:
+            remaining -= self._reap(block=True)
+
+    @staticmethod
+    def _signal(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self, block=False):
+        """Collect exited workers; returns their pids"""
+        exited = set()
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, 0 if block and not exited else os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                break
+            if pid == 0:
+                break
+            if pid in self.children:
+                self.children.discard(pid)
+                exited.add(pid)
+                if pid not in self._retiring:
+                    logger.warning(f"Worker {pid} exited with status {status}")
+                self._retiring.discard(pid)
+        return exited
+
+    def rotate(self):
+        """Start a fresh set of workers, then stop the old ones (new model versions, SIGHUP)"""
+        old = set(self.children)
+        print(f"🔁 Rotating workers: starting {self.workers}, stopping {len(old)}")
+        for _ in range(self.workers):
+            self.spawn()
+        self.stop_children(old)
+
+    def run(self):
+        def stop(signum, frame):
+            self._stopping = True
+
+        def rotate(signum, frame):
+            self._rotate = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGHUP, rotate)
+
+        registry = self.app.model_registry
+        reloads = registry.reloads
+        for _ in range(self.workers):
+            self.spawn()
+        print(f"🚀 Master {os.getpid()} running {self.workers} workers x {self.threads} threads")
+
+        while not self._stopping:
+            time.sleep(0.5)
+            self._reap()
+            # Workers keep the model they were forked with; rotate so they pick up reloads
+            if registry.reloads != reloads or self._rotate:
+                reloads = registry.reloads
+                self._rotate = False
+                self.rotate()
+            # Replace workers that crashed
+            while not self._stopping and len(self.children) < self.workers:
+                self.spawn()
+
+        print("🛑 Shutting down workers")
+        self.stop_children(set(self.children))
+
+
+def main(argv=None):
+    """Production server: load models once, then serve from forked worker processes"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--config', default=None, help=f'Config name (default: {SERVE_CONFIG})')
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (1 = no fork)')
+    parser.add_argument('--threads', type=int, default=None, help='Concurrent requests per worker')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+
+    app = create_app(args.config or os.environ.get('CATEGORIZER_CONFIG', SERVE_CONFIG))
+    host = args.host or app.config.get('SERVE_HOST', SERVE_HOST)
+    port = args.port or app.config.get('SERVE_PORT', SERVE_PORT)
+    workers = args.workers or app.config.get('SERVE_WORKERS', SERVE_WORKERS)
+    threads = args.threads or app.config.get('SERVE_THREADS', SERVE_THREADS)
+    graceful_timeout = app.config.get('GRACEFUL_TIMEOUT_SECONDS', GRACEFUL_TIMEOUT_SECONDS)
+    can_fork = hasattr(os, 'fork')
+
+    # Load the default model before forking so every worker shares it
+    print("⏳ Loading default model before starting workers")
+    if app.model_registry.get(timeout=app.config.get('STARTUP_LOAD_TIMEOUT_SECONDS', STARTUP_LOAD_TIMEOUT_SECONDS)) is None:
+        print("⚠️ Default model not loaded - workers will report not ready")
+
+    # The name index is shared the same way
+    try:
+        app.name_index.get()
+    except Exception as e:
+        print(f"⚠️ Name index not loaded: {e}")
+
+    sock = listen(host, port, app.config.get('SERVE_BACKLOG', SERVE_BACKLOG))
+    print(f"🌐 Listening on http://{host}:{port}")
+
+    if workers <= 1 or not can_fork:
+        if workers > 1:
+            print("⚠️ fork() is not available on this platform - running a single worker")
+        run_worker(app, sock, threads, graceful_timeout)
+        return
+
+    # Every worker admits uploads against its share of the memory budget
+    if app.admission is not None:
+        app.admission.split(workers)
+    if app.job_manager.state_dir is None:
+        app.job_manager.share_state(app.config.get('JOB_STATE_DIR') or SHARED_JOB_STATE_DIR)
+    PreforkServer(app, sock, workers, threads, graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import logging
+import re
+from itertools import chain
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ SPARSE SCORER CONFIGURATIONS ---
+# Descriptions tokenized and scored per batch; bounds the dense score matrix
+# (rows x classes) and the token lists held at once
+SCORER_BATCH_ROWS = 20_000
+
+# sklearn's default token pattern; batches using it are tokenized in one regex pass
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+# Joins a batch into one string; never part of a default-pattern token
+_DOCUMENT_SEPARATOR = "\x1e"
+
+
+class SparseLinearScorer:
+    """TF-IDF + linear classifier compiled to a vocabulary lookup, IDF vector and coefficient matrix.
+
+    Reproduces Pipeline.predict: the CSR matrix is built with the same values and
+    sorted indices as CountVectorizer, then weighted and normalized with the same
+    operations, so scores (and predictions) are identical.
+    """
+
+    def __init__(self, vectorizer, transformer, classifier, batch_rows=None):
+        import numpy as np
+
+        self.vocabulary = vectorizer.vocabulary_
+        self.n_features = len(self.vocabulary)
+        self.dtype = vectorizer.dtype
+        self.binary = vectorizer.binary
+        self.analyze = vectorizer.build_analyzer()
+        self.findall = self._unigram_tokenizer(vectorizer)
+        self.lowercase = vectorizer.lowercase
+        self.batch_findall = self.ascii_findall = None
+        if self.findall is not None and vectorizer.token_pattern == DEFAULT_TOKEN_PATTERN:
+            self.batch_findall = re.compile(f"{DEFAULT_TOKEN_PATTERN}|{_DOCUMENT_SEPARATOR}").findall
+            # Same tokens on ASCII-only text, with cheaper character classes
+            self.ascii_findall = re.compile(f"(?a)\\b\\w\\w+\\b|{_DOCUMENT_SEPARATOR}").findall
+
+        # TfidfTransformer state (None for plain counts)
+        self.sublinear_tf = bool(transformer is not None and transformer.sublinear_tf)
+        self.idf = transformer.idf_ if transformer is not None and hasattr(transformer, 'idf_') else None
+        self.norm = transformer.norm if transformer is not None else None
+        self.tfidf = transformer is not None
+
+        self.coef_t = np.ascontiguousarray(classifier.coef_.T)
+        self.intercept = classifier.intercept_
+        self.classes = classifier.classes_
+        self.batch_rows = batch_rows or SCORER_BATCH_ROWS
+
+    @staticmethod
+    def _unigram_tokenizer(vectorizer):
+        """Bare regex findall when the analyzer reduces to it, else None (use build_analyzer)"""
+        if (vectorizer.analyzer != 'word' or tuple(vectorizer.ngram_range) != (1, 1)
+                or vectorizer.tokenizer is not None or vectorizer.preprocessor is not None
+                or vectorizer.strip_accents is not None or vectorizer.input != 'content'):
+            return None
+        # Stop words are dropped by the analyzer; unigram lookups skip them only if they are not in the vocabulary
+        stop_words = vectorizer.get_stop_words()
+        if stop_words and any(word in vectorizer.vocabulary_ for word in stop_words):
+            return None
+        pattern = re.compile(vectorizer.token_pattern)
+        if pattern.groups > 1:
+            return None
+        return pattern.findall
+
+    def _tokenize(self, descriptions):
+        """(row per token, tokens) for a batch of descriptions"""
+        import numpy as np
+
+        if self.batch_findall is not None:
+            text = _DOCUMENT_SEPARATOR.join(descriptions)
+            # A separator inside a description would shift rows; tokenize per description instead
+            if text.count(_DOCUMENT_SEPARATOR) == len(descriptions) - 1:
+                if self.lowercase:
+                    text = text.lower()
+                findall = self.ascii_findall if text.isascii() else self.batch_findall
+                tokens = np.array(findall(text), dtype=object)
+                separators = tokens == _DOCUMENT_SEPARATOR
+                rows = np.cumsum(separators)
+                return rows[~separators], tokens[~separators]
+
+        if self.findall is None:
+            token_lists = [self.analyze(doc) for doc in descriptions]
+        elif self.lowercase:
+            token_lists = [self.findall(doc.lower()) for doc in descriptions]
+        else:
+            token_lists = [self.findall(doc) for doc in descriptions]
+        lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=len(token_lists))
+        tokens = np.fromiter(chain.from_iterable(token_lists), dtype=object, count=lengths.sum())
+        return np.repeat(np.arange(len(token_lists), dtype=np.int64), lengths), tokens
+
+    def transform(self, descriptions):
+        """Feature matrix for a batch of descriptions, equal to the pipeline's"""
+        import numpy as np
+        import pandas as pd
+        import scipy.sparse as sp
+        from sklearn.preprocessing import normalize
+
+        n_rows = len(descriptions)
+        rows, tokens = self._tokenize(descriptions)
+
+        # Map each distinct token to its feature once, not every occurrence
+        codes, distinct = pd.factorize(tokens)
+        vocabulary = self.vocabulary
+        features = np.array([vocabulary.get(token, -1) for token in distinct] + [-1], dtype=np.int64)[codes]
+        known = features >= 0
+
+        # Sorted (row, feature) keys give the counts with sorted indices per row
+        keys, counts = np.unique(rows[known].astype(np.int64) * self.n_features + features[known], return_counts=True)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // self.n_features, minlength=n_rows), out=indptr[1:])
+        index_dtype = np.int32 if len(keys) <= np.iinfo(np.int32).max else np.int64
+        X = sp.csr_matrix(
+            (counts.astype(self.dtype), (keys % self.n_features).astype(index_dtype), indptr.astype(index_dtype)),
+            shape=(n_rows, self.n_features),
+        )
+        X.has_sorted_indices = True
+
+        if self.binary:
+            X.data.fill(1)
+        if self.tfidf:
+            if X.dtype not in (np.float64, np.float32):
+                X = X.astype(np.float64)
+            if self.sublinear_tf:
+                np.log(X.data, X.data)
+                X.data += 1.0
+            if self.idf is not None:
+                X.data *= self.idf[X.indices]
+            if self.norm is not None:
+                X = normalize(X, norm=self.norm, copy=False)
+        return X
+
+    def decision_function(self, descriptions):
+        scores = self.transform(descriptions) @ self.coef_t + self.intercept
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def predict(self, descriptions):
+        """Predicted class per description, batch by batch"""
+        import numpy as np
+
+        descriptions = list(descriptions)
+        predictions = []
+        for start in range(0, len(descriptions), self.batch_rows):
+            scores = self.decision_function(descriptions[start:start + self.batch_rows])
+            if scores.ndim == 1:
+                indices = (scores > 0).astype(int)
+            else:
+                indices = scores.argmax(axis=1)
+            predictions.append(self.classes[indices])
+        if not predictions:
+            return self.classes[:0]
+        return np.concatenate(predictions)
+
+
+def compile_scorer(model, batch_rows=None):
+    """Compile a fitted [vectorizer, (tfidf), linear classifier] Pipeline; None if unsupported"""
+    try:
+        from sklearn.pipeline import Pipeline
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer, TfidfTransformer
+        from sklearn.linear_model._base import LinearClassifierMixin
+    except ImportError:
+        return None
+
+    if not isinstance(model, Pipeline):
+        return None
+    steps = [step for _, step in model.steps if step is not None and step != 'passthrough']
+    if len(steps) not in (2, 3) or not isinstance(steps[0], CountVectorizer):
+        return None
+    vectorizer, classifier = steps[0], steps[-1]
+    if not isinstance(classifier, LinearClassifierMixin) or not hasattr(classifier, 'coef_'):
+        return None
+
+    if len(steps) == 3:
+        if isinstance(vectorizer, TfidfVectorizer) or not isinstance(steps[1], TfidfTransformer):
+            return None
+        transformer = steps[1]
+    else:
+        transformer = vectorizer._tfidf if isinstance(vectorizer, TfidfVectorizer) else None
+
+    try:
+        return SparseLinearScorer(vectorizer, transformer, classifier, batch_rows)
+    except Exception as e:
+        logger.warning(f"Sparse scorer unavailable, using the sklearn pipeline: {e}")
+        return None
@@ -8,7 +8,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const removeFileBtn = document.getElementById('remove-file');
 
     // Supported file types
-    const supportedTypes = ['.csv', '.xlsx', '.json', '.txt'];
+    const supportedTypes = ['.csv', '.xlsx', '.json', '.jsonl', '.txt', '.parquet', '.arrow', '.feather'];
     // Remove maxFileSize variable completely
 
     // Prevent default drag behaviors
@@ -81,7 +81,7 @@ document.addEventListener('DOMContentLoaded', function() {
         // Check file type only
         const fileExtension = '.' + file.name.split('.').pop().toLowerCase();
         if (!supportedTypes.includes(fileExtension)) {
-            showAlert('Unsupported file type. Please upload CSV, Excel, JSON, or TXT files.', 'error');
+            showAlert('Unsupported file type. Please upload CSV, Excel, JSON, JSON-lines, TXT, Parquet or Arrow files.', 'error');
             return false;
         }
 
@@ -0,0 +1,312 @@
+// Slim upload: the browser sends only the columns the model reads and merges
+// the predicted columns back into the file locally
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('upload-form');
+    const fileInput = document.getElementById('file-input');
+    const slimToggle = document.getElementById('slim-upload');
+    const submitBtn = document.getElementById('submit-btn');
+
+    if (!form || !slimToggle) {
+        return;
+    }
+
+    const predictedColumns = ['S/NS', 'Major Category', 'Minor Category', 'Date'];
+
+    // Input types parsed in the browser and the output formats they can be merged into;
+    // anything else (Excel, Parquet, Arrow) goes through the regular upload
+    const slimFormats = {
+        csv: ['csv'],
+        txt: ['csv'],
+        json: ['json', 'jsonl'],
+        jsonl: ['json', 'jsonl'],
+    };
+
+    const mimetypes = {
+        csv: 'text/csv',
+        json: 'application/json',
+        jsonl: 'application/x-ndjson',
+    };
+
+    // Rows serialized per Blob part, so large files are never one giant string
+    const blockRows = 50000;
+
+    form.addEventListener('submit', async function(e) {
+        const file = fileInput.files[0];
+        const checked = form.querySelector('input[name="output_format"]:checked');
+        const outputFormat = checked ? checked.value : 'excel';
+        const extension = file ? file.name.split('.').pop().toLowerCase() : '';
+
+        if (!slimToggle.checked || !file || !(slimFormats[extension] || []).includes(outputFormat)) {
+            return;
+        }
+        e.preventDefault();
+
+        setBusy(true);
+        try {
+            const table = parseTable(await file.text(), extension);
+            const payload = buildPayload(table);
+            const {result, bytesSent} = await postColumns(payload);
+            mergeColumns(table, result.columns);
+            download(serialize(table, outputFormat), outputFormat);
+            showMessage(
+                `Categorized ${result.rows} rows; sent ${formatBytes(bytesSent)} instead of ${formatBytes(file.size)}`,
+                'success'
+            );
+        } catch (err) {
+            console.error('Slim upload failed:', err);
+            showMessage(err.message, 'error');
+        } finally {
+            setBusy(false);
+        }
+    });
+
+    // --- Reading ---
+
+    function parseTable(text, extension) {
+        if (extension === 'csv' || extension === 'txt') {
+            const rows = parseDelimited(text, extension === 'txt' ? '\t' : ',');
+            const header = rows.shift() || [];
+            return {header: header, rows: rows, records: null};
+        }
+        let records;
+        if (extension === 'jsonl') {
+            records = text.split('\n').filter(line => line.trim() !== '').map(line => JSON.parse(line));
+        } else {
+            records = JSON.parse(text);
+        }
+        if (!Array.isArray(records)) {
+            throw new Error('JSON uploads must be an array of records');
+        }
+        const header = [];
+        const seen = new Set();
+        records.forEach(record => Object.keys(record).forEach(key => {
+            if (!seen.has(key)) {
+                seen.add(key);
+                header.push(key);
+            }
+        }));
+        return {header: header, rows: null, records: records};
+    }
+
+    function parseDelimited(text, delimiter) {
+        // RFC 4180: quoted fields may hold delimiters, doubled quotes and newlines; blank lines are skipped
+        const rows = [];
+        let row = [];
+        const n = text.length;
+        // Skip a byte order mark
+        let i = text.charCodeAt(0) === 0xFEFF ? 1 : 0;
+
+        while (i < n) {
+            let value;
+            if (text[i] === '"') {
+                let end = i + 1;
+                value = '';
+                while (true) {
+                    const quote = text.indexOf('"', end);
+                    if (quote === -1) {
+                        value += text.slice(end);
+                        end = n;
+                        break;
+                    }
+                    value += text.slice(end, quote);
+                    if (text[quote + 1] === '"') {
+                        value += '"';
+                        end = quote + 2;
+                    } else {
+                        end = quote + 1;
+                        break;
+                    }
+                }
+                i = end;
+                // Anything between the closing quote and the next delimiter is kept as-is
+                while (i < n && text[i] !== delimiter && text[i] !== '\n' && text[i] !== '\r') {
+                    value += text[i++];
+                }
+            } else {
+                let end = i;
+                while (end < n && text[end] !== delimiter && text[end] !== '\n' && text[end] !== '\r') {
+                    end++;
+                }
+                value = text.slice(i, end);
+                i = end;
+            }
+            row.push(value);
+
+            if (i < n && text[i] === delimiter) {
+                i++;
+                if (i === n) {
+                    row.push('');
+                }
+                continue;
+            }
+            // End of record
+            if (text[i] === '\r' && text[i + 1] === '\n') {
+                i++;
+            }
+            i++;
+            if (!(row.length === 1 && row[0] === '')) {
+                rows.push(row);
+            }
+            row = [];
+        }
+        if (row.length) {
+            rows.push(row);
+        }
+        return rows;
+    }
+
+    function columnValues(table, name) {
+        if (table.records) {
+            return table.records.map(record => (record[name] === undefined ? null : record[name]));
+        }
+        const index = table.header.indexOf(name);
+        // Empty fields are missing values, as when the server reads the file
+        return table.rows.map(row => (index < row.length && row[index] !== '' ? row[index] : null));
+    }
+
+    function buildPayload(table) {
+        const description = document.getElementById('variable2').value.trim();
+        const supplier = document.getElementById('variable1').value.trim();
+        const category = document.getElementById('variable3').value.trim();
+        const model = document.getElementById('model');
+
+        if (!table.header.includes(description)) {
+            throw new Error(`Column "${description}" not found. Available columns: ${table.header.join(', ')}`);
+        }
+        // Existing label columns are sent too: filled rows are kept and teach the rule index
+        const names = [description, supplier, category, ...predictedColumns]
+            .filter((name, i, all) => name && table.header.includes(name) && all.indexOf(name) === i);
+        const columns = {};
+        names.forEach(name => {
+            columns[name] = columnValues(table, name);
+        });
+        return {
+            description_column: description,
+            supplier_column: supplier,
+            category_column: category,
+            model: model ? model.value : null,
+            columns: columns,
+        };
+    }
+
+    // --- Sending ---
+
+    async function postColumns(payload) {
+        const headers = {'Content-Type': 'application/json'};
+        let body = new Blob([JSON.stringify(payload)], {type: 'application/json'});
+        if ('CompressionStream' in window) {
+            body = await new Response(body.stream().pipeThrough(new CompressionStream('gzip'))).blob();
+            headers['Content-Encoding'] = 'gzip';
+        }
+        const response = await fetch(form.dataset.slimUrl, {method: 'POST', headers: headers, body: body});
+        const result = await response.json().catch(() => ({}));
+        if (!response.ok) {
+            throw new Error(result.error || `Upload failed (${response.status})`);
+        }
+        return {result: result, bytesSent: body.size};
+    }
+
+    // --- Merging and writing ---
+
+    function mergeColumns(table, columns) {
+        // Same column order as the server's output (JSON object keys arrive sorted)
+        predictedColumns.filter(name => columns[name]).forEach(name => {
+            const column = columns[name];
+            const values = column.codes.map(code => (code < 0 ? null : column.categories[code]));
+            if (table.records) {
+                table.records.forEach((record, i) => {
+                    record[name] = values[i];
+                });
+                if (!table.header.includes(name)) {
+                    table.header.push(name);
+                }
+                return;
+            }
+            let index = table.header.indexOf(name);
+            if (index === -1) {
+                table.header.push(name);
+                index = table.header.length - 1;
+            }
+            table.rows.forEach((row, i) => {
+                while (row.length < index) {
+                    row.push('');
+                }
+                row[index] = values[i] === null ? '' : values[i];
+            });
+        });
+    }
+
+    function csvField(value) {
+        const text = value === null || value === undefined ? '' : String(value);
+        return /[",\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
+    }
+
+    function serialize(table, outputFormat) {
+        const parts = [];
+        if (outputFormat === 'csv') {
+            parts.push(table.header.map(csvField).join(',') + '\n');
+            for (let start = 0; start < table.rows.length; start += blockRows) {
+                const block = table.rows.slice(start, start + blockRows);
+                parts.push(block.map(row => row.map(csvField).join(',')).join('\n') + '\n');
+            }
+            return parts;
+        }
+
+        const records = table.records;
+        if (outputFormat === 'json') {
+            parts.push('[\n');
+        }
+        for (let start = 0; start < records.length; start += blockRows) {
+            const block = records.slice(start, start + blockRows).map(record => JSON.stringify(record));
+            if (outputFormat === 'json') {
+                parts.push((start > 0 ? ',\n' : '') + block.join(',\n'));
+            } else {
+                parts.push(block.join('\n') + '\n');
+            }
+        }
+        if (outputFormat === 'json') {
+            parts.push('\n]\n');
+        }
+        return parts;
+    }
+
+    function download(parts, outputFormat) {
+        const now = new Date();
+        const pad = number => String(number).padStart(2, '0');
+        const stamp = `${now.getFullYear()}${pad(now.getMonth() + 1)}${pad(now.getDate())}_` +
+            `${pad(now.getHours())}${pad(now.getMinutes())}${pad(now.getSeconds())}`;
+        const url = URL.createObjectURL(new Blob(parts, {type: mimetypes[outputFormat]}));
+        const link = document.createElement('a');
+        link.href = url;
+        link.download = `categorized_data_${stamp}.${outputFormat}`;
+        document.body.appendChild(link);
+        link.click();
+        link.remove();
+        setTimeout(() => URL.revokeObjectURL(url), 1000);
+    }
+
+    // --- Page state ---
+
+    function setBusy(busy) {
+        submitBtn.disabled = busy;
+        submitBtn.classList.toggle('disabled', busy);
+    }
+
+    function formatBytes(bytes) {
+        if (bytes < 1024) return `${bytes} Bytes`;
+        if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+        return `${(bytes / 1024 / 1024).toFixed(1)} MB`;
+    }
+
+    function showMessage(message, type) {
+        const alertDiv = document.createElement('div');
+        alertDiv.className = `alert alert-${type === 'error' ? 'danger' : type} alert-dismissible fade show`;
+        alertDiv.textContent = message;
+        const closeBtn = document.createElement('button');
+        closeBtn.type = 'button';
+        closeBtn.className = 'btn-close';
+        closeBtn.setAttribute('data-bs-dismiss', 'alert');
+        alertDiv.appendChild(closeBtn);
+        form.parentNode.insertBefore(alertDiv, form);
+    }
+});
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.pipeline import Pipeline
+
+from sparse_scorer import SparseLinearScorer, compile_scorer
+
+TRAIN = [
+    ("AMAZON WEB SERVICES invoice", "IT|Cloud"),
+    ("aws cloud hosting monthly", "IT|Cloud"),
+    ("Microsoft Azure subscription", "IT|Cloud"),
+    ("office chairs and desks", "Facilities|Furniture"),
+    ("Herman Miller chair", "Facilities|Furniture"),
+    ("standing desk frame", "Facilities|Furniture"),
+    ("flight to Zürich", "Travel|Air"),
+    ("Lufthansa flight ticket", "Travel|Air"),
+    ("airline baggage fee", "Travel|Air"),
+    ("café déjeuner équipe", "Travel|Meals"),
+    ("team lunch restaurant", "Travel|Meals"),
+    ("dinner with client", "Travel|Meals"),
+]
+
+EDGE_CASES = [
+    "",
+    " ",
+    "a",
+    "!!! --- ???",
+    "qwertyuiop zxcvbnm",
+    "xyzzy plugh",
+    "CAFÉ Déjeuner",
+    "Zürich café",
+    "東京 出張 flight",
+    "ΑΘΗΝΑ taxi",
+    "AWS\x1echair",
+    "aws aws aws cloud",
+    "Office\tchairs\nand desks",
+    "flight flight flight lunch",
+]
+
+
+def fit(pipeline, labels=None):
+    descriptions = [description for description, _ in TRAIN]
+    return pipeline.fit(descriptions, labels or [label for _, label in TRAIN])
+
+
+PIPELINES = {
+    'tfidf_logistic': lambda: Pipeline([('tfidf', TfidfVectorizer()), ('clf', LogisticRegression(max_iter=1000))]),
+    'count_tfidf_sgd': lambda: Pipeline([
+        ('counts', CountVectorizer()), ('tfidf', TfidfTransformer(sublinear_tf=True)),
+        ('clf', SGDClassifier(random_state=0)),
+    ]),
+    'tfidf_bigrams': lambda: Pipeline([
+        ('tfidf', TfidfVectorizer(ngram_range=(1, 2), strip_accents='unicode')),
+        ('clf', LogisticRegression(max_iter=1000)),
+    ]),
+    'counts_binary': lambda: Pipeline([('counts', CountVectorizer(binary=True)), ('clf', LogisticRegression(max_iter=1000))]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(PIPELINES))
+def test_predictions_match_pipeline(name):
+    pipeline = fit(PIPELINES[name]())
+    scorer = compile_scorer(pipeline)
+    assert isinstance(scorer, SparseLinearScorer)
+
+    descriptions = EDGE_CASES + [description for description, _ in TRAIN]
+    assert list(scorer.predict(descriptions)) == list(pipeline.predict(descriptions))
+    np.testing.assert_allclose(scorer.decision_function(descriptions), pipeline.decision_function(descriptions))
+
+
+def test_binary_classifier():
+    pipeline = fit(PIPELINES['tfidf_logistic'](), [label.split('|')[0] == 'Travel' for _, label in TRAIN])
+    scorer = compile_scorer(pipeline)
+    assert list(scorer.predict(EDGE_CASES)) == list(pipeline.predict(EDGE_CASES))
+
+
+def test_batches_and_empty_input():
+    pipeline = fit(PIPELINES['tfidf_logistic']())
+    scorer = compile_scorer(pipeline, batch_rows=3)
+    assert list(scorer.predict(EDGE_CASES)) == list(pipeline.predict(EDGE_CASES))
+    assert len(scorer.predict([])) == 0
+
+
+def test_only_unseen_tokens_score_intercept():
+    pipeline = fit(PIPELINES['tfidf_logistic']())
+    scorer = compile_scorer(pipeline)
+    descriptions = ["", "qwertyuiop zxcvbnm", "東京"]
+    assert scorer.transform(descriptions).nnz == 0
+    np.testing.assert_allclose(scorer.decision_function(descriptions), np.tile(pipeline[-1].intercept_, (3, 1)))
+
+
+def test_unsupported_models():
+    from sklearn.ensemble import RandomForestClassifier
+
+    descriptions = [description for description, _ in TRAIN]
+    labels = [label for _, label in TRAIN]
+    forest = Pipeline([('tfidf', TfidfVectorizer()), ('clf', RandomForestClassifier(n_estimators=2))])
+    assert compile_scorer(forest.fit(descriptions, labels)) is None
+    assert compile_scorer(LogisticRegression()) is None